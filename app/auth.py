@@ -5,10 +5,10 @@ import bcrypt
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select
+from sqlalchemy import Select, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.config import ALGORITHM, SECRET_KEY
+from app.config import get_settings
 from app.depends.db_depends import get_async_db
 from app.models.users import User as UserModel
 
@@ -52,7 +52,8 @@ def create_access_token(data: dict) -> str:
     # Добавляет поле exp (expiration) в payload токена
     to_encode.update({"exp": expire})
     # Возвращаем строку токена
-    return cast(str, jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM))
+    settings = get_settings()
+    return cast(str, jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm))
 
 
 def create_refresh_token(data: dict) -> str:
@@ -66,7 +67,28 @@ def create_refresh_token(data: dict) -> str:
     # Добавляет поле exp (expiration) в payload токена
     to_encode.update({"exp": expire})
     # Возвращаем строку токена
-    return cast(str, jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM))
+    settings = get_settings()
+    return cast(str, jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm))
+
+
+def get_user_id_from_token(token: str) -> int | None:
+    """
+    Возвращает id пользователя из валидного JWT без обращения к базе или None.
+    """
+    settings = get_settings()
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except jwt.PyJWTError:
+        return None
+    user_id = payload.get("id")
+    return user_id if isinstance(user_id, int) else None
+
+
+def active_user_query(email: str) -> Select[tuple[UserModel]]:
+    """
+    Запрос активного пользователя по email. Выполняется почти в каждом запросе, поэтому прогревается при старте.
+    """
+    return select(UserModel).where(UserModel.email == email, UserModel.is_active)
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> UserModel:
@@ -78,8 +100,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    settings = get_settings()
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
@@ -92,7 +115,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     except jwt.PyJWTError as exc:
         raise credentials_exception from exc
 
-    result = await db.scalars(select(UserModel).where(UserModel.email == email, UserModel.is_active))
+    result = await db.scalars(active_user_query(email))
     user = cast(UserModel | None, result.first())
 
     if user is None:
@@ -119,3 +142,13 @@ async def get_current_buyer(current_user: UserModel = Depends(get_current_user))
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only buyer can perform this action")
 
     return current_user
+
+
+async def get_current_admin(current_user: UserModel = Depends(get_current_user)) -> UserModel:
+    """
+    Проверяет, что пользователь имеет роль 'admin'.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admin can perform this action")
+
+    return current_user
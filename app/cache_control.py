@@ -0,0 +1,70 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import Request, Response, status
+
+
+@dataclass(frozen=True, slots=True)
+class CachePolicy:
+    """
+    Сколько ответ маршрута хранится у клиента (max_age) и в общем кеше перед приложением (s_maxage), в секундах.
+    """
+
+    max_age: int
+    s_maxage: int
+    stale_while_revalidate: int = 0
+
+    @property
+    def header(self) -> str:
+        value = f"public, max-age={self.max_age}, s-maxage={self.s_maxage}"
+        if self.stale_while_revalidate:
+            value += f", stale-while-revalidate={self.stale_while_revalidate}"
+        return value
+
+
+# Анонимные чтения каталога. Клиент перепроверяет ответ по ETag, кеш nginx держит его дольше
+CACHE_POLICIES: dict[tuple[str, str], CachePolicy] = {
+    ("GET", "/categories/"): CachePolicy(max_age=60, s_maxage=300, stale_while_revalidate=60),
+    ("GET", "/products/"): CachePolicy(max_age=0, s_maxage=10, stale_while_revalidate=30),
+    ("GET", "/products/category/{category_id}"): CachePolicy(max_age=0, s_maxage=10, stale_while_revalidate=30),
+    ("GET", "/products/batch"): CachePolicy(max_age=0, s_maxage=30, stale_while_revalidate=30),
+    ("GET", "/products/trending"): CachePolicy(max_age=10, s_maxage=10, stale_while_revalidate=30),
+    ("GET", "/products/{product_id}"): CachePolicy(max_age=0, s_maxage=30, stale_while_revalidate=30),
+    ("GET", "/products/{product_id}/also-bought"): CachePolicy(max_age=60, s_maxage=300, stale_while_revalidate=300),
+    ("GET", "/products/{product_id}/similar"): CachePolicy(max_age=60, s_maxage=300, stale_while_revalidate=300),
+    ("GET", "/products/{product_id}/reviews"): CachePolicy(max_age=0, s_maxage=60, stale_while_revalidate=60),
+}
+
+NO_STORE = "private, no-store"
+# Ограничение размера заголовка: большие списки помечаются только ключами категории и каталога
+MAX_SURROGATE_KEYS = 200
+# Кешируемые статусы: 304 несёт те же заголовки кеширования, что и 200
+CACHEABLE_STATUSES = {status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED}
+
+
+def set_surrogate_keys(response: Response, keys: Iterable[str]) -> None:
+    """
+    Помечает ответ ключами данных, которые в нём есть (см. app.services.catalog_versions), для точечной очистки кеша.
+    """
+    merged = dict.fromkeys([*response.headers.get("Surrogate-Key", "").split(), *keys])
+    if len(merged) <= MAX_SURROGATE_KEYS:
+        response.headers["Surrogate-Key"] = " ".join(merged)
+
+
+async def cache_control_middleware(request: Request, call_next: Any) -> Any:
+    response = await call_next(request)
+    if "authorization" in request.headers:
+        # Ответ авторизованному клиенту никогда не попадает в общий кеш, даже если маршрут публичный
+        response.headers["Cache-Control"] = NO_STORE
+        if "surrogate-key" in response.headers:
+            del response.headers["Surrogate-Key"]
+        return response
+
+    route = request.scope.get("route")
+    policy = CACHE_POLICIES.get((request.method, getattr(route, "path", "")))
+    if policy is not None and response.status_code in CACHEABLE_STATUSES:
+        response.headers["Cache-Control"] = policy.header
+    elif "cache-control" not in response.headers:
+        response.headers["Cache-Control"] = "no-cache"
+    return response
@@ -0,0 +1,150 @@
+import asyncio
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+
+from app.config import get_settings
+from app.load_shedding import CLIENT_CLOSED_REQUEST
+from app.metrics import metrics
+
+
+# Чтения каталога, одинаковые для всех клиентов: одновременные одинаковые запросы выполняются один раз
+COALESCED_ROUTES: dict[str, re.Pattern[str]] = {
+    "products_list": re.compile(r"/products/"),
+    "product": re.compile(r"/products/\d+"),
+    "products_batch": re.compile(r"/products/batch"),
+    "products_trending": re.compile(r"/products/trending"),
+    "product_reviews": re.compile(r"/products/\d+/reviews"),
+    "also_bought": re.compile(r"/products/\d+/also-bought"),
+    "similar_products": re.compile(r"/products/\d+/similar"),
+    "category_products": re.compile(r"/products/category/\d+"),
+}
+
+
+# Ключ scope, в котором маршрут ведущего запроса оставляет действия для дублей, см. on_replay
+ON_REPLAY_SCOPE_KEY = "coalesce.on_replay"
+
+
+@dataclass(slots=True, frozen=True)
+class SharedResponse:
+    """
+    Ответ ведущего запроса, который получают все ожидавшие его дубли.
+    route — маршрут ведущего запроса: дубли до маршрутизации не доходят, а внешние middleware
+    (Cache-Control) выбирают политику по маршруту. on_replay — побочные действия маршрута,
+    которые повторяются для каждого дубля, например учёт просмотра.
+    """
+
+    status_code: int
+    headers: dict[str, str]
+    body: bytes
+    route: Any = None
+    on_replay: tuple[Callable[[], None], ...] = ()
+
+    def replay(self, request: Request) -> Response:
+        if self.route is not None:
+            request.scope["route"] = self.route
+        for action in self.on_replay:
+            action()
+        return Response(
+            content=self.body, status_code=self.status_code, headers={**self.headers, "X-Coalesced": "true"}
+        )
+
+
+def on_replay(request: Request, action: Callable[[], None]) -> None:
+    """
+    Повторяет action для каждого дубля, получившего ответ этого запроса без выполнения маршрута.
+    """
+    request.scope.setdefault(ON_REPLAY_SCOPE_KEY, []).append(action)
+
+
+# Выполняющиеся в этом воркере ведущие запросы по ключу (путь, нормализованные параметры)
+_inflight: dict[tuple[str, str, str], asyncio.Future[SharedResponse | None]] = {}
+
+
+def coalesce_route(request: Request) -> str | None:
+    if request.method != "GET":
+        return None
+    for name, pattern in COALESCED_ROUTES.items():
+        if pattern.fullmatch(request.url.path):
+            return name
+    return None
+
+
+def coalesce_key(request: Request) -> tuple[str, str, str]:
+    """
+    Путь и параметры запроса без пустых значений в фиксированном порядке: ?b=2&a=1 и ?a=1&b=2&c= совпадают.
+    If-None-Match тоже входит в ключ: от него зависит, получит клиент 200 или 304.
+    """
+    return request.url.path, urlencode(sorted(parse_qsl(request.url.query))), request.headers.get("if-none-match", "")
+
+
+def _count(route: str, role: str) -> None:
+    metrics.inc("coalesce_requests_total", route=route, role=role)
+    shared = metrics.value("coalesce_requests_total", route=route, role="follower")
+    total = shared + sum(
+        metrics.value("coalesce_requests_total", route=route, role=r) for r in ("leader", "fallback", "rejected")
+    )
+    # Доля запросов, получивших чужой ответ без обращения к базе
+    metrics.set("coalesce_ratio", round(shared / total, 4), route=route)
+
+
+async def _lead(request: Request, call_next: Any) -> tuple[Response, SharedResponse | None]:
+    response = await call_next(request)
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    result = Response(content=body, status_code=response.status_code, headers=dict(response.headers))
+    if response.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR or response.status_code == CLIENT_CLOSED_REQUEST:
+        # Ошибку сервера и отмену из-за отключения клиента ведущего дубли не получают: они выполнят запрос сами
+        return result, None
+    return result, SharedResponse(
+        response.status_code,
+        dict(response.headers),
+        body,
+        route=request.scope.get("route"),
+        on_replay=tuple(request.scope.get(ON_REPLAY_SCOPE_KEY, ())),
+    )
+
+
+async def coalescing_middleware(request: Request, call_next: Any) -> Any:
+    settings = get_settings()
+    route = coalesce_route(request) if settings.coalesce_enabled else None
+    if route is None:
+        return await call_next(request)
+
+    key = coalesce_key(request)
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        try:
+            shared = await asyncio.wait_for(asyncio.shield(inflight), settings.coalesce_max_wait)
+        except TimeoutError:
+            shared = None
+            if settings.coalesce_fallback == "reject":
+                _count(route, "rejected")
+                return JSONResponse(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    content={"detail": "Service is overloaded, try again later"},
+                    headers={"Retry-After": str(settings.db_shed_retry_after)},
+                )
+        if shared is not None:
+            _count(route, "follower")
+            return shared.replay(request)
+        # Ведущий запрос не дождались или он завершился ошибкой — выполняем свой
+        _count(route, "fallback")
+        return await call_next(request)
+
+    future: asyncio.Future[SharedResponse | None] = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    _count(route, "leader")
+    try:
+        response, shared = await _lead(request, call_next)
+        future.set_result(shared)
+        return response
+    finally:
+        if not future.done():
+            future.set_result(None)
+        if _inflight.get(key) is future:
+            del _inflight[key]
@@ -1,9 +1,204 @@
 import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Literal
 
 from dotenv import load_dotenv
 
 
-load_dotenv()
+BASE_DIR = Path(__file__).resolve().parent.parent
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
+
+def _bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() == "true"
+
+
+def _required(name: str) -> str:
+    value = os.getenv(name)
+    if not value:
+        raise RuntimeError(f"Environment variable {name} is not set, see env.example")
+    return value
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """
+    Настройки приложения из переменных окружения и .env.
+    """
+
+    # Обязательные: без них приложение не запускается
+    database_url: str
+    secret_key: str
+    algorithm: str
+
+    # Файлы товаров и журнал запросов
+    media_root: Path
+    log_file: str | None
+
+    # Флеш-распродажи: максимальный размер пачки заказов на один коммит и длина очереди на товар
+    flash_sale_batch_size: int
+    flash_sale_queue_size: int
+    # Сколько секунд считать товар распроданным без повторной проверки в базе
+    flash_sale_sold_out_ttl: float
+
+    # Idempotency-Key: сколько хранить ответ, сколько ждать дубль и когда считать владельца ключа упавшим
+    idempotency_ttl: int
+    idempotency_wait_timeout: float
+    idempotency_lock_timeout: int
+
+    # Ограничение частоты запросов. Без rate_limit_redis_url лимиты считаются в каждом воркере отдельно
+    rate_limit_enabled: bool
+    rate_limit_redis_url: str | None
+    rate_limit_sync_interval: float
+    # Сколько прокси перед приложением дописывают адрес клиента в X-Forwarded-For (0 — заголовку не доверяем)
+    trusted_proxy_hops: int
+
+    # Пул соединений с базой: сколько ждать свободное соединение, прежде чем ответить 503
+    db_echo: bool
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: float
+    db_shed_retry_after: int
+    # statement_timeout по умолчанию для запросов из маршрутов, мс (0 — без ограничения)
+    db_statement_timeout: int
+
+    # Запуск и остановка: сколько соединений открыть заранее и сколько ждать завершения запросов
+    db_warmup_connections: int
+    shutdown_drain_timeout: float
+    # Сколько секунд дерево категорий берётся из кеша воркера
+    category_tree_ttl: float
+
+    # Redis для версий каталога (ETag). Без него версии хранятся в памяти воркера и верны только при одном воркере
+    cache_redis_url: str | None
+
+    # Очистка CDN по surrogate-ключам: адрес API очистки, токен и как часто отправлять накопленные ключи
+    edge_purge_url: str | None
+    edge_purge_token: str | None
+    edge_purge_interval: float
+
+    # Объединение одинаковых одновременных чтений каталога: сколько дубль ждёт ведущий запрос
+    # и что делать, если не дождался (execute — выполнить самому, reject — ответить 503)
+    coalesce_enabled: bool
+    coalesce_max_wait: float
+    coalesce_fallback: Literal["execute", "reject"]
+
+    # Проверка готовности: кеш результата, таймаут и порог задержки пинга, минимальный запас пула
+    health_cache_ttl: float
+    health_probe_timeout: float
+    health_db_latency_threshold: float
+    health_min_pool_headroom: int
+    # Брокер Celery; если задан, его доступность входит в проверку готовности.
+    # Без брокера задачи ходят через память процесса (memory://), что годится только для разработки
+    celery_broker_url: str | None
+    celery_result_backend: str | None
+    # Выполнять задачи сразу в вызывающем процессе, без брокера и воркера (тесты)
+    celery_task_always_eager: bool
+    # Пул соединений с базой в каждом процессе воркера Celery
+    celery_db_pool_size: int
+
+    # Счётчики просмотров товаров: как часто сбрасывать буфер воркера в базу (с) и при скольких товарах — сразу
+    product_stats_flush_interval: float
+    product_stats_flush_threshold: int
+
+    # «Сейчас популярно»: сколько товаров отслеживать, период полураспада веса событий (с)
+    # и как часто воркеры обмениваются снимками через cache_redis_url (с)
+    trending_capacity: int
+    trending_half_life: float
+    trending_sync_interval: float
+
+    # «С этим товаром покупают»: заказов на пачку пересчёта, длина списка, минимальные support (число
+    # совместных заказов) и lift пары
+    also_bought_chunk_size: int
+    also_bought_top_n: int
+    also_bought_min_orders: int
+    also_bought_min_lift: float
+    # Через сколько секунд после начала транзакции заказ считается окончательным: не меньше удвоенной
+    # длительности самой долгой транзакции оформления заказа (statement_timeout checkout — 10 с)
+    also_bought_settle_delay: float
+
+    # Похожие товары: товаров на пачку подписи и пересчёта, длина списка и минимальная оценка сходства (0..1)
+    similar_chunk_size: int
+    similar_top_n: int
+    similar_min_score: float
+    # Насколько (доля) должно измениться число активных товаров, чтобы началась новая эпоха словаря IDF
+    # и все сигнатуры были построены заново
+    similar_vocabulary_drift: float
+
+    # Transactional outbox: размер пачки ретранслятора, период опроса без уведомлений (с),
+    # число попыток отправки события и сколько хранить отправленные и так и не отправленные события (с)
+    outbox_batch_size: int
+    outbox_poll_interval: float
+    outbox_max_attempts: int
+    outbox_retention: int
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_url=_required("POSTGRESQL"),
+            secret_key=_required("SECRET_KEY"),
+            algorithm=_required("ALGORITHM"),
+            media_root=Path(os.getenv("MEDIA_ROOT", str(BASE_DIR / "media"))),
+            log_file=os.getenv("LOG_FILE", "info.log") or None,
+            flash_sale_batch_size=int(os.getenv("FLASH_SALE_BATCH_SIZE", "200")),
+            flash_sale_queue_size=int(os.getenv("FLASH_SALE_QUEUE_SIZE", "10000")),
+            flash_sale_sold_out_ttl=float(os.getenv("FLASH_SALE_SOLD_OUT_TTL", "1.0")),
+            idempotency_ttl=int(os.getenv("IDEMPOTENCY_TTL", str(24 * 60 * 60))),
+            idempotency_wait_timeout=float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "10.0")),
+            idempotency_lock_timeout=int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "60")),
+            rate_limit_enabled=_bool("RATE_LIMIT_ENABLED", True),
+            rate_limit_redis_url=os.getenv("RATE_LIMIT_REDIS_URL"),
+            rate_limit_sync_interval=float(os.getenv("RATE_LIMIT_SYNC_INTERVAL", "0.1")),
+            trusted_proxy_hops=int(os.getenv("TRUSTED_PROXY_HOPS", "0")),
+            db_echo=_bool("DB_ECHO", False),
+            db_pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            db_pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "2.0")),
+            db_shed_retry_after=int(os.getenv("DB_SHED_RETRY_AFTER", "1")),
+            db_statement_timeout=int(os.getenv("DB_STATEMENT_TIMEOUT", "5000")),
+            db_warmup_connections=int(os.getenv("DB_WARMUP_CONNECTIONS", "5")),
+            shutdown_drain_timeout=float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20")),
+            category_tree_ttl=float(os.getenv("CATEGORY_TREE_TTL", "30")),
+            cache_redis_url=os.getenv("CACHE_REDIS_URL"),
+            edge_purge_url=os.getenv("EDGE_PURGE_URL"),
+            edge_purge_token=os.getenv("EDGE_PURGE_TOKEN"),
+            edge_purge_interval=float(os.getenv("EDGE_PURGE_INTERVAL", "0.5")),
+            coalesce_enabled=_bool("COALESCE_ENABLED", True),
+            coalesce_max_wait=float(os.getenv("COALESCE_MAX_WAIT", "2.0")),
+            coalesce_fallback="reject" if os.getenv("COALESCE_FALLBACK") == "reject" else "execute",
+            health_cache_ttl=float(os.getenv("HEALTH_CACHE_TTL", "1.0")),
+            health_probe_timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT", "1.0")),
+            health_db_latency_threshold=float(os.getenv("HEALTH_DB_LATENCY_THRESHOLD", "0.25")),
+            health_min_pool_headroom=int(os.getenv("HEALTH_MIN_POOL_HEADROOM", "1")),
+            celery_broker_url=os.getenv("CELERY_BROKER_URL"),
+            celery_result_backend=os.getenv("CELERY_RESULT_BACKEND"),
+            celery_task_always_eager=_bool("CELERY_TASK_ALWAYS_EAGER", False),
+            celery_db_pool_size=int(os.getenv("CELERY_DB_POOL_SIZE", "2")),
+            product_stats_flush_interval=float(os.getenv("PRODUCT_STATS_FLUSH_INTERVAL", "10.0")),
+            product_stats_flush_threshold=int(os.getenv("PRODUCT_STATS_FLUSH_THRESHOLD", "5000")),
+            trending_capacity=int(os.getenv("TRENDING_CAPACITY", "1000")),
+            trending_half_life=float(os.getenv("TRENDING_HALF_LIFE", "3600")),
+            trending_sync_interval=float(os.getenv("TRENDING_SYNC_INTERVAL", "10.0")),
+            also_bought_chunk_size=int(os.getenv("ALSO_BOUGHT_CHUNK_SIZE", "5000")),
+            also_bought_top_n=int(os.getenv("ALSO_BOUGHT_TOP_N", "10")),
+            also_bought_min_orders=int(os.getenv("ALSO_BOUGHT_MIN_ORDERS", "2")),
+            also_bought_min_lift=float(os.getenv("ALSO_BOUGHT_MIN_LIFT", "1.0")),
+            also_bought_settle_delay=float(os.getenv("ALSO_BOUGHT_SETTLE_DELAY", "60")),
+            similar_chunk_size=int(os.getenv("SIMILAR_CHUNK_SIZE", "2000")),
+            similar_top_n=int(os.getenv("SIMILAR_TOP_N", "20")),
+            similar_min_score=float(os.getenv("SIMILAR_MIN_SCORE", "0.3")),
+            similar_vocabulary_drift=float(os.getenv("SIMILAR_VOCABULARY_DRIFT", "0.1")),
+            outbox_batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "100")),
+            outbox_poll_interval=float(os.getenv("OUTBOX_POLL_INTERVAL", "5.0")),
+            outbox_max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10")),
+            outbox_retention=int(os.getenv("OUTBOX_RETENTION", str(24 * 60 * 60))),
+        )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Читает настройки один раз за процесс; .env не переопределяет уже заданные переменные окружения.
+    """
+    load_dotenv()
+    return Settings.from_env()
@@ -1,20 +1,59 @@
 from celery import Celery
+from celery.schedules import crontab
+from kombu import Queue
 
+from app.config import get_settings
+
+
+# Очереди воркеров. Лёгкие задачи (события, счётчики, очистка) не ждут за тяжёлыми (файлы, выгрузки):
+# у каждой очереди свои процессы воркера, см. docker-compose.prod.yml
+LIGHT_QUEUE = "light"
+HEAVY_QUEUE = "heavy"
+
+settings = get_settings()
 
 celery_app = Celery(
-    __name__,
-    broker="redis://:aSDj1k2n!ewmdk@127.0.0.1:6379/0",
-    backend="redis://:aSDj1k2n!ewmdk@127.0.0.1:6379/0",
+    "app",
+    broker=settings.celery_broker_url or "memory://",
+    backend=settings.celery_result_backend,
     broker_connection_retry_on_startup=True,
 )
 
-celery_app.autodiscover_tasks(["app.tasks"])
-
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    result_serializer="json",
+    # Результаты задач нигде не читаются; у задач, которым он нужен, ignore_result=False
+    task_ignore_result=True,
+    task_queues=[Queue(LIGHT_QUEUE), Queue(HEAVY_QUEUE)],
+    task_default_queue=LIGHT_QUEUE,
+    task_routes={
+        "app.tasks.media.*": {"queue": HEAVY_QUEUE},
+        "app.tasks.recommendations.*": {"queue": HEAVY_QUEUE},
+    },
+    # Задача подтверждается после выполнения: упавший воркер не теряет её, поэтому задачи идемпотентны
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    task_always_eager=settings.celery_task_always_eager,
+    task_eager_propagates=True,
+    beat_schedule={
+        "purge-expired-idempotency-keys": {
+            "task": "app.tasks.maintenance.purge_expired_idempotency_keys",
+            "schedule": crontab(minute="*/15"),
+        },
+        "update-also-bought": {
+            "task": "app.tasks.recommendations.update_also_bought",
+            "schedule": crontab(minute="*/10"),
+        },
+        "update-similar-products": {
+            "task": "app.tasks.recommendations.update_similar_products",
+            "schedule": crontab(minute="5-59/10"),
+        },
+        "remove-orphan-product-images": {
+            "task": "app.tasks.media.remove_orphan_product_images",
+            "schedule": crontab(hour="4", minute="0"),
+        },
+    },
+)
 
-celery_app.conf.beat_schedule = {
-    "run-me-background-task": {
-        "task": "app.tasks.task.call_background_task",
-        "schedule": 60.0,
-        "args": ("Test text message",),
-    }
-}
+celery_app.autodiscover_tasks(["app.tasks"])
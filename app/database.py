@@ -1,20 +1,76 @@
-import os
+from typing import Any, cast
 
-from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Session, SessionTransaction
 
+from app.config import get_settings
+from app.metrics import metrics
 
-load_dotenv()
 
-# Строка подключения для PostgreSQl
-DATABASE_URL = os.getenv("POSTGRESQL")
+_engine: AsyncEngine | None = None
 
-# Создаём engine
-async_engine = create_async_engine(DATABASE_URL, echo=True)
+# Фабрика сеансов; engine привязывается к ней в get_engine()
+async_session_maker = async_sessionmaker(expire_on_commit=False, class_=AsyncSession)
 
-# Настраиваем фабрику сеансов
-async_session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+
+def get_engine() -> AsyncEngine:
+    """
+    Создаёт engine при первом обращении (обычно при старте приложения) и привязывает к нему фабрику сеансов.
+    """
+    global _engine
+    if _engine is None:
+        settings = get_settings()
+        _engine = create_async_engine(
+            settings.database_url,
+            echo=settings.db_echo,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            # Освободившееся соединение выдаётся первым: повторная сессия того же запроса (после commit)
+            # получает соединение с уже выставленным statement_timeout
+            pool_use_lifo=True,
+            # Значение по умолчанию задаётся при подключении и не стоит запроса в каждой транзакции
+            connect_args={"server_settings": {"statement_timeout": str(settings.db_statement_timeout)}},
+        )
+        async_session_maker.configure(bind=_engine)
+    return _engine
+
+
+async def dispose_engine() -> None:
+    """
+    Закрывает соединения пула. Следующий get_engine() создаст engine заново.
+    """
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_timeout(session: Session, transaction: SessionTransaction, connection: Connection) -> None:
+    """
+    Переключает statement_timeout (мс) соединения на значение, заданное сессии маршрутом.
+
+    SET без LOCAL остаётся на соединении и после транзакции: пока соединение обслуживает маршруты
+    с тем же значением, лишнего запроса к базе нет. Значение по умолчанию задаётся при подключении.
+    """
+    default = get_settings().db_statement_timeout
+    # Сессии вне маршрутов (фоновые задачи воркера) работают со значением по умолчанию
+    timeout = session.info.get("statement_timeout", default)
+    if connection.info.get("statement_timeout", default) == timeout:
+        return
+    # SET выполняется вне транзакции сессии: asyncpg открывает её только с первым запросом, а откат
+    # (им закрывается каждая сессия только для чтения) отменил бы SET, и следующий запрос повторил бы его
+    dbapi_connection = cast(Any, connection.connection.dbapi_connection)
+    dbapi_connection.autocommit = True
+    try:
+        connection.exec_driver_sql(f"SET statement_timeout = {int(timeout)}")
+    finally:
+        dbapi_connection.autocommit = False
+    connection.info["statement_timeout"] = timeout
+    metrics.inc("db_statement_timeout_set_total")
 
 
 # Определяем базовый класс для моделей
@@ -1,13 +1,46 @@
 from collections.abc import AsyncGenerator
 
+from fastapi import HTTPException, Request, status
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import get_settings
 from app.database import async_session_maker
+from app.metrics import metrics
 
 
-async def get_async_db() -> AsyncGenerator[AsyncSession]:
+# statement_timeout (мс) для маршрутов, которым не подходит значение по умолчанию
+ROUTE_STATEMENT_TIMEOUTS: dict[tuple[str, str], int] = {
+    ("GET", "/products/"): 2000,
+    ("GET", "/products/{product_id}"): 500,
+    ("POST", "/users/token"): 1000,
+    ("POST", "/products/bulk"): 15000,
+    ("POST", "/orders/checkout"): 10000,
+}
+
+
+def _statement_timeout(request: Request) -> int:
+    route = request.scope.get("route")
+    path = getattr(route, "path", request.url.path)
+    return ROUTE_STATEMENT_TIMEOUTS.get((request.method, path), get_settings().db_statement_timeout)
+
+
+async def get_async_db(request: Request) -> AsyncGenerator[AsyncSession]:
     """
     Предоставляет асинхронную сессию SQLAlchemy для работы с базой данных PostgreSQL.
+
+    Соединение берётся из пула сразу: если свободного соединения нет дольше DB_POOL_TIMEOUT,
+    запрос отклоняется с 503 и Retry-After, не дожидаясь очереди к перегруженной базе.
     """
     async with async_session_maker() as session:
+        session.info["statement_timeout"] = _statement_timeout(request)
+        try:
+            await session.connection()
+        except PoolTimeoutError:
+            metrics.inc("db_pool_shed_total")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Service is overloaded, try again later",
+                headers={"Retry-After": str(get_settings().db_shed_retry_after)},
+            ) from None
         yield session
@@ -0,0 +1,60 @@
+from fastapi import Depends, HTTPException, Query, Request, Response, status
+
+from app.cache_control import set_surrogate_keys
+from app.depends.product_depends import batch_product_ids
+from app.metrics import metrics
+from app.services.catalog_versions import CATALOG, CATEGORIES, catalog_versions, category_key, product_key
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # Для If-None-Match используется слабое сравнение: W/"x" совпадает с "x"
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def conditional_get(request: Request, response: Response, keys: list[str]) -> None:
+    """
+    Ставит ETag из версий keys и отвечает 304, если клиент прислал тот же ETag.
+
+    Зависимость объявляется в маршруте раньше get_async_db: неизменённый ответ не берёт соединение из пула.
+    Те же ключи становятся surrogate-ключами ответа: их изменение и меняет ETag, и очищает кеш.
+    """
+    set_surrogate_keys(response, keys)
+    etag = await catalog_versions.etag(keys)
+    if etag is None:
+        return
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        metrics.inc("etag_not_modified_total", route=request.scope["route"].path)
+        raise HTTPException(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Surrogate-Key": response.headers["Surrogate-Key"]},
+        )
+    response.headers["ETag"] = etag
+
+
+async def categories_etag(request: Request, response: Response) -> None:
+    await conditional_get(request, response, [CATEGORIES])
+
+
+async def products_etag(
+    request: Request, response: Response, category_id: int | None = Query(None, include_in_schema=False)
+) -> None:
+    # Список с фильтром по категории зависит только от её товаров, без фильтра — от всего каталога
+    keys = [category_key(category_id), CATEGORIES] if category_id is not None else [CATALOG]
+    await conditional_get(request, response, keys)
+
+
+async def category_products_etag(category_id: int, request: Request, response: Response) -> None:
+    await conditional_get(request, response, [category_key(category_id), CATEGORIES])
+
+
+async def product_etag(product_id: int, request: Request, response: Response) -> None:
+    # Товар становится недоступен и при отключении его категории
+    await conditional_get(request, response, [product_key(product_id), CATEGORIES])
+
+
+async def products_batch_etag(
+    request: Request, response: Response, ids: list[int] = Depends(batch_product_ids)
+) -> None:
+    await conditional_get(request, response, [*(product_key(product_id) for product_id in ids), CATEGORIES])
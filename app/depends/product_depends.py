@@ -0,0 +1,48 @@
+from fastapi import HTTPException, Query, status
+
+from app.schemas.products import PRODUCT_FIELDS
+
+
+# Сколько товаров можно запросить в /products/batch за раз
+MAX_BATCH_IDS = 200
+
+
+def product_fields(
+    fields: str | None = Query(
+        None,
+        description="Поля товара через запятую, например id,name,price,image_url,rating. По умолчанию — все",
+        examples=["id,name,price,image_url,rating"],
+    ),
+) -> tuple[str, ...] | None:
+    """
+    Разбирает fields=. Возвращает поля в порядке схемы Product (id всегда включён) или None, если нужны все.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(PRODUCT_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown product fields: {', '.join(sorted(unknown))}"
+        )
+    requested.add("id")
+    return tuple(name for name in PRODUCT_FIELDS if name in requested)
+
+
+def batch_product_ids(
+    ids: str = Query(description=f"id товаров через запятую, не больше {MAX_BATCH_IDS}", examples=["12,7,105"]),
+) -> list[int]:
+    """
+    Разбирает ids=. Порядок сохраняется, повторы отбрасываются.
+    """
+    try:
+        parsed = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be comma-separated integers"
+        ) from None
+    if not parsed or len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Between 1 and {MAX_BATCH_IDS} ids are allowed"
+        )
+    return parsed
@@ -0,0 +1,212 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from sqlalchemy import and_, delete, func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.auth import get_user_id_from_token
+from app.config import get_settings
+from app.database import async_session_maker
+from app.load_shedding import CLIENT_CLOSED_REQUEST
+from app.models.idempotency_keys import IdempotencyKey as IdempotencyKeyModel
+
+
+# Маршруты, повтор которых клиентом не должен повторно выполнять транзакцию
+IDEMPOTENT_ROUTES = {("POST", "/orders/checkout"), ("POST", "/products/bulk")}
+MAX_KEY_LENGTH = 255
+
+
+@dataclass(slots=True, frozen=True)
+class StoredResponse:
+    """
+    Сохранённый ответ на первый запрос с данным Idempotency-Key.
+    """
+
+    request_path: str
+    status_code: int
+    content_type: str | None
+    body: bytes
+
+    def replay(self) -> Response:
+        return Response(
+            content=self.body,
+            status_code=self.status_code,
+            media_type=self.content_type,
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+
+# Запросы, выполняющиеся в этом воркере: дубли ждут их, не обращаясь к базе
+_inflight: dict[tuple[int, str], asyncio.Future[StoredResponse | None]] = {}
+
+
+async def _claim(user_id: int, key: str, path: str) -> bool:
+    """
+    Пытается занять ключ. Занять можно новый ключ, ключ с истёкшим TTL или ключ, владелец которого завис.
+    """
+    expires_at = datetime.now(UTC) + timedelta(seconds=get_settings().idempotency_ttl)
+    stmt = (
+        insert(IdempotencyKeyModel)
+        .values(user_id=user_id, key=key, request_path=path, expires_at=expires_at)
+        .on_conflict_do_update(
+            index_elements=[IdempotencyKeyModel.user_id, IdempotencyKeyModel.key],
+            set_={
+                "request_path": path,
+                "status_code": None,
+                "content_type": None,
+                "response_body": None,
+                "created_at": func.now(),
+                "expires_at": expires_at,
+            },
+            where=or_(
+                IdempotencyKeyModel.expires_at < func.now(),
+                and_(
+                    IdempotencyKeyModel.status_code.is_(None),
+                    IdempotencyKeyModel.created_at
+                    < func.now() - timedelta(seconds=get_settings().idempotency_lock_timeout),
+                ),
+            ),
+        )
+        .returning(IdempotencyKeyModel.user_id)
+    )
+    async with async_session_maker() as db:
+        claimed = await db.scalar(stmt)
+        await db.commit()
+    return claimed is not None
+
+
+async def _load(user_id: int, key: str) -> IdempotencyKeyModel | None:
+    async with async_session_maker() as db:
+        return await db.get(IdempotencyKeyModel, (user_id, key))
+
+
+async def _save(user_id: int, key: str, stored: StoredResponse) -> None:
+    async with async_session_maker() as db:
+        await db.execute(
+            update(IdempotencyKeyModel)
+            .where(IdempotencyKeyModel.user_id == user_id, IdempotencyKeyModel.key == key)
+            .values(
+                status_code=stored.status_code,
+                content_type=stored.content_type,
+                response_body=stored.body,
+                expires_at=datetime.now(UTC) + timedelta(seconds=get_settings().idempotency_ttl),
+            )
+        )
+        await db.commit()
+
+
+async def _release(user_id: int, key: str) -> None:
+    """
+    Освобождает ключ, чтобы повтор запроса выполнился заново.
+    """
+    async with async_session_maker() as db:
+        await db.execute(
+            delete(IdempotencyKeyModel).where(IdempotencyKeyModel.user_id == user_id, IdempotencyKeyModel.key == key)
+        )
+        await db.commit()
+
+
+async def _wait_stored(user_id: int, key: str) -> StoredResponse | None:
+    """
+    Ждёт, пока запрос с этим ключом завершится в другом воркере. None — не дождались.
+    """
+    deadline = time.monotonic() + get_settings().idempotency_wait_timeout
+    delay = 0.05
+    while True:
+        row = await _load(user_id, key)
+        if row is None:
+            return None
+        if row.status_code is not None:
+            return StoredResponse(row.request_path, row.status_code, row.content_type, row.response_body or b"")
+        if time.monotonic() + delay > deadline:
+            return None
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def _replay(stored: StoredResponse | None, path: str) -> Response:
+    if stored is None:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"detail": "A request with this Idempotency-Key is still being processed"},
+            headers={"Retry-After": "1"},
+        )
+    if stored.request_path != path:
+        return JSONResponse(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            content={"detail": "Idempotency-Key has already been used for a different request"},
+        )
+    return stored.replay()
+
+
+async def _execute(request: Request, call_next: Any, user_id: int, key: str) -> tuple[Response, StoredResponse | None]:
+    """
+    Выполняет запрос владельцем ключа и сохраняет ответ. Ответы 5xx и 499 (клиент отключился, запрос отменён
+    на полпути) не сохраняются: повтор с тем же ключом выполняется заново.
+    """
+    try:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    except BaseException:
+        await _release(user_id, key)
+        raise
+
+    result = Response(content=body, status_code=response.status_code, headers=dict(response.headers))
+    if response.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR or response.status_code == CLIENT_CLOSED_REQUEST:
+        await _release(user_id, key)
+        return result, None
+
+    stored = StoredResponse(request.url.path, response.status_code, response.headers.get("content-type"), body)
+    await _save(user_id, key, stored)
+    return result, stored
+
+
+async def idempotency_middleware(request: Request, call_next: Any) -> Any:
+    key = request.headers.get("idempotency-key")
+    if key is None or (request.method, request.url.path) not in IDEMPOTENT_ROUTES:
+        return await call_next(request)
+
+    scheme, token = get_authorization_scheme_param(request.headers.get("authorization"))
+    user_id = get_user_id_from_token(token) if scheme.lower() == "bearer" else None
+    if user_id is None:
+        # Без валидного токена запрос всё равно завершится 401 в самом маршруте
+        return await call_next(request)
+
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": "Invalid Idempotency-Key"})
+
+    path = request.url.path
+    scope_key = (user_id, key)
+
+    inflight = _inflight.get(scope_key)
+    if inflight is not None:
+        try:
+            stored = await asyncio.wait_for(asyncio.shield(inflight), get_settings().idempotency_wait_timeout)
+        except TimeoutError:
+            return _replay(None, path)
+        if stored is not None:
+            return _replay(stored, path)
+        # Исходный запрос завершился ошибкой сервера или отменён — выполняем заново
+
+    future: asyncio.Future[StoredResponse | None] = asyncio.get_running_loop().create_future()
+    _inflight[scope_key] = future
+    try:
+        if await _claim(user_id, key, path):
+            response, stored = await _execute(request, call_next, user_id, key)
+            future.set_result(stored)
+            return response
+
+        stored = await _wait_stored(user_id, key)
+        future.set_result(stored)
+        return _replay(stored, path)
+    finally:
+        if not future.done():
+            future.set_result(None)
+        if _inflight.get(scope_key) is future:
+            del _inflight[scope_key]
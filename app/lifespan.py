@@ -0,0 +1,171 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from loguru import logger
+from sqlalchemy import Executable, text
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.auth import active_user_query
+from app.config import get_settings
+from app.database import async_session_maker, dispose_engine, get_engine
+from app.log import setup_logging
+from app.metrics import metrics
+from app.rate_limit import RedisCounterBackend, rate_limiter
+from app.routers.products import product_detail_query
+from app.services.catalog_versions import InMemoryVersionBackend, RedisVersionBackend, catalog_versions
+from app.services.category_tree import category_tree
+from app.services.edge_cache import edge_purger
+from app.services.health import readiness_probe
+from app.services.product_stats import product_stats
+from app.services.trending import RedisSnapshotStore, trending
+
+
+# Момент импорта приложения — точка отсчёта для времени до первого запроса
+PROCESS_STARTED = time.monotonic()
+
+# Запросы, которые выполняются почти на каждый HTTP-запрос. asyncpg кеширует подготовленные
+# выражения в каждом соединении, поэтому при старте они выполняются на всех прогреваемых соединениях
+HOT_STATEMENTS: list[Callable[[], Executable]] = [
+    lambda: text("SELECT 1"),
+    lambda: active_user_query(""),
+    lambda: product_detail_query(0),
+]
+
+
+class InFlightRequests:
+    """
+    Запросы в обработке в этом воркере: при остановке их дожидаются, прежде чем закрыть пул.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.first_request_done = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def started(self) -> None:
+        self.count += 1
+        self._idle.clear()
+
+    def finished(self) -> None:
+        self.count -= 1
+        if self.count == 0:
+            self._idle.set()
+        if not self.first_request_done:
+            self.first_request_done = True
+            elapsed = time.monotonic() - PROCESS_STARTED
+            metrics.set("time_to_first_request_seconds", round(elapsed, 3))
+            logger.info(f"First request served {elapsed:.3f} s after start")
+
+    async def drain(self) -> None:
+        if self.count == 0:
+            return
+        logger.info(f"Waiting for {self.count} in-flight requests")
+        try:
+            async with asyncio.timeout(get_settings().shutdown_drain_timeout):
+                await self._idle.wait()
+        except TimeoutError:
+            logger.warning(f"Shutdown with {self.count} requests still in flight")
+
+
+in_flight = InFlightRequests()
+
+
+class RequestTracker:
+    """
+    Учитывает каждый HTTP-запрос в in_flight.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        in_flight.started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            in_flight.finished()
+
+
+async def warm_up_pool(connections: int) -> None:
+    """
+    Открывает заранее до connections соединений пула и готовит на них горячие запросы.
+    """
+    connections = min(connections, get_settings().db_pool_size)
+    if connections <= 0:
+        return
+    barrier = asyncio.Barrier(connections)
+
+    async def warm() -> None:
+        async with async_session_maker() as db:
+            for statement in HOT_STATEMENTS:
+                await db.execute(statement())
+            # Держим соединение, пока не откроются остальные, иначе пул вернёт одно и то же.
+            # Откат возвращает соединение в пул, поэтому он после барьера
+            await barrier.wait()
+            await db.rollback()
+
+    # Ошибка одной задачи отменяет остальные: они не остаются ждать на барьере, держа соединения
+    try:
+        async with asyncio.TaskGroup() as group:
+            for _ in range(connections):
+                group.create_task(warm())
+    except ExceptionGroup as errors:
+        raise errors.exceptions[0] from None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Подготовка ресурсов до первого запроса и их освобождение при остановке воркера.
+    """
+    started = time.monotonic()
+    settings = get_settings()
+    log_handler = setup_logging(settings.log_file)
+    (settings.media_root / "products").mkdir(parents=True, exist_ok=True)
+
+    app.state.ready = False
+    # Engine создаётся сразу, даже если прогрев не удастся
+    get_engine()
+    if settings.rate_limit_redis_url:
+        rate_limiter.backend = RedisCounterBackend(settings.rate_limit_redis_url)
+    rate_limiter.sync_interval = settings.rate_limit_sync_interval
+    if settings.cache_redis_url:
+        catalog_versions.backend = RedisVersionBackend(settings.cache_redis_url)
+        trending.store = RedisSnapshotStore(settings.cache_redis_url)
+
+    try:
+        await warm_up_pool(settings.db_warmup_connections)
+        await category_tree.refresh()
+    except Exception as exc:
+        # Недоступная при старте база не должна мешать запуску: пул и кеш заполнятся при первых запросах
+        logger.warning(f"Warmup failed: {exc}")
+
+    app.state.ready = True
+    metrics.set("startup_seconds", round(time.monotonic() - started, 3))
+    logger.info(f"Worker ready in {time.monotonic() - started:.3f} s")
+    try:
+        yield
+    finally:
+        # uvicorn перестаёт принимать соединения по SIGTERM; дожидаемся уже начатых запросов
+        app.state.ready = False
+        await in_flight.drain()
+        # Накопленные просмотры пишутся, пока пул ещё открыт
+        await product_stats.close()
+        await rate_limiter.close()
+        rate_limiter.backend = None
+        await readiness_probe.close()
+        await catalog_versions.close()
+        await edge_purger.close()
+        await trending.close()
+        catalog_versions.backend = InMemoryVersionBackend()
+        await dispose_engine()
+        if log_handler is not None:
+            await logger.complete()
+            logger.remove(log_handler)
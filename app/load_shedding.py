@@ -0,0 +1,101 @@
+import asyncio
+import contextlib
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import DBAPIError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+from app.metrics import metrics
+
+
+QUERY_CANCELED_SQLSTATE = "57014"
+# Статус nginx для запросов, клиент которых закрыл соединение
+CLIENT_CLOSED_REQUEST = 499
+
+
+class CancelOnDisconnectMiddleware:
+    """
+    Отменяет обработку запроса, если клиент отключился до получения ответа.
+
+    Отмена прерывает ожидание запроса к базе: asyncpg отправляет серверу cancel,
+    и соединение возвращается в пул, а не обслуживает клиента, который уже ушёл.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+        disconnect: Message | None = None
+        response_started = False
+        response_complete = False
+
+        async def wrapped_receive() -> Message:
+            # После отключения любое чтение сразу получает http.disconnect
+            if disconnect is not None and messages.empty():
+                return disconnect
+            return await messages.get()
+
+        async def wrapped_send(message: Message) -> None:
+            nonlocal response_started, response_complete
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        async def run_app() -> None:
+            await self.app(scope, wrapped_receive, wrapped_send)
+
+        handler = asyncio.create_task(run_app())
+
+        async def watch_disconnect() -> None:
+            nonlocal disconnect
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    disconnect = message
+                    if not response_complete and not handler.done():
+                        metrics.inc("requests_cancelled_total")
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            # Отмену из-за отключения клиента не пробрасываем, остальные — пробрасываем
+            if disconnect is None:
+                raise
+            if not response_started:
+                # Внешним middleware нужен ответ; клиент его уже не получит
+                await send({"type": "http.response.start", "status": CLIENT_CLOSED_REQUEST, "headers": []})
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            watcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await watcher
+
+
+async def statement_timeout_handler(request: Request, exc: Exception) -> JSONResponse:
+    """
+    Превращает запросы, прерванные по statement_timeout, в 503 вместо 500.
+    Регистрируется для DBAPIError; исключение драйвера asyncpg лежит в orig или в его __cause__.
+    """
+    orig = exc.orig if isinstance(exc, DBAPIError) else None
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(getattr(orig, "__cause__", None), "sqlstate", None)
+    if sqlstate != QUERY_CANCELED_SQLSTATE:
+        raise exc
+    metrics.inc("db_statement_timeout_total")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Request took too long, try again later"},
+        headers={"Retry-After": str(get_settings().db_shed_retry_after)},
+    )
@@ -6,7 +6,15 @@ from fastapi.responses import JSONResponse
 from loguru import logger
 
 
-logger.add("info.log", format="Log: [{extra[log_id]}:{time} - {level} - {message}]", level="INFO", enqueue=True)
+def setup_logging(log_file: str | None) -> int | None:
+    """
+    Подключает файловый журнал запросов. Возвращает id обработчика для logger.remove() при остановке.
+    """
+    if not log_file:
+        return None
+    return logger.add(
+        log_file, format="Log: [{extra[log_id]}:{time} - {level} - {message}]", level="INFO", enqueue=True
+    )
 
 
 async def log_middleware(request: Request, call_next: Any) -> Any:
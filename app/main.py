@@ -1,17 +1,33 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-
+from sqlalchemy.exc import DBAPIError
+
+from app.cache_control import cache_control_middleware
+from app.coalescing import coalescing_middleware
+from app.config import get_settings
+from app.idempotency import idempotency_middleware
+from app.lifespan import RequestTracker, lifespan
+from app.load_shedding import CancelOnDisconnectMiddleware, statement_timeout_handler
 from app.log import log_middleware
-from app.routers import carts, categories, orders, products, reviews, users
-
-
-# from app.tasks.task import call_background_task
+from app.metrics import metrics
+from app.rate_limit import rate_limit_middleware
+from app.routers import cache, carts, categories, health, orders, products, reviews, users
 
 
 # Создаём приложение FastAPI
-app = FastAPI(title="FastAPI интернет-магазин", version="0.1.0")
-
+app = FastAPI(title="FastAPI интернет-магазин", version="0.1.0", lifespan=lifespan)
+
+# Добавлен первым, поэтому ближе всех к маршрутам: отмена не проходит через task group других middleware
+app.add_middleware(CancelOnDisconnectMiddleware)
+app.middleware("http")(coalescing_middleware)
+# Снаружи объединения запросов: заголовки кеширования зависят от Authorization конкретного запроса
+app.middleware("http")(cache_control_middleware)
+app.middleware("http")(idempotency_middleware)
+app.middleware("http")(rate_limit_middleware)
 app.middleware("http")(log_middleware)
+app.add_middleware(RequestTracker)
+app.add_exception_handler(DBAPIError, statement_timeout_handler)
 
 # Подключаем маршруты категорий
 app.include_router(categories.router)
@@ -20,9 +36,12 @@ app.include_router(users.router)
 app.include_router(reviews.router)
 app.include_router(carts.router)
 app.include_router(orders.router)
+app.include_router(health.router)
+app.include_router(cache.router)
 
 
-app.mount("/media", StaticFiles(directory="media"), name="media")
+# Каталог создаётся при старте в lifespan
+app.mount("/media", StaticFiles(directory=get_settings().media_root, check_dir=False), name="media")
 
 
 # Корневой эндпойнт для проверки
@@ -34,8 +53,9 @@ async def root() -> dict:
     return {"message": "Добро пожаловать в API интернет-магазина"}
 
 
-# Проверка работы Celery
-# @app.get("/test", tags=["root"])
-# async def hello_world(message: str) -> dict:
-#     call_background_task.apply_async(args=[message], expires=3600)
-#     return {"message": "Hello World!"}
+@app.get("/metrics", tags=["root"], response_class=PlainTextResponse)
+async def get_metrics() -> str:
+    """
+    Счётчики текущего воркера в текстовом формате Prometheus.
+    """
+    return metrics.render()
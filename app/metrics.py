@@ -0,0 +1,42 @@
+from collections import defaultdict
+
+
+class Metrics:
+    """
+    Счётчики процесса в формате, который понимает Prometheus.
+
+    Значения не агрегируются между воркерами gunicorn: каждый воркер отдаёт свои.
+    """
+
+    def __init__(self) -> None:
+        self._counters: defaultdict[tuple[str, tuple[tuple[str, str], ...]], float] = defaultdict(float)
+        self._gauges: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        """
+        Увеличивает счётчик name с метками labels.
+        """
+        self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """
+        Устанавливает текущее значение показателя name.
+        """
+        self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def value(self, name: str, **labels: str) -> float:
+        key = (name, tuple(sorted(labels.items())))
+        return self._counters.get(key, self._gauges.get(key, 0.0))
+
+    def render(self) -> str:
+        """
+        Отдаёт все показатели в текстовом формате Prometheus.
+        """
+        lines = []
+        for (name, labels), value in sorted([*self._counters.items(), *self._gauges.items()]):
+            label_str = ",".join(f'{key}="{val}"' for key, val in labels)
+            lines.append(f"{name}{{{label_str}}} {value:g}" if label_str else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -1,19 +1,16 @@
 import asyncio
-import os
 from logging.config import fileConfig
 
 from alembic import context
-from dotenv import load_dotenv
 from sqlalchemy import pool
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 
+from app.config import get_settings
 from app.database import Base
 from app import models
 
-load_dotenv()
-
-database_url = os.getenv("POSTGRESQL")
+database_url = get_settings().database_url
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,46 @@
+"""add catalog filter indexes
+
+Revision ID: e63f1a9c2b85
+Revises: 6e8e00acb07e
+Create Date: 2026-10-19 19:12:05.284417
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from app.utils.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e63f1a9c2b85"
+down_revision: str | Sequence[str] | None = "6e8e00acb07e"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    create_index_concurrently(
+        "ix_products_category_id_price", "products", ["category_id", "price"], postgresql_where=sa.text("is_active")
+    )
+    create_index_concurrently(
+        "ix_products_out_of_stock",
+        "products",
+        ["id"],
+        postgresql_include=["category_id"],
+        postgresql_where=sa.text("is_active AND stock = 0"),
+    )
+    create_index_concurrently("ix_products_price", "products", ["price"], postgresql_where=sa.text("is_active"))
+    create_index_concurrently("ix_products_seller_id", "products", ["seller_id"], postgresql_where=sa.text("is_active"))
+    create_index_concurrently("ix_reviews_product_id_user_id", "reviews", ["product_id", "user_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently("ix_reviews_product_id_user_id", "reviews")
+    drop_index_concurrently("ix_products_seller_id", "products")
+    drop_index_concurrently("ix_products_price", "products")
+    drop_index_concurrently("ix_products_out_of_stock", "products")
+    drop_index_concurrently("ix_products_category_id_price", "products")
@@ -0,0 +1,98 @@
+"""bilingual search vector
+
+Revision ID: f18b2d7e4a96
+Revises: e63f1a9c2b85
+Create Date: 2026-10-19 20:31:47.905613
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+from app.utils.migrations import (
+    backfill,
+    create_index_concurrently,
+    drop_index_concurrently,
+    set_lock_timeout,
+    set_not_null,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f18b2d7e4a96"
+down_revision: str | Sequence[str] | None = "e63f1a9c2b85"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Сгенерированный столбец tsv с конфигурацией english не стеммит русские слова. Заменить выражение
+    # GENERATED можно только пересборкой таблицы, поэтому новый вектор — обычный столбец с триггером,
+    # заполняемый пачками без блокировки записи
+    set_lock_timeout()
+    # IF [NOT] EXISTS: шаги ниже коммитятся по отдельности, и миграцию, упавшую после них
+    # (например, на lock_timeout), можно запустить заново
+    op.add_column("products", sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True), if_not_exists=True)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION product_search_vector(name text, description text) RETURNS tsvector
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT setweight(to_tsvector('russian', coalesce(name, '')), 'A')
+                || setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION products_search_vector() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_vector := product_search_vector(NEW.name, NEW.description);
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER products_search_vector BEFORE INSERT OR UPDATE OF name, description ON products
+        FOR EACH ROW EXECUTE FUNCTION products_search_vector()
+        """
+    )
+
+    # Новые и изменённые товары вектор уже получают от триггера, остальные заполняются пачками
+    backfill("products", "search_vector = product_search_vector(name, description)", where="search_vector IS NULL")
+    set_not_null("products", "search_vector")
+    create_index_concurrently("ix_products_search_vector_gin", "products", ["search_vector"], postgresql_using="gin")
+
+    drop_index_concurrently("ix_products_tsv_gin", "products")
+    set_lock_timeout()
+    op.drop_column("products", "tsv", if_exists=True)
+    # Статистика нового столбца для планировщика; ANALYZE не блокирует запись
+    op.execute("ANALYZE products")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Возврат сгенерированного столбца перезаписывает таблицу под блокировкой: откат не онлайн
+    op.add_column(
+        "products",
+        sa.Column(
+            "tsv",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('english', coalesce(name, '')), 'A')"
+                " || setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+            nullable=False,
+        ),
+    )
+    op.execute("DROP TRIGGER IF EXISTS products_search_vector ON products")
+    op.execute("DROP FUNCTION IF EXISTS products_search_vector()")
+    op.drop_column("products", "search_vector")
+    op.execute("DROP FUNCTION IF EXISTS product_search_vector(text, text)")
+    create_index_concurrently("ix_products_tsv_gin", "products", ["tsv"], postgresql_using="gin")
@@ -1,9 +1,31 @@
 from app.models.cart_items import CartItem
 from app.models.categories import Category
+from app.models.idempotency_keys import IdempotencyKey
+from app.models.job_watermarks import JobWatermark
 from app.models.orders import Order, OrderItem
+from app.models.outbox_events import OutboxEvent
+from app.models.product_associations import ProductAssociation, ProductPairCount
+from app.models.product_similarities import ProductSignature, ProductSimilarity
+from app.models.product_stats import ProductStats
 from app.models.products import Product
 from app.models.reviews import Review
 from app.models.users import User
 
 
-__all__ = ["Category", "Review", "CartItem", "Order", "OrderItem", "Product", "User"]
+__all__ = [
+    "Category",
+    "Review",
+    "CartItem",
+    "IdempotencyKey",
+    "JobWatermark",
+    "Order",
+    "OrderItem",
+    "OutboxEvent",
+    "Product",
+    "ProductAssociation",
+    "ProductPairCount",
+    "ProductSignature",
+    "ProductSimilarity",
+    "ProductStats",
+    "User",
+]
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, String, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class JobWatermark(Base):
+    """
+    Докуда фоновая задача обработала входные строки: следующий запуск начинает с last_id + 1.
+    """
+
+    __tablename__ = "job_watermarks"
+
+    job: Mapped[str] = mapped_column(String(100), primary_key=True)
+    last_id: Mapped[int] = mapped_column(BigInteger, server_default=text("0"), nullable=False)
+    # Сколько строк обработано всего (например, заказов для support и lift)
+    processed: Mapped[int] = mapped_column(BigInteger, server_default=text("0"), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,34 @@
+from sqlalchemy import Float, ForeignKey, Integer, SmallInteger
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class ProductPairCount(Base):
+    """
+    Разреженная матрица совместных покупок: в скольких заказах есть оба товара.
+    Пара хранится в обе стороны; на диагонали (product_id = related_id) — число заказов с товаром.
+    """
+
+    __tablename__ = "product_pair_counts"
+
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    related_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    orders: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class ProductAssociation(Base):
+    """
+    Готовый список «с этим товаром покупают» для товара: первые N связей, отобранных по support и lift.
+    Ключ (product_id, rank) отдаёт весь список одним чтением индекса в нужном порядке.
+    """
+
+    __tablename__ = "product_associations"
+
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    rank: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    related_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    # Заказов с обоими товарами, доля заказов товара, в которых есть related, и lift пары
+    orders: Mapped[int] = mapped_column(Integer, nullable=False)
+    confidence: Mapped[float] = mapped_column(Float, nullable=False)
+    lift: Mapped[float] = mapped_column(Float, nullable=False)
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, ForeignKey, Index, Integer, LargeBinary, SmallInteger, String, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class ProductSignature(Base):
+    """
+    Сигнатура текста товара для поиска похожих: знаки случайных проекций TF-IDF вектора name и description (SimHash).
+    Угол между векторами двух товаров оценивается по числу различающихся битов их сигнатур.
+    """
+
+    __tablename__ = "product_signatures"
+
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    # md5 поискового вектора search_vector, по которому построена сигнатура: при изменении текста товар подписывается заново
+    digest: Mapped[str] = mapped_column(String(32), nullable=False)
+    # NULL — в тексте нет слов, по которым товары можно сравнить
+    signature: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    # Эпоха словаря IDF, с весами которого построена сигнатура: с новой эпохой товар подписывается заново
+    epoch: Mapped[int] = mapped_column(Integer, server_default=text("0"), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Когда пересчитан список похожих товара. NULL или раньше updated_at — список ждёт пересчёта
+    listed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_product_signatures_pending",
+            "product_id",
+            postgresql_where=text("listed_at IS NULL OR listed_at < updated_at"),
+        ),
+    )
+
+
+class ProductSimilarity(Base):
+    """
+    Готовый список похожих товаров: ближайшие по сигнатуре товары той же корневой категории.
+    Ключ (product_id, rank) отдаёт весь список одним чтением индекса в нужном порядке.
+    """
+
+    __tablename__ = "product_similarities"
+
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    rank: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    related_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Оценка косинусного сходства текстов по сигнатурам
+    score: Mapped[float] = mapped_column(Float, nullable=False)
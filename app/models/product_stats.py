@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class ProductStats(Base):
+    """
+    Накопленные счётчики популярности товара. Пишутся пачками из app.services.product_stats, не из маршрутов.
+    """
+
+    __tablename__ = "product_stats"
+
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    views: Mapped[int] = mapped_column(BigInteger, server_default=text("0"), nullable=False)
+    search_clicks: Mapped[int] = mapped_column(BigInteger, server_default=text("0"), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
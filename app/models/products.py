@@ -1,7 +1,20 @@
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, Computed, Float, ForeignKey, Index, Integer, Numeric, String
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    FetchedValue,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    event,
+    false,
+    text,
+)
 from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -16,6 +29,11 @@ if TYPE_CHECKING:
     from app.models.users import User
 
 
+# Конфигурация полнотекстового поиска. В russian кириллица стеммится russian_stem, а латиница — english_stem:
+# один вектор покрывает русские и английские названия, и запрос любого языка разбирается ею же
+SEARCH_CONFIG = "russian"
+
+
 class Product(Base):
     __tablename__ = "products"
 
@@ -29,18 +47,13 @@ class Product(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     rating: Mapped[Decimal] = mapped_column(Float, default=0.0)
     seller_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    # Товар участвует во флеш-распродаже: оформление заказов идёт через очередь с групповым коммитом
+    is_flash_sale: Mapped[bool] = mapped_column(Boolean, default=False, server_default=false(), nullable=False)
 
-    tsv: Mapped[TSVECTOR] = mapped_column(
-        TSVECTOR,
-        Computed(
-            """
-            setweight(to_tsvector('english', coalesce(name, '')), 'A')
-            ||
-            setweight(to_tsvector('english', coalesce(description, '')), 'B')
-            """,
-            persisted=True,
-        ),
-        nullable=False,
+    # Нужен только для поиска в WHERE и ORDER BY: в выборку товара по умолчанию не попадает.
+    # Заполняет триггер products_search_vector при вставке и изменении name или description
+    search_vector: Mapped[TSVECTOR] = mapped_column(
+        TSVECTOR, server_default=FetchedValue(), server_onupdate=FetchedValue(), nullable=False, deferred=True
     )
 
     category: Mapped["Category"] = relationship("Category", back_populates="products")
@@ -51,4 +64,46 @@ class Product(Base):
     )
     order_items: Mapped[list["OrderItem"]] = relationship("OrderItem", back_populates="product")
 
-    __table_args__ = (Index("ix_products_tsv_gin", "tsv", postgresql_using="gin"),)
+    __table_args__ = (
+        Index("ix_products_search_vector_gin", "search_vector", postgresql_using="gin"),
+        # Индексы под фильтры каталога. Покупателям видны только активные товары, поэтому индексы частичные:
+        # снятые с продажи товары их не раздувают
+        Index("ix_products_category_id_price", "category_id", "price", postgresql_where=text("is_active")),
+        Index("ix_products_price", "price", postgresql_where=text("is_active")),
+        Index("ix_products_seller_id", "seller_id", postgresql_where=text("is_active")),
+        # Товаров без остатка немного: in_stock=false читает только их и сразу в порядке id,
+        # а category_id в индексе позволяет посчитать total без чтения таблицы
+        Index(
+            "ix_products_out_of_stock",
+            "id",
+            postgresql_include=["category_id"],
+            postgresql_where=text("is_active AND stock = 0"),
+        ),
+    )
+
+
+# Поисковый вектор пересчитывает триггер, а не сгенерированный столбец: столбец GENERATED нельзя добавить или
+# изменить без перезаписи всей таблицы, а триггер с заполнением пачками ставится без простоя (см. миграцию)
+SEARCH_VECTOR_DDL = (
+    f"""
+    CREATE OR REPLACE FUNCTION product_search_vector(name text, description text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE AS $$
+        SELECT setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION products_search_vector() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := product_search_vector(NEW.name, NEW.description);
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER products_search_vector BEFORE INSERT OR UPDATE OF name, description ON products
+    FOR EACH ROW EXECUTE FUNCTION products_search_vector()
+    """,
+)
+for statement in SEARCH_VECTOR_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement))
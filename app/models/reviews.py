@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, CheckConstraint, ForeignKey, Integer, Text
+from sqlalchemy import Boolean, CheckConstraint, ForeignKey, Index, Integer, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -26,4 +26,8 @@ class Review(Base):
     product: Mapped["Product"] = relationship("Product", back_populates="reviews")
     user: Mapped["User"] = relationship("User", back_populates="reviews")
 
-    __table_args__ = (CheckConstraint("grade >= 1 AND grade <= 5"),)
+    __table_args__ = (
+        CheckConstraint("grade >= 1 AND grade <= 5"),
+        # Отзывы и средняя оценка товара, а также проверка повторного отзыва пользователя на товар
+        Index("ix_reviews_product_id_user_id", "product_id", "user_id"),
+    )
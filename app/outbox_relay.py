@@ -0,0 +1,34 @@
+"""
+Ретранслятор transactional outbox: пересылает события из таблицы outbox_events в Celery.
+
+Запускается отдельным процессом рядом с приложением; можно запустить несколько экземпляров.
+Строка подключения к базе — из POSTGRESQL, брокер — из настроек Celery.
+
+    python -m app.outbox_relay
+"""
+
+import asyncio
+import signal
+
+from loguru import logger
+
+from app.database import dispose_engine
+from app.services.outbox import OutboxRelay
+
+
+async def main() -> None:
+    relay = OutboxRelay()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, relay.stop)
+
+    logger.info("Outbox relay started")
+    try:
+        await relay.run()
+    finally:
+        await dispose_engine()
+    logger.info("Outbox relay stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
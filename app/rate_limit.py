@@ -0,0 +1,257 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Literal, Protocol
+
+import jwt
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from loguru import logger
+
+from app.config import get_settings
+from app.metrics import metrics
+
+
+@dataclass(frozen=True, slots=True)
+class RatePolicy:
+    """
+    Не больше limit запросов за period секунд на один ключ (пользователь или IP).
+    С param политика действует только на запросы с непустым параметром param, остальные запросы маршрута не ограничены.
+    """
+
+    name: str
+    limit: int
+    period: float
+    key: Literal["ip", "user"] = "ip"
+    param: str | None = None
+
+    def applies(self, request: Request) -> bool:
+        return self.param is None or bool(request.query_params.get(self.param, "").strip())
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+
+# Политики для дорогих маршрутов: bcrypt при логине, полнотекстовый поиск, пакетная вставка
+RATE_LIMIT_POLICIES: dict[tuple[str, str], RatePolicy] = {
+    ("POST", "/users/token"): RatePolicy(name="login", limit=10, period=60),
+    # Просмотр каталога (категории, фильтры, страницы) не ограничивается, только запросы с поиском
+    ("GET", "/products/"): RatePolicy(name="products_search", limit=20, period=1, key="user", param="search"),
+    ("POST", "/products/bulk"): RatePolicy(name="products_bulk", limit=10, period=60, key="user"),
+}
+
+
+class CounterBackend(Protocol):
+    """
+    Общее для всех воркеров хранилище счётчиков.
+    """
+
+    async def incr_many(self, deltas: dict[str, int], ttl: int) -> dict[str, int]: ...
+
+
+class InMemoryCounterBackend:
+    """
+    Хранилище счётчиков в памяти процесса. Подменяет Redis в тестах и при запуске в один воркер.
+    """
+
+    def __init__(self) -> None:
+        self._values: dict[str, tuple[int, float]] = {}
+
+    async def incr_many(self, deltas: dict[str, int], ttl: int) -> dict[str, int]:
+        now = time.monotonic()
+        result = {}
+        for key, delta in deltas.items():
+            value, expires = self._values.get(key, (0, 0.0))
+            if expires <= now:
+                value, expires = 0, now + ttl
+            self._values[key] = (value + delta, expires)
+            result[key] = value + delta
+        return result
+
+
+class RedisCounterBackend:
+    """
+    Хранилище счётчиков в Redis: одна транзакция INCRBY/EXPIRE на всю пачку ключей.
+    """
+
+    def __init__(self, url: str) -> None:
+        from redis.asyncio import Redis
+
+        self._redis = Redis.from_url(url)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+    async def incr_many(self, deltas: dict[str, int], ttl: int) -> dict[str, int]:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, delta in deltas.items():
+                pipe.incrby(key, delta)
+                pipe.expire(key, ttl)
+            replies = await pipe.execute()
+        return dict(zip(deltas, replies[::2], strict=True))
+
+
+@lru_cache(maxsize=4096)
+def _token_identity(token: str) -> tuple[int | None, float]:
+    """
+    Возвращает id пользователя и время истечения токена. Результат кешируется, чтобы не проверять подпись заново.
+    """
+    settings = get_settings()
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except jwt.PyJWTError:
+        return None, 0.0
+    user_id = payload.get("id")
+    return (user_id if isinstance(user_id, int) else None), float(payload.get("exp", 0))
+
+
+def client_ip(request: Request) -> str:
+    """
+    IP клиента с учётом X-Forwarded-For от доверенных прокси (nginx дописывает адрес в конец списка).
+    """
+    trusted_hops = get_settings().trusted_proxy_hops
+    forwarded = request.headers.get("x-forwarded-for") if trusted_hops else None
+    if forwarded:
+        hops = [ip.strip() for ip in forwarded.split(",")]
+        return hops[-min(trusted_hops, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit_key(request: Request, policy: RatePolicy) -> str:
+    if policy.key == "user":
+        scheme, token = get_authorization_scheme_param(request.headers.get("authorization"))
+        if token and scheme.lower() == "bearer":
+            user_id, expires = _token_identity(token)
+            if user_id is not None and expires > time.time():
+                return f"{policy.name}:u{user_id}"
+    return f"{policy.name}:{client_ip(request)}"
+
+
+class RateLimiter:
+    """
+    Ограничитель запросов: локальный token bucket на каждый запрос и,
+    при наличии общего хранилища, фоновая синхронизация счётчиков между воркерами.
+
+    На пути запроса нет сетевых вызовов: попадания копятся локально и раз в
+    sync_interval отправляются одной пачкой. Ключ, превысивший лимит в окне
+    суммарно по всем воркерам, блокируется до конца окна.
+    """
+
+    # Корзины упорядочены по последнему запросу: при переполнении вытесняется самая давняя за O(1)
+    MAX_BUCKETS = 100_000
+
+    def __init__(self, backend: CounterBackend | None = None, sync_interval: float = 0.1):
+        self.backend = backend
+        self.sync_interval = sync_interval
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+        self._pending: defaultdict[tuple[RatePolicy, int], defaultdict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        self._blocked: dict[str, float] = {}
+        self._sync_task: asyncio.Task | None = None
+
+    def check(self, key: str, policy: RatePolicy, now: float | None = None) -> float:
+        """
+        Учитывает запрос. Возвращает 0, если запрос разрешён, иначе через сколько секунд повторить.
+        """
+        now = time.monotonic() if now is None else now
+
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None:
+            if blocked_until > now:
+                return blocked_until - now
+            del self._blocked[key]
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                self._evict_oldest()
+            bucket = self._buckets[key] = [float(policy.limit), now]
+        else:
+            self._buckets.move_to_end(key)
+        tokens = min(policy.limit, bucket[0] + (now - bucket[1]) * policy.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return (1 - tokens) / policy.rate
+        bucket[0] = tokens - 1
+
+        if self.backend is not None:
+            window = int(time.time() // policy.period)
+            self._pending[(policy, window)][key] += 1
+            if self._sync_task is None or self._sync_task.done():
+                self._sync_task = asyncio.create_task(self._sync_loop())
+        return 0.0
+
+    def _evict_oldest(self) -> None:
+        """
+        Удаляет корзину ключа, который дольше всех не присылал запросов. Такая корзина почти всегда
+        уже наполнилась и ничего не ограничивает; если нет, ключ получит полную корзину при следующем запросе.
+        Блокировка по общему счётчику хранится отдельно и вытеснением не снимается.
+        """
+        self._buckets.popitem(last=False)
+        metrics.inc("rate_limit_evicted_total")
+
+    async def sync(self) -> None:
+        """
+        Отправляет накопленные попадания в общее хранилище и блокирует ключи, превысившие лимит.
+        """
+        if self.backend is None or not self._pending:
+            return
+        pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+        for (policy, window), deltas in pending.items():
+            shared = {f"rl:{key}:{window}": delta for key, delta in deltas.items()}
+            totals = await self.backend.incr_many(shared, ttl=math.ceil(policy.period) + 1)
+            window_end = time.monotonic() + (window + 1) * policy.period - time.time()
+            for key in deltas:
+                if totals[f"rl:{key}:{window}"] > policy.limit:
+                    self._blocked[key] = window_end
+
+    async def close(self) -> None:
+        """
+        Останавливает фоновую синхронизацию и отправляет накопленные попадания.
+        """
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+        try:
+            await self.sync()
+        except Exception as exc:
+            logger.warning(f"Rate limit sync failed: {exc}")
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            await close()
+
+    async def _sync_loop(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as exc:
+                # Недоступное хранилище не должно ронять запросы: остаётся локальный лимит
+                logger.warning(f"Rate limit sync failed: {exc}")
+
+
+# Общее хранилище подключается при старте приложения, см. app.lifespan
+rate_limiter = RateLimiter()
+
+
+async def rate_limit_middleware(request: Request, call_next: Any) -> Any:
+    policy = RATE_LIMIT_POLICIES.get((request.method, request.url.path)) if get_settings().rate_limit_enabled else None
+    if policy is None or not policy.applies(request):
+        return await call_next(request)
+
+    retry_after = rate_limiter.check(rate_limit_key(request, policy), policy)
+    if retry_after:
+        metrics.inc("rate_limit_rejected_total", policy=policy.name)
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": "Too many requests"},
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    return await call_next(request)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, status
+
+from app.auth import get_current_admin
+from app.models.users import User as UserModel
+from app.schemas.cache import CachePurge
+from app.services.catalog_versions import catalog_versions
+
+
+router = APIRouter(prefix="/cache", tags=["cache"])
+
+
+@router.post("/purge", status_code=status.HTTP_202_ACCEPTED)
+async def purge_cache(purge: CachePurge, current_user: UserModel = Depends(get_current_admin)) -> dict:
+    """
+    Инвалидирует закешированные ответы с указанными surrogate-ключами (только для 'admin').
+
+    Меняет версии ключей, поэтому ETag таких ответов больше не совпадут, и передаёт ключи в CDN, если он настроен.
+    """
+    await catalog_versions.bump_keys(purge.keys)
+    return {"purged": sorted(set(purge.keys))}
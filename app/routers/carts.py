@@ -2,9 +2,10 @@ from decimal import Decimal
 from typing import cast
 
 from fastapi import APIRouter, Depends, HTTPException, Response, status
-from sqlalchemy import delete, select
+from sqlalchemy import Insert, Integer, Update, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, joinedload
 
 from app.auth import get_current_user
 from app.depends.db_depends import get_async_db
@@ -14,6 +15,7 @@ from app.models.users import User as UserModel
 from app.schemas.carts import Cart as CartSchema
 from app.schemas.carts import CartItem as CartItemSchema
 from app.schemas.carts import CartItemCreate
+from app.services.product_loader import get_product_loader
 
 
 router = APIRouter(prefix="/cart", tags=["cart"])
@@ -23,11 +25,8 @@ async def _ensure_product_available(db: AsyncSession, product_id: int) -> None:
     """
     Эта функция проверяет, что товар с указанным product_id существует в базе данных, активен и доступен для добавления в корзину
     """
-    result = await db.scalars(
-        select(ProductModel).where(ProductModel.id == product_id, ProductModel.is_active.is_(True))
-    )
-    product = result.first()
-    if not product:
+    product = await get_product_loader(db).load(product_id)
+    if not product or not product.is_active:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found or inactive")
 
 
@@ -37,12 +36,22 @@ async def _get_cart_item(db: AsyncSession, user_id: int, product_id: int) -> Car
     """
     result = await db.scalars(
         select(CartItemModel)
-        .options(selectinload(CartItemModel.product))
+        .options(joinedload(CartItemModel.product))
         .where(CartItemModel.user_id == user_id, CartItemModel.product_id == product_id)
     )
     return cast(CartItemModel, result.first())
 
 
+async def _returning_cart_item(db: AsyncSession, stmt: Insert | Update) -> CartItemModel | None:
+    """
+    Выполняет INSERT или UPDATE позиции корзины и тем же запросом возвращает её вместе с товаром.
+    Если ни одна строка не изменилась, возвращает None
+    """
+    changed = aliased(CartItemModel, stmt.returning(*CartItemModel.__table__.c).cte("changed"))
+    result = await db.scalars(select(changed).options(joinedload(changed.product)))
+    return cast(CartItemModel | None, result.first())
+
+
 @router.get("/", response_model=CartSchema, status_code=status.HTTP_200_OK)
 async def get_cart(
     db: AsyncSession = Depends(get_async_db),
@@ -53,7 +62,7 @@ async def get_cart(
     """
     result = await db.scalars(
         select(CartItemModel)
-        .options(selectinload(CartItemModel.product))
+        .options(joinedload(CartItemModel.product))
         .where(CartItemModel.user_id == current_user.id)
         .order_by(CartItemModel.id)
     )
@@ -80,22 +89,21 @@ async def add_item_to_cart(
     """
     Добавление товара в корзину
     """
-    await _ensure_product_available(db, payload.product_id)
-
-    cart_item = await _get_cart_item(db, current_user.id, payload.product_id)
-    if cart_item:
-        cart_item.quantity += payload.quantity
-    else:
-        cart_item = CartItemModel(
-            user_id=current_user.id,
-            product_id=payload.product_id,
-            quantity=payload.quantity,
-        )
-        db.add(cart_item)
+    # Товар добавляется, только если он активен; повторное добавление увеличивает количество
+    source = select(literal(current_user.id, Integer), ProductModel.id, literal(payload.quantity, Integer)).where(
+        ProductModel.id == payload.product_id, ProductModel.is_active.is_(True)
+    )
+    stmt = insert(CartItemModel).from_select(["user_id", "product_id", "quantity"], source)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_cart_items_user_product",
+        set_={"quantity": CartItemModel.quantity + stmt.excluded.quantity, "updated_at": func.now()},
+    )
+    cart_item = await _returning_cart_item(db, stmt)
+    if not cart_item:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found or inactive")
 
     await db.commit()
-    updated_item = await _get_cart_item(db, current_user.id, payload.product_id)
-    return cast(CartItemModel, updated_item)
+    return cart_item
 
 
 @router.put("/items/{product_id}", response_model=CartItemSchema, status_code=status.HTTP_200_OK)
@@ -108,16 +116,24 @@ async def update_cart_item(
     """
     Обновление количества товаров в корзине:
     """
-    await _ensure_product_available(db, product_id)
-
-    cart_item = await _get_cart_item(db, current_user.id, product_id)
+    active_product = select(ProductModel.id).where(ProductModel.id == product_id, ProductModel.is_active.is_(True))
+    stmt = (
+        update(CartItemModel)
+        .where(
+            CartItemModel.user_id == current_user.id,
+            CartItemModel.product_id == product_id,
+            CartItemModel.product_id.in_(active_product),
+        )
+        .values(quantity=payload.quantity, updated_at=func.now())
+    )
+    cart_item = await _returning_cart_item(db, stmt)
     if not cart_item:
+        # Отличаем неактивный товар от отсутствующей позиции только на пути ошибки
+        await _ensure_product_available(db, product_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
 
-    cart_item.quantity = payload.quantity
     await db.commit()
-    update_item = await _get_cart_item(db, current_user.id, product_id)
-    return cast(CartItemModel, update_item)
+    return cart_item
 
 
 @router.delete("/items/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
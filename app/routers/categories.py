@@ -6,24 +6,24 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import get_current_user
 from app.depends.db_depends import get_async_db
+from app.depends.etag_depends import categories_etag
 from app.models.categories import Category as CategoryModel
 from app.models.users import User as UserModel
 from app.schemas.categories import Category as CategorySchema
 from app.schemas.categories import CategoryCreate
+from app.services.catalog_versions import catalog_versions
+from app.services.category_tree import category_tree
 
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 
-@router.get("/", response_model=list[CategorySchema])
-async def get_all_categories(db: AsyncSession = Depends(get_async_db)) -> Any:
+@router.get("/", response_model=list[CategorySchema], dependencies=[Depends(categories_etag)])
+async def get_all_categories() -> Any:
     """
-    Возвращает список всех категорий товаров.
+    Возвращает список всех категорий товаров из кеша дерева категорий.
     """
-    stmt = select(CategoryModel).where(CategoryModel.is_active)
-    result = await db.scalars(stmt)
-    category = result.all()
-    return category
+    return await category_tree.categories()
 
 
 @router.post("/", response_model=CategorySchema, status_code=status.HTTP_201_CREATED)
@@ -53,6 +53,8 @@ async def create_category(
     db_category = CategoryModel(**category.model_dump())
     db.add(db_category)
     await db.commit()
+    category_tree.invalidate()
+    await catalog_versions.bump(category_ids=[db_category.id], categories=True)
     await db.refresh(db_category)
     return db_category
 
@@ -89,6 +91,8 @@ async def update_category(
     update_date = category.model_dump(exclude_unset=True)  # exclude_unset - обновляем только переданные поля
     await db.execute(update(CategoryModel).where(CategoryModel.id == category_id).values(**update_date))
     await db.commit()
+    category_tree.invalidate()
+    await catalog_versions.bump(category_ids=[category_id], categories=True)
     await db.refresh(db_category)
     return db_category
 
@@ -113,5 +117,7 @@ async def delete_category(
     # Логическое удаление категории (Установка is_active=False)
     await db.execute(update(CategoryModel).where(CategoryModel.id == category_id).values(is_active=False))
     await db.commit()
+    category_tree.invalidate()
+    await catalog_versions.bump(category_ids=[category_id], categories=True)
 
     return db_category
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+
+from app.config import get_settings
+from app.services.health import readiness_probe
+
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+async def live() -> dict:
+    """
+    Процесс жив и обрабатывает event loop. Зависимости не проверяются.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready(request: Request) -> JSONResponse:
+    """
+    Готовность воркера к трафику. 503 при неготовности, чтобы балансировщик обходил этот воркер.
+    """
+    result = await readiness_probe.check(getattr(request.app.state, "ready", False))
+    if result.ready:
+        return JSONResponse(result.as_dict())
+    return JSONResponse(
+        result.as_dict(),
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(get_settings().db_shed_retry_after)},
+    )
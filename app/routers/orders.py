@@ -14,6 +14,10 @@ from app.models.orders import OrderItem as OrderItemModel
 from app.models.users import User as UserModel
 from app.schemas.orders import Order as OrderSchema
 from app.schemas.orders import OrderList
+from app.services.catalog_versions import catalog_versions
+from app.services.flash_sale import submit_flash_sale_checkout
+from app.services.outbox import add_event, order_event_payload
+from app.services.trending import trending
 
 
 router = APIRouter(prefix="/orders", tags=["orders"])
@@ -36,6 +40,27 @@ async def _load_order_with_items(db: AsyncSession, order_id: int) -> OrderModel
     return order
 
 
+async def _checkout_flash_sale(db: AsyncSession, cart_item: CartItemModel, user_id: int) -> OrderModel:
+    """
+    Оформляет заказ на товар флеш-распродажи через очередь товара с групповым коммитом.
+    """
+    product_id = cart_item.product_id
+    # Отпускаем соединение на время ожидания в очереди, чтобы ожидающие покупатели не держали пул
+    await db.rollback()
+
+    result = await submit_flash_sale_checkout(product_id, user_id)
+    if not result.accepted:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=result.detail)
+
+    created_order = await _load_order_with_items(db, cast(int, result.order_id))
+    if not created_order:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to load created order",
+        )
+    return created_order
+
+
 @router.post("/checkout", response_model=OrderSchema, status_code=status.HTTP_201_CREATED)
 async def checkout_order(
     db: AsyncSession = Depends(get_async_db), current_user: UserModel = Depends(get_current_user)
@@ -54,6 +79,15 @@ async def checkout_order(
     if not cart_items:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
 
+    # Товары флеш-распродажи оформляются отдельно от остальных через очередь товара
+    if any(cart_item.product and cart_item.product.is_flash_sale for cart_item in cart_items):
+        if len(cart_items) > 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Flash sale products must be checked out separately",
+            )
+        return await _checkout_flash_sale(db, cart_items[0], current_user.id)
+
     order = OrderModel(user_id=current_user.id)
     total_amount = Decimal("0")
 
@@ -92,8 +126,16 @@ async def checkout_order(
     order.total_amount = total_amount
     db.add(order)
 
+    # execute сначала сбрасывает заказ в базу, поэтому ниже order.id уже известен
     await db.execute(delete(CartItemModel).where(CartItemModel.user_id == current_user.id))
+    add_event(db, "order.created", order_event_payload(order))
     await db.commit()
+    # Остатки товаров видны в каталоге
+    await catalog_versions.bump(
+        product_ids=[item.product_id for item in cart_items],
+        category_ids=[item.product.category_id for item in cart_items],
+    )
+    trending.record_order((item.product_id, item.product.category_id) for item in cart_items)
 
     created_order = await _load_order_with_items(db, order.id)
     if not created_order:
@@ -125,7 +167,9 @@ async def list_orders(
     )
     orders = result.all()
 
-    return OrderList(items=orders, total=total or 0, page=page, page_size=page_size)
+    return OrderList.model_validate(
+        {"items": orders, "total": total or 0, "page": page, "page_size": page_size}, from_attributes=True
+    )
 
 
 @router.get("/{order_id}", response_model=OrderSchema)
@@ -1,31 +1,101 @@
+import html
 import uuid
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, cast
 
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
-from sqlalchemy import desc, func, select, update
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from pydantic import TypeAdapter
+from sqlalchemy import ColumnElement, ColumnExpressionArgument, Select, desc, func, null, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, load_only
 
 from app.auth import get_current_seller
+from app.cache_control import set_surrogate_keys
+from app.coalescing import on_replay
+from app.config import get_settings
 from app.depends.db_depends import get_async_db
+from app.depends.etag_depends import category_products_etag, product_etag, products_batch_etag, products_etag
+from app.depends.product_depends import batch_product_ids, product_fields
 from app.models.categories import Category as CategoryModel
+from app.models.product_associations import ProductAssociation as ProductAssociationModel
+from app.models.product_similarities import ProductSimilarity as ProductSimilarityModel
+from app.models.products import SEARCH_CONFIG
 from app.models.products import Product as ProductModel
 from app.models.reviews import Review as ReviewModel
 from app.models.users import User as UserModel
 from app.schemas.products import Product as ProductSchema
-from app.schemas.products import ProductCreate, ProductList
+from app.schemas.products import (
+    ProductBatch,
+    ProductCreate,
+    ProductList,
+    sparse_items_schema,
+    sparse_list_schema,
+    sparse_product_schema,
+)
 from app.schemas.reviews import Review as ReviewSchema
+from app.services.catalog_versions import catalog_versions, product_key
+from app.services.category_tree import category_tree
+from app.services.outbox import add_event
+from app.services.product_loader import get_product_loader
+from app.services.product_stats import product_stats
+from app.services.trending import trending
 
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-MEDIA_ROOT = BASE_DIR / "media" / "products"
-MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
 ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp"}
 MAX_IMAGE_SIZE = 2 * 1024 * 1024  # 2 097 152 байт
 
+# Параметры ts_headline: название короткое и возвращается целиком, из описания — до двух фрагментов вокруг совпадений.
+# Метки совпадений — управляющие символы, которых нет в тексте: HTML собирается после экранирования, см. mark_matches
+_HEADLINE_MARKS = 'StartSel="\x02", StopSel="\x03"'
+NAME_HEADLINE = f"HighlightAll=true, {_HEADLINE_MARKS}"
+DESCRIPTION_HEADLINE = f'MaxFragments=2, MaxWords=20, MinWords=8, FragmentDelimiter=" … ", {_HEADLINE_MARKS}'
+
 router = APIRouter(prefix="/products", tags=["products"])
 
 
+def product_detail_query(product_id: int) -> Select[tuple[ProductModel, int]]:
+    """
+    Товар и id его категории одним запросом; id равен None, если категория неактивна.
+    Прогревается при старте приложения.
+    """
+    return (
+        select(ProductModel, CategoryModel.id)
+        .outerjoin(CategoryModel, (CategoryModel.id == ProductModel.category_id) & CategoryModel.is_active)
+        .where(ProductModel.id == product_id, ProductModel.is_active)
+    )
+
+
+def mark_matches(headline: str | None) -> str | None:
+    """
+    Фрагмент ts_headline в HTML: текст товара экранируется, совпадения оборачиваются в <mark>.
+    """
+    if headline is None:
+        return None
+    return html.escape(headline).replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+
+def load_product_fields(fields: tuple[str, ...] | None) -> list:
+    """
+    Опции запроса, загружающие из products только нужные столбцы.
+    """
+    return [load_only(*(getattr(ProductModel, name) for name in fields))] if fields else []
+
+
+@lru_cache(maxsize=512)
+def _adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def sparse_response(response: Response, schema: Any, content: Any) -> Response:
+    """
+    Сериализует ответ в урезанную схему. Заголовки, выставленные зависимостями (ETag, Surrogate-Key), сохраняются.
+    """
+    adapter = _adapter(schema)
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
+
+
 async def save_product_image(file: UploadFile) -> str:
     """
     Сохраняет изображение товара и возвращает относительный URL.
@@ -40,7 +110,7 @@ async def save_product_image(file: UploadFile) -> str:
 
     extension = Path(file.filename or "").suffix.lower() or ".jpg"
     file_name = f"{uuid.uuid4()}{extension}"
-    file_path = MEDIA_ROOT / file_name
+    file_path = get_settings().media_root / "products" / file_name
     file_path.write_bytes(content)
 
     return f"/media/products/{file_name}"
@@ -53,14 +123,14 @@ def remove_product_image(url: str | None) -> None:
     if not url:
         return
 
-    relative_path = url.strip("/")
-    file_path = BASE_DIR / relative_path
+    file_path = get_settings().media_root / url.removeprefix("/media/")
     if file_path.exists():
         file_path.unlink()
 
 
-@router.get("/", response_model=ProductList, status_code=status.HTTP_200_OK)
+@router.get("/", response_model=ProductList, status_code=status.HTTP_200_OK, dependencies=[Depends(products_etag)])
 async def get_all_products(
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     category_id: int | None = Query(None, description="ID категории для фильтрации"),
@@ -69,8 +139,10 @@ async def get_all_products(
     max_price: float | None = Query(None, ge=0, description="Максимальная цена товара"),
     in_stock: bool | None = Query(None, description="true — только товары в наличии, false — только без остатка"),
     seller_id: int | None = Query(None, description="ID продавца для фильтрации"),
+    highlight: bool = Query(False, description="Вместе с search: фрагменты name и description с совпадениями в hits"),
+    fields: tuple[str, ...] | None = Depends(product_fields),
     db: AsyncSession = Depends(get_async_db),
-) -> dict:
+) -> Any:
     """
     Возвращает список всех активных товаров с поддержкой фильтров.
     """
@@ -79,7 +151,8 @@ async def get_all_products(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="min_price не может быть больше  max_price")
 
     # Формируем список фильтров
-    filters = [ProductModel.is_active.is_(True), CategoryModel.is_active.is_(True)]
+    # Условие без IS TRUE: только оно совпадает с условием частичных индексов products (WHERE is_active)
+    filters: list[ColumnExpressionArgument[bool]] = [ProductModel.is_active, CategoryModel.is_active]
 
     if category_id is not None:
         filters.append(ProductModel.category_id == category_id)
@@ -92,53 +165,78 @@ async def get_all_products(
     if seller_id is not None:
         filters.append(ProductModel.seller_id == seller_id)
 
-    # Базовый запрос total
-    total_stmt = select(func.count()).select_from(ProductModel).where(*filters)
+    # Базовый запрос total (фильтр по активной категории требует join, иначе count идёт по декартову произведению)
+    total_stmt = select(func.count()).select_from(ProductModel).join(CategoryModel).where(*filters)
 
     rank_col = None
     if search:
         search_value = search.strip()
         if search_value:
-            ts_query = func.websearch_to_tsquery("english", search_value)
-            filters.append(ProductModel.tsv.op("@@")(ts_query))
-            rank_col = func.ts_rank_cd(ProductModel.tsv, ts_query).label("rank")
+            ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, search_value)
+            filters.append(ProductModel.search_vector.op("@@")(ts_query))
+            rank_col = func.ts_rank_cd(ProductModel.search_vector, ts_query).label("rank")
             # total с учётом полнотекстового фильтра
-            total_stmt = select(func.count()).select_from(ProductModel).where(*filters)
+            total_stmt = select(func.count()).select_from(ProductModel).join(CategoryModel).where(*filters)
 
     # Основной запрос (если есть поиск — добавим ранг в выборку и сортировку)
     total = await db.scalar(total_stmt) or 0
 
+    hits = None
     if rank_col is not None:
-        products_stmt = (
-            select(ProductModel)
+        # Страницу выбирает подзапрос с LIMIT, а ts_headline считается во внешнем запросе:
+        # только для строк страницы, а не для всех найденных товаров
+        page_stmt = (
+            select(ProductModel.id, rank_col)
             .join(CategoryModel)
             .where(*filters)
             .order_by(desc(rank_col), ProductModel.id)
             .offset((page - 1) * page_size)
             .limit(page_size)
+            .subquery()
         )
-        result = await db.execute(products_stmt)
-        rows = result.all()
-        items = [row[0] for row in rows]  # сами объекты
-        # при желании можно вернуть ранг в ответе
-        # ranks = [row.rank for row in rows]
+        headlines: list[ColumnElement[Any]] = (
+            [
+                func.ts_headline(SEARCH_CONFIG, ProductModel.name, ts_query, NAME_HEADLINE),
+                func.ts_headline(SEARCH_CONFIG, ProductModel.description, ts_query, DESCRIPTION_HEADLINE),
+            ]
+            if highlight
+            else [null(), null()]
+        )
+        products_stmt = (
+            select(ProductModel, page_stmt.c.rank, *headlines)
+            .join(page_stmt, page_stmt.c.id == ProductModel.id)
+            .options(*load_product_fields(fields))
+            .order_by(desc(page_stmt.c.rank), ProductModel.id)
+        )
+        rows = (await db.execute(products_stmt)).all()
+        items = [row[0] for row in rows]
+        hits = [
+            {"id": product.id, "rank": rank, "name": mark_matches(name), "description": mark_matches(description)}
+            for product, rank, name, description in rows
+        ]
     else:
         products_stmt = (
             select(ProductModel)
             .join(CategoryModel)
             .where(*filters)
+            .options(*load_product_fields(fields))
             .order_by(ProductModel.id)
             .offset((page - 1) * page_size)
             .limit(page_size)
         )
         items = (await db.scalars(products_stmt)).all()
 
-    return {
+    set_surrogate_keys(response, (product_key(item.id) for item in items))
+    content = {
         "items": items,
         "total": total,
         "page": page,
         "page_size": page_size,
+        "hits": hits,
     }
+    if fields:
+        return sparse_response(response, sparse_items_schema(ProductList, fields), content)
+    return content
 
 
 @router.post("/bulk", status_code=status.HTTP_201_CREATED)
@@ -152,7 +250,10 @@ async def create_products_bulk(
     """
     db_products = [ProductModel(**product.model_dump(), seller_id=current_user.id) for product in products]
     db.add_all(db_products)
+    await db.flush()
+    add_event(db, "product.changed", {"product_ids": [product.id for product in db_products], "action": "created"})
     await db.commit()
+    await catalog_versions.bump(category_ids=[product.category_id for product in products])
     return {"created": len(db_products)}
 
 
@@ -177,12 +278,20 @@ async def create_product(
 
     db_product = ProductModel(**product.model_dump(), seller_id=current_user.id, image_url=image_url)
     db.add(db_product)
+    await db.flush()
+    add_event(db, "product.changed", {"product_ids": [db_product.id], "action": "created"})
     await db.commit()
+    await catalog_versions.bump(product_ids=[db_product.id], category_ids=[db_product.category_id])
     await db.refresh(db_product)  # Для получения id и is_active из базы
     return db_product
 
 
-@router.get("/{product_id}/reviews", response_model=list[ReviewSchema], status_code=status.HTTP_200_OK)
+@router.get(
+    "/{product_id}/reviews",
+    response_model=list[ReviewSchema],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(product_etag)],
+)
 async def get_product_review(product_id: int, db: AsyncSession = Depends(get_async_db)) -> list[ReviewSchema]:
     """
     Возвращает список отзывов по ID товара.
@@ -201,8 +310,148 @@ async def get_product_review(product_id: int, db: AsyncSession = Depends(get_asy
     return cast(list[ReviewModel], result_review.all())
 
 
-@router.get("/category/{category_id}", response_model=list[ProductSchema], status_code=status.HTTP_200_OK)
-async def get_product_by_category(category_id: int, db: AsyncSession = Depends(get_async_db)) -> Any:
+@router.get("/{product_id}/also-bought", response_model=list[ProductSchema], status_code=status.HTTP_200_OK)
+async def get_also_bought(
+    product_id: int,
+    response: Response,
+    fields: tuple[str, ...] | None = Depends(product_fields),
+    db: AsyncSession = Depends(get_async_db),
+) -> Any:
+    """
+    Возвращает товары, которые часто покупают вместе с этим (список пересчитывается фоновой задачей).
+    """
+    stmt = (
+        select(ProductModel)
+        .join(ProductAssociationModel, ProductAssociationModel.related_id == ProductModel.id)
+        .where(ProductAssociationModel.product_id == product_id, ProductModel.is_active)
+        .order_by(ProductAssociationModel.rank)
+        # category_id нужен для проверки активности категории, даже если в fields его нет
+        .options(*load_product_fields(fields and (*fields, "category_id")))
+    )
+    products = (await db.scalars(stmt)).all()
+    # Активность категории берётся из дерева категорий в памяти, без join в запросе
+    items = [product for product in products if await category_tree.is_active(product.category_id)]
+
+    set_surrogate_keys(response, (product_key(product.id) for product in items))
+    if fields:
+        return sparse_response(response, sparse_list_schema(fields), items)
+    return items
+
+
+@router.get("/{product_id}/similar", response_model=list[ProductSchema], status_code=status.HTTP_200_OK)
+async def get_similar_products(
+    product_id: int,
+    response: Response,
+    limit: int = Query(10, ge=1, le=100, description="Не больше SIMILAR_TOP_N: длиннее списки не хранятся"),
+    same_category: bool = Query(False, description="Только товары из категории этого товара и её подкатегорий"),
+    fields: tuple[str, ...] | None = Depends(product_fields),
+    db: AsyncSession = Depends(get_async_db),
+) -> Any:
+    """
+    Возвращает товары с похожими названием и описанием (списки пересчитывает фоновая задача).
+
+    Фоновая задача хранит similar_top_n соседей товара, поэтому limit ограничен этим числом, а same_category
+    и скрытые категории отбирают товары из них же.
+    """
+    limit = min(limit, get_settings().similar_top_n)
+    source = aliased(ProductModel, name="source")
+    stmt = (
+        select(ProductModel, select(source.category_id).where(source.id == product_id).scalar_subquery())
+        .join(ProductSimilarityModel, ProductSimilarityModel.related_id == ProductModel.id)
+        .where(ProductSimilarityModel.product_id == product_id, ProductModel.is_active)
+        .order_by(ProductSimilarityModel.rank)
+        .options(*load_product_fields(fields and (*fields, "category_id")))
+    )
+    rows = (await db.execute(stmt)).all()
+    allowed = set(await category_tree.descendants(rows[0][1])) if same_category and rows else None
+    items = [
+        product
+        for product, _ in rows
+        if (allowed is None or product.category_id in allowed) and await category_tree.is_active(product.category_id)
+    ][:limit]
+
+    set_surrogate_keys(response, (product_key(product.id) for product in items))
+    if fields:
+        return sparse_response(response, sparse_list_schema(fields), items)
+    return items
+
+
+@router.get(
+    "/batch",
+    response_model=ProductBatch,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(products_batch_etag)],
+)
+async def get_products_batch(
+    response: Response,
+    ids: list[int] = Depends(batch_product_ids),
+    fields: tuple[str, ...] | None = Depends(product_fields),
+    db: AsyncSession = Depends(get_async_db),
+) -> Any:
+    """
+    Возвращает товары по списку id одним запросом, в порядке запроса. Отсутствующие и неактивные — в missing.
+    """
+    products = await get_product_loader(db).load_many(ids)
+
+    items, missing = [], []
+    for product_id, product in zip(ids, products, strict=True):
+        # Активность категории берётся из дерева категорий в памяти, без join в запросе
+        if product is None or not product.is_active or not await category_tree.is_active(product.category_id):
+            missing.append(product_id)
+        else:
+            items.append(product)
+
+    set_surrogate_keys(response, (product_key(product.id) for product in items))
+    content = {"items": items, "missing": missing}
+    if fields:
+        return sparse_response(response, sparse_items_schema(ProductBatch, fields), content)
+    return content
+
+
+@router.get("/trending", response_model=list[ProductSchema], status_code=status.HTTP_200_OK)
+async def get_trending_products(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    category_id: int | None = Query(None, description="Только товары этой категории и её подкатегорий"),
+    fields: tuple[str, ...] | None = Depends(product_fields),
+    db: AsyncSession = Depends(get_async_db),
+) -> Any:
+    """
+    Возвращает товары, которые сейчас чаще всего смотрят и заказывают (вес событий затухает со временем).
+    """
+    category_ids = None
+    if category_id is not None:
+        category_ids = await category_tree.descendants(category_id)
+        if not category_ids:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+
+    # Запас на товары, которые с момента события сняли с продажи
+    product_ids = await trending.top(limit * 2, category_ids)
+    products = await get_product_loader(db).load_many(product_ids)
+    items = [
+        product
+        for product in products
+        if product is not None and product.is_active and await category_tree.is_active(product.category_id)
+    ][:limit]
+
+    set_surrogate_keys(response, (product_key(product.id) for product in items))
+    if fields:
+        return sparse_response(response, sparse_list_schema(fields), items)
+    return items
+
+
+@router.get(
+    "/category/{category_id}",
+    response_model=list[ProductSchema],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(category_products_etag)],
+)
+async def get_product_by_category(
+    category_id: int,
+    response: Response,
+    fields: tuple[str, ...] | None = Depends(product_fields),
+    db: AsyncSession = Depends(get_async_db),
+) -> Any:
     """
     Возвращает список товаров в указанной категории по её ID.
     """
@@ -215,39 +464,70 @@ async def get_product_by_category(category_id: int, db: AsyncSession = Depends(g
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
 
     # Получаем активные товары в категории
-    stmt_product = select(ProductModel).where(ProductModel.category_id == category_id, ProductModel.is_active)
+    stmt_product = (
+        select(ProductModel)
+        .where(ProductModel.category_id == category_id, ProductModel.is_active)
+        .options(*load_product_fields(fields))
+    )
     result = await db.scalars(stmt_product)
     db_product = result.all()
 
+    set_surrogate_keys(response, (product_key(product.id) for product in db_product))
+    if fields:
+        return sparse_response(response, sparse_list_schema(fields), db_product)
     return db_product
 
 
-@router.get("/{product_id}", response_model=ProductSchema, status_code=status.HTTP_200_OK)
-async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)) -> Any:
+@router.get(
+    "/{product_id}",
+    response_model=ProductSchema,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(product_etag)],
+)
+async def get_product(
+    product_id: int,
+    request: Request,
+    response: Response,
+    fields: tuple[str, ...] | None = Depends(product_fields),
+    db: AsyncSession = Depends(get_async_db),
+) -> Any:
     """
     Возвращает детальную информацию о товаре по его ID.
     """
-    # Делаем запрос на существования товара
-    stmt_product = select(ProductModel).where(ProductModel.id == product_id, ProductModel.is_active)
-    result = await db.scalars(stmt_product)
-    product = result.first()
+    stmt = product_detail_query(product_id).options(*load_product_fields(fields))
+    row = (await db.execute(stmt)).first()
 
     # Выводи ошибку если товара нет
-    if not product:
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found or inactive")
 
-    # Проверяем, существует ли активная категория
-    stmt_category = select(CategoryModel).where(CategoryModel.id == product.category_id, CategoryModel.is_active)
-    result = await db.scalars(stmt_category)
-    db_category = result.first()
-
-    if not db_category:
+    product, active_category_id = row
+    if active_category_id is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
 
+    def record_view() -> None:
+        # Только счётчики в памяти воркера: в базу просмотры уходят пачкой из product_stats
+        product_stats.record_view(product_id)
+        trending.record_view(product_id, active_category_id)
+
+    record_view()
+    # Одновременные одинаковые запросы получают этот ответ без выполнения маршрута, но это тоже просмотры
+    on_replay(request, record_view)
+
     # Отравляем данные
+    if fields:
+        return sparse_response(response, sparse_product_schema(fields), product)
     return product
 
 
+@router.post("/{product_id}/search-click", status_code=status.HTTP_204_NO_CONTENT)
+async def track_search_click(product_id: int) -> None:
+    """
+    Отмечает переход к товару из результатов поиска. Клиент вызывает его при клике по товару в выдаче.
+    """
+    product_stats.record_search_click(product_id)
+
+
 @router.put("/{product_id}", response_model=ProductSchema, status_code=status.HTTP_200_OK)
 async def update_product(
     product_id: int,
@@ -279,13 +559,16 @@ async def update_product(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category not found")
 
     # Обновление товара
+    old_category_id = db_product.category_id
     await db.execute(update(ProductModel).where(ProductModel.id == product_id).values(**product.model_dump()))
 
     if image:
         remove_product_image(db_product.image_url)
         db_product.image_url = await save_product_image(image)
 
+    add_event(db, "product.changed", {"product_ids": [product_id], "action": "updated"})
     await db.commit()
+    await catalog_versions.bump(product_ids=[product_id], category_ids=[old_category_id, product.category_id])
     await db.refresh(db_product)  # Для консистентности данных
     return db_product
 
@@ -311,6 +594,8 @@ async def delete_product(
 
     remove_product_image(product.image_url)
 
+    add_event(db, "product.changed", {"product_ids": [product_id], "action": "deleted"})
     await db.commit()
+    await catalog_versions.bump(product_ids=[product_id], category_ids=[product.category_id])
     await db.refresh(product)  # Для возврата is_active = False
     return product
@@ -5,11 +5,12 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import get_async_db, get_current_buyer, get_current_user
-from app.models.products import Product as ProductModel
 from app.models.reviews import Review as ReviewModel
 from app.models.users import User as UserModel
 from app.schemas.reviews import Review as ReviewSchema
 from app.schemas.reviews import ReviewCreate
+from app.services.outbox import add_event
+from app.services.product_loader import get_product_loader
 from app.utils.utils import check_grade, update_product_rating
 
 
@@ -32,11 +33,9 @@ async def create_review(
     """
     Создаёт новый отзыв, привязанный к текущему покупателю (только для 'buyer').
     """
-    result_product = await db.scalars(
-        select(ProductModel).where(ProductModel.id == review.product_id, ProductModel.is_active.is_(True))
-    )
-    db_product = result_product.first()
-    if not db_product:
+    # Тот же загрузчик вернёт товар из кеша при пересчёте рейтинга в update_product_rating
+    db_product = await get_product_loader(db).load(review.product_id)
+    if not db_product or not db_product.is_active:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found or inactive")
 
     if not check_grade(review.grade):
@@ -52,6 +51,11 @@ async def create_review(
 
     db_review = ReviewModel(**review.model_dump(), user_id=current_user.id)
     db.add(db_review)
+    # id отзыва нужен событию, поэтому отзыв сбрасывается в базу до коммита
+    await db.flush()
+    add_event(
+        db, "review.created", {"review_id": db_review.id, "product_id": db_review.product_id, "grade": db_review.grade}
+    )
     await db.commit()
     await db.refresh(db_review)
     await update_product_rating(db, review.product_id)
@@ -5,7 +5,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import create_access_token, create_refresh_token, hash_password, verify_password
-from app.config import ALGORITHM, SECRET_KEY
+from app.config import get_settings
 from app.depends.db_depends import get_async_db
 from app.models.users import User as UserModel
 from app.schemas.users import User as UserSchema
@@ -64,8 +64,9 @@ async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async
         detail="Could not validate refresh token",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    settings = get_settings()
     try:
-        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(refresh_token, settings.secret_key, algorithms=[settings.algorithm])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
@@ -0,0 +1,16 @@
+from typing import Annotated
+
+from pydantic import BaseModel, Field, StringConstraints
+
+
+SurrogateKey = Annotated[str, StringConstraints(pattern=r"^(product:\d+|category:\d+|categories|catalog)$")]
+
+
+class CachePurge(BaseModel):
+    """
+    Модель запроса на очистку кеша по surrogate-ключам.
+    """
+
+    keys: list[SurrogateKey] = Field(
+        min_length=1, max_length=1000, description="Ключи: product:{id}, category:{id}, categories или catalog"
+    )
@@ -1,8 +1,9 @@
 from decimal import Decimal
-from typing import Annotated
+from functools import lru_cache
+from typing import Annotated, Any
 
 from fastapi import Form
-from pydantic import BaseModel, ConfigDict, Field, field_serializer
+from pydantic import BaseModel, ConfigDict, Field, create_model, field_serializer
 
 
 class ProductCreate(BaseModel):
@@ -16,6 +17,7 @@ class ProductCreate(BaseModel):
     price: Decimal = Field(gt=0, description="Цена товара (больше 0)", decimal_places=2)
     stock: int = Field(ge=0, description="Количество товара на складе (0 или больше)")
     category_id: int = Field(description="ID категория, к которой относится товар")
+    is_flash_sale: bool = Field(False, description="Участвует ли товар во флеш-распродаже")
 
     @classmethod
     def as_form(
@@ -25,6 +27,7 @@ class ProductCreate(BaseModel):
         stock: Annotated[int, Form(...)],
         category_id: Annotated[int, Form(...)],
         description: Annotated[str | None, Form()] = None,
+        is_flash_sale: Annotated[bool, Form()] = False,
     ) -> "ProductCreate":
         return cls(
             name=name,
@@ -32,6 +35,7 @@ class ProductCreate(BaseModel):
             price=price,
             stock=stock,
             category_id=category_id,
+            is_flash_sale=is_flash_sale,
         )
 
     @field_serializer("price")
@@ -55,6 +59,7 @@ class Product(BaseModel):
     category_id: int = Field(description="ID категории")
     rating: float = Field(description="Рейтинг товара")
     is_active: bool = Field(description="Активность товара")
+    is_flash_sale: bool = Field(False, description="Участвует ли товар во флеш-распродаже")
 
     @field_serializer("price")
     def serialize_decimals(self, value: Decimal | None) -> float | None:
@@ -66,6 +71,18 @@ class Product(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class SearchHit(BaseModel):
+    """
+    Ранг найденного товара и, при highlight=true, фрагменты текста с подсвеченными совпадениями.
+    Фрагменты — экранированный HTML, в котором совпадения обёрнуты в <mark>.
+    """
+
+    id: int = Field(description="ID товара")
+    rank: float = Field(description="Релевантность товара запросу, по ней отсортирована выдача")
+    name: str | None = Field(None, description="Название с подсвеченными совпадениями")
+    description: str | None = Field(None, description="Фрагменты описания с подсвеченными совпадениями")
+
+
 class ProductList(BaseModel):
     """
     Список пагинации для товаров.
@@ -75,5 +92,60 @@ class ProductList(BaseModel):
     total: int = Field(ge=0, description="Общее кол-во товаров")
     page: int = Field(ge=1, description="Номер текущей страницы")
     page_size: int = Field(ge=1, description="Кол-во элементов на старницы")
+    hits: list[SearchHit] | None = Field(None, description="При поиске: ранг товаров items в том же порядке")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductBatch(BaseModel):
+    """
+    Товары, запрошенные списком id.
+    """
+
+    items: list[Product] = Field(description="Найденные активные товары в порядке запроса")
+    missing: list[int] = Field(description="id, для которых активный товар не найден")
+
+
+# Поля товара, которые можно запросить в fields=; id возвращается всегда
+PRODUCT_FIELDS: tuple[str, ...] = tuple(Product.model_fields)
+
+
+class SparseProductBase(BaseModel):
+    """
+    Основа моделей ответа с частью полей товара.
+    """
+
+    @field_serializer("price", check_fields=False)
+    def serialize_decimals(self, value: Decimal | None) -> float | None:
+        """Конвертирует Decimal в float для JSON"""
+        if value is None:
+            return None
+        return round(float(value), 2)
 
     model_config = ConfigDict(from_attributes=True)
+
+
+@lru_cache(maxsize=256)
+def sparse_product_schema(fields: tuple[str, ...]) -> type[BaseModel]:
+    """
+    Модель ответа только с полями fields из Product (fields=id,name,price).
+    """
+    definitions = {name: (Product.model_fields[name].annotation, Product.model_fields[name]) for name in fields}
+    return create_model("SparseProduct", __base__=SparseProductBase, **definitions)  # type: ignore[call-overload,no-any-return]
+
+
+def sparse_list_schema(fields: tuple[str, ...]) -> Any:
+    """
+    Схема ответа-списка товаров только с полями fields.
+    """
+    item = sparse_product_schema(fields)
+    return list[item]  # type: ignore[valid-type]
+
+
+@lru_cache(maxsize=256)
+def sparse_items_schema(container: type[BaseModel], fields: tuple[str, ...]) -> type[BaseModel]:
+    """
+    Схема-обёртка (ProductList, ProductBatch), элементы items которой содержат только поля fields.
+    """
+    item = sparse_product_schema(fields)
+    return create_model(f"Sparse{container.__name__}", __base__=container, items=(list[item], ...))  # type: ignore[valid-type]
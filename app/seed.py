@@ -0,0 +1,335 @@
+"""
+Генератор синтетических данных для локальной базы в объёмах, близких к боевым.
+
+Пишет пользователей, дерево категорий, товары, отзывы, корзины и заказы через COPY.
+При одинаковом --seed результат одинаков, поэтому прогоны бенчмарков сравнимы между собой.
+Все пользователи получают один пароль (--password), чтобы сценарии могли логиниться.
+
+    python -m app.seed --truncate --users 100000 --products 1000000 --reviews 2000000 --orders 500000
+"""
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import random
+import time
+from array import array
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+from typing import cast
+
+import asyncpg
+import bcrypt
+
+from app.database import dispose_engine, get_engine
+
+
+SEED_PASSWORD = "password123"
+
+# Существительные во множественном числе, чтобы прилагательные всегда согласовывались
+RU_NOUNS = [
+    "кроссовки", "наушники", "джинсы", "часы", "очки", "перчатки", "ботинки", "колонки", "брюки", "шорты",
+    "чехлы", "рюкзаки", "ножницы", "весы", "фонари", "кружки", "тарелки", "подушки", "шторы", "полотенца",
+    "носки", "куртки", "сумки", "кеды", "игрушки", "карандаши", "тетради", "аккумуляторы", "кабели", "лампы",
+]  # fmt: skip
+RU_ADJECTIVES = [
+    "беспроводные", "кожаные", "спортивные", "детские", "мужские", "женские", "хлопковые", "водонепроницаемые",
+    "складные", "компактные", "тёплые", "лёгкие", "прочные", "классические", "умные", "керамические",
+    "деревянные", "металлические", "зимние", "летние", "дорожные", "профессиональные", "мягкие", "яркие",
+]  # fmt: skip
+RU_COLORS = ["чёрные", "белые", "красные", "синие", "зелёные", "серые", "бежевые", "розовые", "жёлтые", "коричневые"]
+RU_PHRASES = [
+    "Отлично подходят для повседневного использования.",
+    "Изготовлены из качественных материалов и служат долго.",
+    "Удобны в путешествиях и занимают мало места.",
+    "Подойдут в подарок друзьям и близким.",
+    "Легко чистить, не теряют вид после стирки.",
+    "Гарантия производителя один год.",
+    "Популярная модель этого сезона.",
+    "Выдерживают активные нагрузки и перепады температуры.",
+]
+
+EN_NOUNS = [
+    "sneakers", "headphones", "jeans", "watches", "sunglasses", "gloves", "boots", "speakers", "trousers",
+    "shorts", "phone cases", "backpacks", "scissors", "scales", "flashlights", "mugs", "plates", "pillows",
+    "curtains", "towels", "socks", "jackets", "bags", "toys", "pencils", "notebooks", "batteries", "cables",
+]  # fmt: skip
+EN_ADJECTIVES = [
+    "wireless", "leather", "running", "kids", "men's", "women's", "cotton", "waterproof", "foldable", "compact",
+    "warm", "lightweight", "durable", "classic", "smart", "ceramic", "wooden", "metal", "winter", "summer",
+    "travel", "professional", "soft", "bright",
+]  # fmt: skip
+EN_COLORS = ["black", "white", "red", "blue", "green", "grey", "beige", "pink", "yellow", "brown"]
+EN_PHRASES = [
+    "Great for everyday use.",
+    "Made from high quality materials that last.",
+    "Easy to pack and perfect for travel.",
+    "A thoughtful gift for friends and family.",
+    "Easy to clean and keeps its shape after washing.",
+    "Backed by a one year manufacturer warranty.",
+    "The most popular model of the season.",
+    "Handles heavy use and temperature changes.",
+]
+BRANDS = ["Nord", "Vektor", "Aurora", "Polar", "Sigma", "Orion", "Luna", "Taiga", "Volna", "Kvant", "Atlas", "Zenit"]
+CATEGORY_ROOTS = [
+    "Электроника", "Одежда", "Обувь", "Дом и сад", "Детские товары", "Спорт и отдых", "Красота", "Канцелярия",
+    "Аксессуары", "Автотовары",
+]  # fmt: skip
+
+# Распределение оценок с перекосом к пятёркам и «J-образным» хвостом единиц, как у реальных отзывов
+GRADE_WEIGHTS = {5: 0.55, 4: 0.2, 3: 0.08, 2: 0.05, 1: 0.12}
+ORDER_STATUSES = {"delivered": 0.7, "pending": 0.15, "shipped": 0.1, "cancelled": 0.05}
+
+
+class Zipf:
+    """
+    Выборка id по закону Ципфа: немногие популярные товары получают большую часть отзывов и заказов.
+    Ранги перемешаны, чтобы популярность не совпадала с порядком id.
+    """
+
+    def __init__(self, ids: list[int], rng: random.Random, exponent: float = 1.1):
+        self._ids = ids[:]
+        rng.shuffle(self._ids)
+        self._cumulative = list(itertools.accumulate(1 / rank**exponent for rank in range(1, len(ids) + 1)))
+        self._rng = rng
+
+    def sample(self) -> int:
+        index = bisect.bisect_left(self._cumulative, self._rng.random() * self._cumulative[-1])
+        return self._ids[min(index, len(self._ids) - 1)]
+
+
+def _weighted(rng: random.Random, weights: dict) -> Iterator:
+    keys, values = list(weights), list(weights.values())
+    while True:
+        yield from rng.choices(keys, values, k=1024)
+
+
+def _rng(seed: int, table: str) -> random.Random:
+    # Отдельный генератор на таблицу: изменение объёма одной таблицы не меняет остальные
+    return random.Random(f"{seed}:{table}")
+
+
+def generate_users(args: argparse.Namespace) -> Iterator[tuple]:
+    # Фиксированная соль, чтобы хеш пароля тоже был детерминированным
+    hashed = bcrypt.hashpw(args.password.encode(), b"$2b$12$" + b"seedseedseedseedseedse").decode()
+    sellers = max(1, int(args.users * args.sellers_share))
+    yield 1, "admin@example.com", hashed, True, "admin"
+    for user_id in range(2, args.users + 1):
+        role = "seller" if user_id <= sellers + 1 else "buyer"
+        yield user_id, f"{role}{user_id}@example.com", hashed, True, role
+
+
+def generate_categories(args: argparse.Namespace) -> tuple[list[tuple], list[int]]:
+    """
+    Строит дерево категорий заданной глубины. Возвращает строки и id листовых категорий.
+    """
+    rng = _rng(args.seed, "categories")
+    rows: list[tuple] = [(i, name, None, True) for i, name in enumerate(CATEGORY_ROOTS[: args.categories], start=1)]
+    level = [row[0] for row in rows]
+    for depth in range(1, args.category_depth):
+        next_level = []
+        for parent_id in level:
+            for _ in range(rng.randint(2, args.category_fanout)):
+                if len(rows) >= args.categories:
+                    break
+                name = f"{rng.choice(RU_ADJECTIVES).capitalize()} {rng.choice(RU_NOUNS)} {depth}"[:50]
+                rows.append((len(rows) + 1, name, parent_id, True))
+                next_level.append(len(rows))
+        level = next_level
+    parents = {row[2] for row in rows}
+    return rows, [row[0] for row in rows if row[0] not in parents]
+
+
+def generate_products(args: argparse.Namespace, leaves: list[int], prices: array) -> Iterator[tuple]:
+    rng = _rng(args.seed, "products")
+    sellers = list(range(2, max(2, int(args.users * args.sellers_share)) + 2))
+    seller_zipf = Zipf(sellers, rng)
+    category_zipf = Zipf(leaves, rng, exponent=0.8)
+    for product_id in range(1, args.products + 1):
+        if rng.random() < 0.5:
+            noun, adjective, color, phrases = (
+                rng.choice(RU_NOUNS),
+                rng.choice(RU_ADJECTIVES),
+                rng.choice(RU_COLORS),
+                RU_PHRASES,
+            )
+        else:
+            noun, adjective, color, phrases = (
+                rng.choice(EN_NOUNS),
+                rng.choice(EN_ADJECTIVES),
+                rng.choice(EN_COLORS),
+                EN_PHRASES,
+            )
+        brand = rng.choice(BRANDS)
+        name = f"{adjective.capitalize()} {noun} {brand} {rng.randint(100, 9999)}, {color}"[:100]
+        description = f"{brand}: {adjective} {noun}, {color}. " + " ".join(rng.sample(phrases, 3))
+        price = round(min(rng.lognormvariate(7, 1.1), 99_999_999), 2)
+        prices.append(price)
+        stock = 0 if rng.random() < 0.08 else rng.randint(1, 500)
+        yield (
+            product_id,
+            name,
+            description[:500],
+            Decimal(f"{price:.2f}"),
+            None,
+            stock,
+            category_zipf.sample(),
+            rng.random() > 0.03,
+            0.0,
+            seller_zipf.sample(),
+            False,
+        )
+
+
+def generate_reviews(args: argparse.Namespace, product_zipf: Zipf, buyers: range) -> Iterator[tuple]:
+    rng = _rng(args.seed, "reviews")
+    grades = _weighted(rng, GRADE_WEIGHTS)
+    seen: set[int] = set()
+    started = datetime(2025, 1, 1)
+    review_id = 0
+    while review_id < args.reviews:
+        product_id, user_id = product_zipf.sample(), rng.choice(buyers)
+        # Один отзыв пользователя на товар, как и в create_review
+        pair = product_id * (args.users + 1) + user_id
+        if pair in seen:
+            continue
+        seen.add(pair)
+        review_id += 1
+        comment_date = started + timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        yield review_id, user_id, product_id, None, comment_date, next(grades), True
+
+
+def generate_cart_items(args: argparse.Namespace, product_zipf: Zipf, buyers: range) -> Iterator[tuple]:
+    rng = _rng(args.seed, "cart_items")
+    now = datetime(2026, 1, 1, tzinfo=UTC)
+    item_id = 0
+    for user_id in rng.sample(buyers, min(args.carts, len(buyers))):
+        for product_id in {product_zipf.sample() for _ in range(rng.randint(1, 5))}:
+            item_id += 1
+            yield item_id, user_id, product_id, rng.randint(1, 3), now, now
+
+
+def generate_orders(
+    args: argparse.Namespace, product_zipf: Zipf, buyers: range, prices: array, order_items: list[tuple]
+) -> Iterator[tuple]:
+    """
+    Генерирует заказы; позиции заказов складываются в order_items для последующего COPY.
+    """
+    rng = _rng(args.seed, "orders")
+    statuses = _weighted(rng, ORDER_STATUSES)
+    started = datetime(2025, 1, 1, tzinfo=UTC)
+    for order_id in range(1, args.orders + 1):
+        total = Decimal("0")
+        for product_id in {product_zipf.sample() for _ in range(rng.randint(1, 4))}:
+            quantity = rng.randint(1, 3)
+            unit_price = Decimal(f"{prices[product_id - 1]:.2f}")
+            total += unit_price * quantity
+            order_items.append(
+                (len(order_items) + 1, order_id, product_id, quantity, unit_price, unit_price * quantity)
+            )
+        created_at = started + timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        yield order_id, rng.choice(buyers), next(statuses), total, created_at, created_at
+
+
+TABLES = ["order_items", "orders", "cart_items", "reviews", "products", "categories", "users"]
+
+
+async def seed(args: argparse.Namespace) -> None:
+    async with get_engine().connect() as connection:
+        raw = await connection.get_raw_connection()
+        # Соединение asyncpg: COPY доступен только в его собственном API
+        conn = cast(asyncpg.Connection, raw.driver_connection)
+        # COPY больших таблиц идёт дольше statement_timeout, заданного соединениям приложения
+        await conn.execute("SET statement_timeout = 0")
+
+        if args.truncate:
+            await conn.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+        elif await conn.fetchval("SELECT EXISTS (SELECT 1 FROM products)"):
+            raise SystemExit("Database is not empty, run with --truncate to replace existing data")
+
+        async def copy(table: str, columns: list[str], records: Iterator[tuple] | list[tuple]) -> None:
+            started = time.perf_counter()
+            result = await conn.copy_records_to_table(table, columns=columns, records=records)
+            print(f"{table:<12} {result.split()[-1]:>10} rows in {time.perf_counter() - started:6.1f} s")
+
+        await copy("users", ["id", "email", "hashed_password", "is_active", "role"], generate_users(args))
+
+        category_rows, leaves = generate_categories(args)
+        await copy("categories", ["id", "name", "parent_id", "is_active"], category_rows)
+
+        prices = array("d")
+        product_columns = [
+            "id", "name", "description", "price", "image_url", "stock",
+            "category_id", "is_active", "rating", "seller_id", "is_flash_sale",
+        ]  # fmt: skip
+        await copy("products", product_columns, generate_products(args, leaves, prices))
+
+        buyers = range(int(args.users * args.sellers_share) + 2, args.users + 1)
+        product_ids = list(range(1, args.products + 1))
+        review_columns = ["id", "user_id", "product_id", "comment", "comment_date", "grade", "is_active"]
+        await copy(
+            "reviews", review_columns, generate_reviews(args, Zipf(product_ids, _rng(args.seed, "popularity")), buyers)
+        )
+        await copy(
+            "cart_items",
+            ["id", "user_id", "product_id", "quantity", "created_at", "updated_at"],
+            generate_cart_items(args, Zipf(product_ids, _rng(args.seed, "popularity")), buyers),
+        )
+        order_items: list[tuple] = []
+        await copy(
+            "orders",
+            ["id", "user_id", "status", "total_amount", "created_at", "updated_at"],
+            generate_orders(args, Zipf(product_ids, _rng(args.seed, "popularity")), buyers, prices, order_items),
+        )
+        await copy(
+            "order_items", ["id", "order_id", "product_id", "quantity", "unit_price", "total_price"], order_items
+        )
+
+        started = time.perf_counter()
+        # Статистика после TRUNCATE устарела: без ANALYZE планировщик выбирает вложенные циклы
+        await conn.execute("ANALYZE")
+        await conn.execute(
+            """
+            UPDATE products p SET rating = r.avg_grade
+            FROM (SELECT product_id, avg(grade) AS avg_grade FROM reviews WHERE is_active GROUP BY product_id) r
+            WHERE p.id = r.product_id
+            """
+        )
+        # После COPY с явными id сдвигаем последовательности, иначе обычные INSERT упадут на дубликатах
+        for table in TABLES:
+            await conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce((SELECT max(id) FROM {table}), 1))"
+            )
+        await conn.execute("VACUUM ANALYZE products")
+        print(f"ratings, sequences and ANALYZE in {time.perf_counter() - started:.1f} s")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора")
+    parser.add_argument("--truncate", action="store_true", help="Очистить таблицы перед загрузкой")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--sellers-share", type=float, default=0.02, help="Доля продавцов среди пользователей")
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--category-depth", type=int, default=4)
+    parser.add_argument("--category-fanout", type=int, default=6)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--reviews", type=int, default=200_000)
+    parser.add_argument("--carts", type=int, default=2_000, help="Сколько покупателей имеют непустую корзину")
+    parser.add_argument("--orders", type=int, default=50_000)
+    parser.add_argument("--password", default=SEED_PASSWORD, help="Пароль всех пользователей")
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+    started = time.perf_counter()
+    await seed(args)
+    await dispose_engine()
+    print(f"done in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+from datetime import timedelta
+
+from sqlalchemy import Float, Integer, any_, bindparam, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.config import get_settings
+from app.models.job_watermarks import JobWatermark as JobWatermarkModel
+from app.models.orders import Order as OrderModel
+from app.models.orders import OrderItem as OrderItemModel
+from app.models.product_associations import ProductAssociation as ProductAssociationModel
+from app.models.product_associations import ProductPairCount as ProductPairCountModel
+
+
+JOB = "also_bought"
+# Заказы крупнее не учитываются: пар в них квадратично много, а связь между товарами слабая
+MAX_ORDER_ITEMS = 50
+
+
+async def process_new_orders(db: AsyncSession) -> int:
+    """
+    Добавляет в матрицу совместных покупок следующую пачку заказов после водяного знака и пересобирает
+    списки «с этим товаром покупают» для затронутых товаров. Возвращает число обработанных заказов.
+
+    Всё считается в базе одной транзакцией на пачку, поэтому память не зависит от размера каталога,
+    а прерванный запуск ничего не записывает наполовину. Вызывающий коммитит.
+    """
+    settings = get_settings()
+    await db.execute(insert(JobWatermarkModel).values(job=JOB).on_conflict_do_nothing())
+    # Блокировка строки водяного знака: два запуска задачи не посчитают одни заказы дважды
+    watermark = (
+        await db.scalars(select(JobWatermarkModel).where(JobWatermarkModel.job == JOB).with_for_update())
+    ).one()
+
+    # id заказа выдаётся при flush, а виден заказ только после коммита: транзакция, которая ещё идёт,
+    # может держать id меньше уже видимых. Водяной знак не переходит первый заказ моложе
+    # also_bought_settle_delay: к этому моменту все транзакции, получившие меньшие id, уже завершились
+    unsettled = (
+        select(func.min(OrderModel.id))
+        .where(
+            OrderModel.id > watermark.last_id,
+            OrderModel.created_at >= func.now() - timedelta(seconds=settings.also_bought_settle_delay),
+        )
+        .scalar_subquery()
+    )
+    chunk = (
+        select(OrderItemModel.order_id)
+        .where(
+            OrderItemModel.order_id > watermark.last_id,
+            OrderItemModel.order_id < func.coalesce(unsettled, OrderItemModel.order_id + 1),
+        )
+        .group_by(OrderItemModel.order_id)
+        .order_by(OrderItemModel.order_id)
+        .limit(settings.also_bought_chunk_size)
+        .subquery()
+    )
+    orders, last_id = (await db.execute(select(func.count(), func.max(chunk.c.order_id)))).one()
+    if not orders:
+        return 0
+
+    in_chunk = OrderItemModel.order_id.between(watermark.last_id + 1, last_id)
+    small_orders = (
+        select(OrderItemModel.order_id)
+        .where(in_chunk)
+        .group_by(OrderItemModel.order_id)
+        .having(func.count() <= MAX_ORDER_ITEMS)
+    )
+    # Один товар несколькими строками в заказе — всё равно одна покупка
+    items = (
+        select(OrderItemModel.order_id, OrderItemModel.product_id)
+        .distinct()
+        .where(in_chunk, OrderItemModel.order_id.in_(small_orders))
+        .cte("items")
+    )
+    left, right = items.alias("a"), items.alias("b")
+    pairs = (
+        select(left.c.product_id, right.c.product_id, func.count())
+        .join_from(left, right, left.c.order_id == right.c.order_id)
+        .group_by(left.c.product_id, right.c.product_id)
+    )
+    stmt = insert(ProductPairCountModel).from_select(["product_id", "related_id", "orders"], pairs)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ProductPairCountModel.product_id, ProductPairCountModel.related_id],
+            set_={"orders": ProductPairCountModel.orders + stmt.excluded.orders},
+        )
+    )
+
+    watermark.last_id = last_id
+    watermark.processed += orders
+    watermark.updated_at = func.now()
+    touched = list(await db.scalars(select(items.c.product_id).distinct()))
+    await refresh_associations(db, touched, watermark.processed)
+    return int(orders)
+
+
+async def refresh_associations(db: AsyncSession, product_ids: list[int], total_orders: int) -> None:
+    """
+    Пересобирает списки связей товаров product_ids из матрицы совместных покупок.
+
+    Связь A → B проходит, если товары куплены вместе не реже also_bought_min_orders раз (support)
+    и вместе чаще, чем случайно, не меньше чем в also_bought_min_lift раз (lift = P(AB) / (P(A) P(B))).
+    Из прошедших остаются also_bought_top_n с наибольшим числом совместных заказов.
+    """
+    settings = get_settings()
+    pair = aliased(ProductPairCountModel, name="pair")
+    own = aliased(ProductPairCountModel, name="own")
+    other = aliased(ProductPairCountModel, name="other")
+    lift = cast(pair.orders, Float) * total_orders / (own.orders * other.orders)
+    candidates = (
+        select(
+            pair.product_id,
+            pair.related_id,
+            pair.orders,
+            (cast(pair.orders, Float) / own.orders).label("confidence"),
+            lift.label("lift"),
+            func.row_number()
+            .over(partition_by=pair.product_id, order_by=(pair.orders.desc(), lift.desc(), pair.related_id))
+            .label("rank"),
+        )
+        # Диагональ матрицы — число заказов с самим товаром
+        .join(own, (own.product_id == pair.product_id) & (own.related_id == pair.product_id))
+        .join(other, (other.product_id == pair.related_id) & (other.related_id == pair.related_id))
+        .where(
+            pair.product_id == any_(bindparam("product_ids", product_ids, type_=ARRAY(Integer))),
+            pair.related_id != pair.product_id,
+            pair.orders >= settings.also_bought_min_orders,
+            lift >= settings.also_bought_min_lift,
+        )
+        .subquery()
+    )
+
+    await db.execute(
+        delete(ProductAssociationModel).where(
+            ProductAssociationModel.product_id == any_(bindparam("product_ids", product_ids, type_=ARRAY(Integer)))
+        )
+    )
+    columns = ["product_id", "related_id", "orders", "confidence", "lift", "rank"]
+    await db.execute(
+        insert(ProductAssociationModel).from_select(
+            columns,
+            select(*(candidates.c[column] for column in columns)).where(
+                candidates.c.rank <= settings.also_bought_top_n
+            ),
+        )
+    )
@@ -0,0 +1,142 @@
+import hashlib
+import secrets
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Protocol
+
+from loguru import logger
+
+from app.services.edge_cache import edge_purger
+
+
+# Ключи версий: товар, товары категории, дерево категорий и весь каталог
+CATALOG = "catalog"
+CATEGORIES = "categories"
+
+
+def product_key(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+def category_key(category_id: int) -> str:
+    return f"category:{category_id}"
+
+
+class VersionBackend(Protocol):
+    """
+    Общее для всех воркеров хранилище счётчиков версий.
+    """
+
+    async def snapshot(self, keys: list[str]) -> tuple[str, list[int]]:
+        """
+        Эпоха хранилища и текущие версии keys. Эпоха меняется, когда счётчики начинаются заново.
+        """
+        ...
+
+    async def incr_many(self, keys: list[str]) -> None: ...
+
+
+class InMemoryVersionBackend:
+    """
+    Версии в памяти процесса. Годится для одного воркера и тестов: записи в других воркерах сюда не попадают.
+    """
+
+    def __init__(self) -> None:
+        # Счётчики начинаются с нуля при каждом запуске, поэтому ETag прошлого процесса не должен совпасть
+        self._epoch = secrets.token_hex(8)
+        self._values: defaultdict[str, int] = defaultdict(int)
+
+    async def snapshot(self, keys: list[str]) -> tuple[str, list[int]]:
+        return self._epoch, [self._values.get(key, 0) for key in keys]
+
+    async def incr_many(self, keys: list[str]) -> None:
+        for key in keys:
+            self._values[key] += 1
+
+
+class RedisVersionBackend:
+    """
+    Версии в Redis: один MGET на проверку и один конвейер INCR на запись.
+    """
+
+    EPOCH_KEY = "ver:epoch"
+
+    def __init__(self, url: str) -> None:
+        from redis.asyncio import Redis
+
+        self._redis = Redis.from_url(url)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+    async def snapshot(self, keys: list[str]) -> tuple[str, list[int]]:
+        epoch, *values = await self._redis.mget([self.EPOCH_KEY, *(f"ver:{key}" for key in keys)])
+        if epoch is None:
+            # Первый запуск или Redis потерял данные: счётчики начинаются заново с новой эпохой
+            await self._redis.set(self.EPOCH_KEY, secrets.token_hex(8), nx=True)
+            epoch = await self._redis.get(self.EPOCH_KEY)
+        return epoch.decode(), [int(value) if value is not None else 0 for value in values]
+
+    async def incr_many(self, keys: list[str]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.incr(f"ver:{key}")
+            await pipe.execute()
+
+
+class CatalogVersions:
+    """
+    Счётчики версий данных каталога для ETag.
+
+    Записи в каталог увеличивают версии после коммита, а условный GET сравнивает ETag
+    из текущих версий с If-None-Match до основного запроса к базе.
+    """
+
+    def __init__(self, backend: VersionBackend | None = None) -> None:
+        self.backend: VersionBackend = backend or InMemoryVersionBackend()
+
+    async def etag(self, keys: list[str]) -> str | None:
+        """
+        Сильный ETag для ответа, зависящего от keys. None, если хранилище версий недоступно.
+        """
+        try:
+            epoch, versions = await self.backend.snapshot(keys)
+        except Exception as exc:
+            logger.warning(f"Catalog versions unavailable: {exc}")
+            return None
+        state = ",".join(f"{key}={version}" for key, version in zip(keys, versions, strict=True))
+        return '"' + hashlib.blake2b(f"{epoch}|{state}".encode(), digest_size=12).hexdigest() + '"'
+
+    async def bump(
+        self,
+        product_ids: Iterable[int] = (),
+        category_ids: Iterable[int | None] = (),
+        categories: bool = False,
+    ) -> None:
+        """
+        Отмечает изменение товаров, товаров в категориях и, при categories=True, самих категорий.
+        Любое изменение меняет и версию всего каталога.
+        """
+        keys = [CATALOG, *(product_key(pid) for pid in set(product_ids))]
+        keys += [category_key(cid) for cid in set(category_ids) if cid is not None]
+        if categories:
+            keys.append(CATEGORIES)
+        await self.bump_keys(keys)
+
+    async def bump_keys(self, keys: list[str]) -> None:
+        """
+        Увеличивает версии keys и очищает ответы с этими surrogate-ключами в CDN.
+        """
+        try:
+            await self.backend.incr_many(keys)
+        except Exception as exc:
+            logger.warning(f"Failed to bump catalog versions: {exc}")
+        edge_purger.purge(keys)
+
+    async def close(self) -> None:
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            await close()
+
+
+catalog_versions = CatalogVersions()
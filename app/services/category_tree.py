@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+from app.config import get_settings
+from app.database import async_session_maker
+from app.models.categories import Category as CategoryModel
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryNode:
+    id: int
+    name: str
+    parent_id: int | None
+    is_active: bool = True
+
+
+class CategoryTree:
+    """
+    Дерево активных категорий в памяти воркера.
+
+    Загружается при старте приложения и обновляется не чаще раза в category_tree_ttl секунд;
+    изменения категорий в этом воркере сбрасывают кеш сразу, в остальных — по истечении TTL.
+    """
+
+    def __init__(self) -> None:
+        self._nodes: dict[int, CategoryNode] = {}
+        self._children: dict[int | None, list[int]] = {}
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded_at is not None
+
+    async def refresh(self) -> None:
+        async with async_session_maker() as db:
+            rows = (
+                await db.execute(
+                    select(CategoryModel.id, CategoryModel.name, CategoryModel.parent_id)
+                    .where(CategoryModel.is_active)
+                    .order_by(CategoryModel.id)
+                )
+            ).all()
+        nodes = {row.id: CategoryNode(row.id, row.name, row.parent_id) for row in rows}
+        children: defaultdict[int | None, list[int]] = defaultdict(list)
+        for node in nodes.values():
+            children[node.parent_id].append(node.id)
+        self._nodes, self._children = nodes, dict(children)
+        self._loaded_at = time.monotonic()
+
+    async def _ensure_fresh(self) -> None:
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < get_settings().category_tree_ttl:
+            return
+        # Одно обновление на воркер: остальные запросы ждут его, а не идут в базу параллельно
+        async with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= get_settings().category_tree_ttl:
+                await self.refresh()
+
+    async def categories(self) -> list[CategoryNode]:
+        await self._ensure_fresh()
+        return list(self._nodes.values())
+
+    async def is_active(self, category_id: int) -> bool:
+        await self._ensure_fresh()
+        return category_id in self._nodes
+
+    async def descendants(self, category_id: int) -> list[int]:
+        """
+        id категории и всех её активных потомков.
+        """
+        await self._ensure_fresh()
+        if category_id not in self._nodes:
+            return []
+        result, stack = [], [category_id]
+        while stack:
+            current = stack.pop()
+            result.append(current)
+            stack.extend(self._children.get(current, ()))
+        return result
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+
+category_tree = CategoryTree()
@@ -0,0 +1,66 @@
+import asyncio
+from collections.abc import Iterable
+
+from loguru import logger
+
+from app.config import get_settings
+from app.metrics import metrics
+
+
+class EdgePurger:
+    """
+    Инвалидация ответов в кеше перед приложением (CDN) по surrogate-ключам.
+
+    Записи в каталог не ждут ответа CDN: ключи копятся и раз в edge_purge_interval
+    отправляются одним запросом с заголовком Surrogate-Key. Без edge_purge_url ничего не делает:
+    nginx перепроверяет закешированные ответы по ETag, версии которых уже изменились.
+    """
+
+    def __init__(self) -> None:
+        self._pending: set[str] = set()
+        self._flush_task: asyncio.Task | None = None
+
+    def purge(self, keys: Iterable[str]) -> None:
+        if not get_settings().edge_purge_url:
+            return
+        self._pending.update(keys)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def flush(self) -> None:
+        settings = get_settings()
+        if not self._pending or not settings.edge_purge_url:
+            return
+        keys, self._pending = sorted(self._pending), set()
+
+        import httpx
+
+        headers = {"Surrogate-Key": " ".join(keys)}
+        if settings.edge_purge_token:
+            headers["Authorization"] = f"Bearer {settings.edge_purge_token}"
+        async with httpx.AsyncClient(timeout=5) as client:
+            response = await client.post(settings.edge_purge_url, headers=headers)
+        response.raise_for_status()
+        metrics.inc("edge_purged_keys_total", len(keys))
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as exc:
+            logger.warning(f"Edge cache purge failed: {exc}")
+
+    async def _flush_loop(self) -> None:
+        while self._pending:
+            await asyncio.sleep(get_settings().edge_purge_interval)
+            try:
+                await self.flush()
+            except Exception as exc:
+                # Ответы в CDN всё равно устареют через s-maxage
+                metrics.inc("edge_purge_failed_total")
+                logger.warning(f"Edge cache purge failed: {exc}")
+
+
+edge_purger = EdgePurger()
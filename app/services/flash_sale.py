@@ -0,0 +1,182 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import delete, select
+
+from app.config import get_settings
+from app.database import async_session_maker
+from app.models.cart_items import CartItem as CartItemModel
+from app.models.orders import Order as OrderModel
+from app.models.orders import OrderItem as OrderItemModel
+from app.models.products import Product as ProductModel
+from app.services.catalog_versions import catalog_versions
+from app.services.outbox import add_event, order_event_payload
+from app.services.trending import trending
+
+
+@dataclass(slots=True)
+class FlashSaleResult:
+    """
+    Итог обработки заявки: id созданного заказа либо причина отказа.
+    """
+
+    order_id: int | None = None
+    detail: str | None = None
+
+    @property
+    def accepted(self) -> bool:
+        return self.order_id is not None
+
+
+@dataclass(slots=True)
+class _Ticket:
+    user_id: int
+    future: asyncio.Future[FlashSaleResult] = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class FlashSaleQueue:
+    """
+    Очередь заявок на оформление заказа для одного товара.
+
+    Заявки обрабатываются единственным потребителем строго в порядке поступления:
+    пачка заявок получает одну блокировку строки товара, одно списание остатка
+    и один коммит на всех покупателей.
+    """
+
+    def __init__(self, product_id: int, batch_size: int | None = None, maxsize: int | None = None):
+        settings = get_settings()
+        self.product_id = product_id
+        self.batch_size = batch_size or settings.flash_sale_batch_size
+        self._queue: asyncio.Queue[_Ticket] = asyncio.Queue(maxsize=maxsize or settings.flash_sale_queue_size)
+        self._worker: asyncio.Task | None = None
+        self._sold_out_until = 0.0
+        self._sold_out_detail: str | None = None
+
+    async def submit(self, user_id: int) -> FlashSaleResult:
+        """
+        Ставит заявку покупателя в очередь и ждёт её обработки.
+        """
+        # Товар недавно закончился — отказываем сразу, не занимая очередь и базу
+        if self._sold_out_detail and time.monotonic() < self._sold_out_until:
+            return FlashSaleResult(detail=self._sold_out_detail)
+
+        ticket = _Ticket(user_id=user_id)
+        try:
+            self._queue.put_nowait(ticket)
+        except asyncio.QueueFull:
+            return FlashSaleResult(detail="Flash sale queue is full, try again later")
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._drain())
+
+        return await ticket.future
+
+    async def _drain(self) -> None:
+        """
+        Разбирает очередь пачками, пока в ней есть заявки.
+        """
+        while not self._queue.empty():
+            batch = [self._queue.get_nowait() for _ in range(min(self.batch_size, self._queue.qsize()))]
+            # Заявки, чьи клиенты уже отключились, не обрабатываем
+            batch = [ticket for ticket in batch if not ticket.future.done()]
+            if not batch:
+                continue
+            try:
+                results = await self._process_batch(batch)
+            except Exception as exc:
+                for ticket in batch:
+                    if not ticket.future.done():
+                        ticket.future.set_exception(exc)
+                continue
+            for ticket, result in zip(batch, results, strict=True):
+                if not ticket.future.done():
+                    ticket.future.set_result(result)
+
+    async def _process_batch(self, batch: list[_Ticket]) -> list[FlashSaleResult]:
+        """
+        Оформляет заказы для пачки заявок в одной транзакции (групповой коммит).
+        """
+        async with async_session_maker() as db:
+            # Одна блокировка строки товара на всю пачку вместо блокировки на каждого покупателя
+            product = (
+                await db.scalars(select(ProductModel).where(ProductModel.id == self.product_id).with_for_update())
+            ).first()
+
+            user_ids = [ticket.user_id for ticket in batch]
+            cart_rows = await db.execute(
+                select(CartItemModel.user_id, CartItemModel.quantity).where(
+                    CartItemModel.product_id == self.product_id, CartItemModel.user_id.in_(user_ids)
+                )
+            )
+            quantities: dict[int, int] = dict(cart_rows.tuples().all())
+
+            decisions: list[tuple[_Ticket, int | None, str | None]] = []
+            stock = product.stock if product else 0
+            for ticket in batch:
+                # pop: повторная заявка того же покупателя в пачке увидит уже пустую корзину
+                quantity = quantities.pop(ticket.user_id, None)
+                if product is None or not product.is_active:
+                    decisions.append((ticket, None, f"Product {self.product_id} is unavailable"))
+                elif quantity is None:
+                    decisions.append((ticket, None, "Cart is empty"))
+                elif stock < quantity:
+                    decisions.append((ticket, None, f"Not enough stock for product {product.name}"))
+                else:
+                    stock -= quantity
+                    decisions.append((ticket, quantity, None))
+
+            accepted = [(ticket, quantity) for ticket, quantity, _ in decisions if quantity is not None]
+            orders: dict[int, OrderModel] = {}
+            if product is not None and accepted:
+                for ticket, quantity in accepted:
+                    total_price = product.price * quantity
+                    order = OrderModel(user_id=ticket.user_id, total_amount=total_price)
+                    order.items.append(
+                        OrderItemModel(
+                            product_id=self.product_id,
+                            quantity=quantity,
+                            unit_price=product.price,
+                            total_price=total_price,
+                        )
+                    )
+                    orders[id(ticket)] = order
+                db.add_all(orders.values())
+                product.stock = stock
+                await db.execute(
+                    delete(CartItemModel).where(
+                        CartItemModel.product_id == self.product_id,
+                        CartItemModel.user_id.in_([ticket.user_id for ticket, _ in accepted]),
+                    )
+                )
+                # События всей пачки записываются при коммите одним INSERT
+                for order in orders.values():
+                    add_event(db, "order.created", order_event_payload(order))
+                await db.commit()
+                # Одно изменение версии на всю пачку заказов
+                await catalog_versions.bump(product_ids=[self.product_id], category_ids=[product.category_id])
+                trending.record_order([(self.product_id, product.category_id)] * len(accepted))
+
+        if product is not None and stock == 0:
+            self._sold_out_until = time.monotonic() + get_settings().flash_sale_sold_out_ttl
+            self._sold_out_detail = f"Not enough stock for product {product.name}"
+        else:
+            self._sold_out_detail = None
+
+        return [
+            FlashSaleResult(order_id=orders[id(ticket)].id) if quantity is not None else FlashSaleResult(detail=detail)
+            for ticket, quantity, detail in decisions
+        ]
+
+
+_queues: dict[int, FlashSaleQueue] = {}
+
+
+async def submit_flash_sale_checkout(product_id: int, user_id: int) -> FlashSaleResult:
+    """
+    Оформляет заказ на товар флеш-распродажи через очередь этого товара.
+    """
+    queue = _queues.get(product_id)
+    if queue is None:
+        queue = _queues[product_id] = FlashSaleQueue(product_id)
+    return await queue.submit(user_id)
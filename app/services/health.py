@@ -0,0 +1,138 @@
+import asyncio
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, cast
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from app.config import get_settings
+from app.database import get_engine
+from app.metrics import metrics
+from app.services.category_tree import category_tree
+
+
+@dataclass(slots=True)
+class CheckResult:
+    ok: bool
+    latency_ms: float | None = None
+    detail: str | None = None
+
+
+@dataclass(slots=True)
+class Readiness:
+    ready: bool
+    checks: dict[str, CheckResult] = field(default_factory=dict)
+    checked_at: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "status": "ok" if self.ready else "degraded",
+            "checks": {name: asdict(check) for name, check in self.checks.items()},
+        }
+
+
+class ReadinessProbe:
+    """
+    Проверка готовности воркера принимать трафик: прогрев, запас пула, задержка базы и брокера.
+
+    Результат кешируется на health_cache_ttl секунд, а одновременные пробы ждут одну проверку,
+    поэтому частые запросы балансировщика не добавляют нагрузки на базу и Redis.
+    """
+
+    def __init__(self) -> None:
+        self._last: Readiness | None = None
+        self._lock = asyncio.Lock()
+        self._redis: dict[str, Any] = {}
+
+    async def check(self, started: bool) -> Readiness:
+        if not started:
+            # До конца старта и во время остановки воркер не готов, что бы ни показали зависимости:
+            # ответ сразу, без кеша и без обращений к базе и Redis на каждую пробу балансировщика
+            return Readiness(ready=False, checks={"warmup": CheckResult(ok=False, detail="not started")})
+        ttl = get_settings().health_cache_ttl
+        if self._last is not None and time.monotonic() - self._last.checked_at < ttl:
+            return self._last
+        async with self._lock:
+            if self._last is None or time.monotonic() - self._last.checked_at >= ttl:
+                self._last = await self._run()
+        return self._last
+
+    async def _run(self) -> Readiness:
+        settings = get_settings()
+        checks = {"pool": self._check_pool()}
+        # Пинг берёт соединение из пула; при исчерпанном пуле он лишь дождался бы pool_timeout
+        checks["database"] = (
+            await self._check_database() if checks["pool"].ok else CheckResult(ok=False, detail="skipped")
+        )
+        checks["warmup"] = await self._check_warmup(checks["database"].ok)
+        redis_urls = {
+            "redis": settings.rate_limit_redis_url,
+            "cache": settings.cache_redis_url,
+            "broker": settings.celery_broker_url,
+        }
+        for name, url in redis_urls.items():
+            if url:
+                checks[name] = await self._check_redis(url)
+
+        result = Readiness(ready=all(check.ok for check in checks.values()), checks=checks)
+        result.checked_at = time.monotonic()
+        metrics.set("health_ready", int(result.ready))
+        for name, check in checks.items():
+            if check.latency_ms is not None:
+                metrics.set("health_check_latency_ms", check.latency_ms, check=name)
+        if not result.ready:
+            failed = ", ".join(name for name, check in checks.items() if not check.ok)
+            logger.warning(f"Readiness check failed: {failed}")
+        return result
+
+    async def _check_warmup(self, database_ok: bool) -> CheckResult:
+        if not category_tree.ready and database_ok:
+            # Прогрев при старте не удался (база была недоступна) — догружаем кеш, иначе трафик сюда не придёт
+            try:
+                await category_tree.refresh()
+            except Exception as exc:
+                return CheckResult(ok=False, detail=type(exc).__name__)
+        return CheckResult(ok=category_tree.ready)
+
+    def _check_pool(self) -> CheckResult:
+        settings = get_settings()
+        pool = cast(QueuePool, get_engine().pool)
+        capacity = settings.db_pool_size + settings.db_max_overflow
+        headroom = capacity - pool.checkedout()
+        return CheckResult(
+            ok=headroom >= settings.health_min_pool_headroom, detail=f"{headroom} of {capacity} connections free"
+        )
+
+    async def _check_database(self) -> CheckResult:
+        settings = get_settings()
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(settings.health_probe_timeout), get_engine().connect() as connection:
+                await connection.execute(text("SELECT 1"))
+        except Exception as exc:
+            return CheckResult(ok=False, detail=type(exc).__name__)
+        latency = time.perf_counter() - started
+        return CheckResult(ok=latency <= settings.health_db_latency_threshold, latency_ms=round(latency * 1000, 2))
+
+    async def _check_redis(self, url: str) -> CheckResult:
+        from redis.asyncio import Redis
+
+        if url not in self._redis:
+            self._redis[url] = Redis.from_url(url)
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(get_settings().health_probe_timeout):
+                await self._redis[url].ping()
+        except Exception as exc:
+            return CheckResult(ok=False, detail=type(exc).__name__)
+        return CheckResult(ok=True, latency_ms=round((time.perf_counter() - started) * 1000, 2))
+
+    async def close(self) -> None:
+        for client in self._redis.values():
+            await client.aclose()
+        self._redis.clear()
+
+
+readiness_probe = ReadinessProbe()
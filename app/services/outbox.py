@@ -0,0 +1,223 @@
+import asyncio
+import time
+from contextlib import suppress
+from datetime import timedelta
+from typing import Any, cast
+
+import asyncpg
+from loguru import logger
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import async_session_maker, get_engine
+from app.metrics import metrics
+from app.models.orders import Order as OrderModel
+from app.models.outbox_events import OutboxEvent as OutboxEventModel
+
+
+# Задача Celery для каждого типа события. Задача получает список пар (id события, payload).
+# При повторной отправке события могут попасть в другие пачки и задачи, но id события тот же:
+# дубли отбрасываются по нему, а не по task_id
+EVENT_TASKS: dict[str, str] = {
+    "order.created": "app.tasks.events.order_created",
+    "review.created": "app.tasks.events.review_created",
+    "product.changed": "app.tasks.events.product_changed",
+}
+
+# Канал NOTIFY, в который пишет триггер на outbox_events (см. миграцию b3e1f27c9d40)
+OUTBOX_CHANNEL = "outbox_events"
+# Потолок паузы между повторными попытками отправить событие, с
+MAX_RETRY_DELAY = 300
+# Как часто ретранслятор удаляет отправленные события старше outbox_retention, с
+CLEANUP_INTERVAL = 60
+
+
+def add_event(db: AsyncSession, event_type: str, payload: dict[str, Any]) -> None:
+    """
+    Добавляет событие в текущую транзакцию db: оно уйдёт в Celery, только если транзакция закоммитится.
+
+    Запись выполняется вместе с остальными изменениями при коммите, сам запрос к брокеру
+    делает ретранслятор, поэтому время ответа не зависит от брокера.
+    """
+    if event_type not in EVENT_TASKS:
+        raise ValueError(f"Unknown outbox event type: {event_type}")
+    db.add(OutboxEventModel(event_type=event_type, payload=payload))
+
+
+def order_event_payload(order: OrderModel) -> dict[str, Any]:
+    return {
+        "order_id": order.id,
+        "user_id": order.user_id,
+        "total_amount": str(order.total_amount),
+        "items": [{"product_id": item.product_id, "quantity": item.quantity} for item in order.items],
+    }
+
+
+def publish_events(events: list[tuple[int, str, dict[str, Any]]]) -> tuple[list[int], dict[int, str]]:
+    """
+    Отправляет пачку событий (id, тип, payload) в брокер через одно соединение: по одной задаче
+    на тип события, задача получает все события своего типа из пачки.
+    Возвращает id отправленных событий и ошибки неотправленных.
+
+    Вызов блокирующий (kombu), ретранслятор выполняет его в отдельном потоке.
+    При task_always_eager задачи выполняются здесь же, без брокера.
+    """
+    from app.configs.celery_app import celery_app
+
+    grouped: dict[str, list[tuple[int, dict[str, Any]]]] = {}
+    for event_id, event_type, payload in events:
+        grouped.setdefault(event_type, []).append((event_id, payload))
+
+    delivered: list[int] = []
+    failed: dict[int, str] = {}
+    try:
+        with celery_app.producer_or_acquire() as producer:
+            for event_type, group in grouped.items():
+                event_ids = [event_id for event_id, _ in group]
+                try:
+                    if celery_app.conf.task_always_eager:
+                        celery_app.tasks[EVENT_TASKS[event_type]].apply(args=[group])
+                    else:
+                        # Повторы при недоступном брокере делает ретранслятор, а не kombu: пачка не зависает
+                        celery_app.send_task(EVENT_TASKS[event_type], args=[group], producer=producer, retry=False)
+                except Exception as exc:
+                    failed.update(dict.fromkeys(event_ids, repr(exc)))
+                else:
+                    delivered.extend(event_ids)
+    except Exception as exc:
+        # Брокер недоступен: соединение не открылось или оборвалось посреди пачки
+        for event_id, _, _ in events:
+            if event_id not in delivered:
+                failed.setdefault(event_id, repr(exc))
+    return delivered, failed
+
+
+class OutboxRelay:
+    """
+    Пересылает события из outbox_events в Celery пачками.
+
+    Просыпается по NOTIFY после коммита транзакции с событиями и, на случай потерянного уведомления,
+    раз в outbox_poll_interval. Пачка выбирается через FOR UPDATE SKIP LOCKED и помечается отправленной
+    в той же транзакции, поэтому несколько ретрансляторов не отправляют одно событие дважды.
+    Доставка «хотя бы один раз»: если процесс упадёт между отправкой и коммитом, события уйдут повторно
+    с теми же id. Неотправленные события повторяются с экспоненциальной паузой до outbox_max_attempts,
+    после чего остаются в таблице недоставленными (dead letter): об этом пишется ошибка в журнал,
+    число таких событий видно в метрике outbox_dead_events, а удаляются они через outbox_retention, как отправленные.
+    """
+
+    def __init__(self) -> None:
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._cleaned_at = 0.0
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wake.set()
+
+    async def run(self) -> None:
+        settings = get_settings()
+        while not self._stopping:
+            try:
+                await self._listen_and_relay()
+            except Exception as exc:
+                # Обрыв соединения с базой: ждём и подписываемся заново
+                logger.warning(f"Outbox relay failed: {exc}")
+                await self._sleep(settings.outbox_poll_interval)
+
+    async def _listen_and_relay(self) -> None:
+        settings = get_settings()
+        async with get_engine().connect() as connection:
+            raw_connection = await connection.get_raw_connection()
+            listener = cast(asyncpg.Connection, raw_connection.driver_connection)
+            await listener.add_listener(OUTBOX_CHANNEL, lambda *_: self._wake.set())
+            while not self._stopping:
+                self._wake.clear()
+                # Полная пачка — в очереди, скорее всего, есть ещё события
+                while not self._stopping and await self.relay_batch() == settings.outbox_batch_size:
+                    pass
+                await self._cleanup()
+                await self._sleep(settings.outbox_poll_interval)
+
+    async def _sleep(self, seconds: float) -> None:
+        with suppress(TimeoutError):
+            await asyncio.wait_for(self._wake.wait(), seconds)
+
+    async def relay_batch(self) -> int:
+        """
+        Отправляет одну пачку готовых к отправке событий. Возвращает размер пачки.
+        """
+        settings = get_settings()
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(OutboxEventModel.id, OutboxEventModel.event_type, OutboxEventModel.payload)
+                .where(
+                    OutboxEventModel.delivered_at.is_(None),
+                    OutboxEventModel.available_at <= func.now(),
+                    OutboxEventModel.attempts < settings.outbox_max_attempts,
+                )
+                .order_by(OutboxEventModel.id)
+                .limit(settings.outbox_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            events = [tuple(row) for row in result]
+            if not events:
+                return 0
+
+            delivered, failed = await asyncio.to_thread(publish_events, events)
+            if delivered:
+                await db.execute(
+                    update(OutboxEventModel)
+                    .where(OutboxEventModel.id.in_(delivered))
+                    .values(delivered_at=func.now(), last_error=None)
+                )
+            # Обычно у всей пачки одна ошибка (брокер недоступен), поэтому обновляем группами
+            errors: dict[str, list[int]] = {}
+            for event_id, error in failed.items():
+                errors.setdefault(error, []).append(event_id)
+            dead: list[int] = []
+            for error, event_ids in errors.items():
+                delay = func.least(func.power(2, OutboxEventModel.attempts), MAX_RETRY_DELAY)
+                result = await db.execute(
+                    update(OutboxEventModel)
+                    .where(OutboxEventModel.id.in_(event_ids))
+                    .values(
+                        attempts=OutboxEventModel.attempts + 1,
+                        available_at=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, delay),
+                        last_error=error[:1000],
+                    )
+                    .returning(OutboxEventModel.id, OutboxEventModel.attempts)
+                )
+                dead.extend(event_id for event_id, attempts in result if attempts >= settings.outbox_max_attempts)
+            await db.commit()
+
+        if dead:
+            metrics.inc("outbox_dead_letter_total", len(dead))
+            logger.error(
+                f"Outbox relay: events {dead} not delivered after {settings.outbox_max_attempts} attempts, "
+                "they stay in outbox_events until OUTBOX_RETENTION"
+            )
+
+        if failed:
+            logger.warning(f"Outbox relay: {len(failed)} of {len(events)} events not delivered")
+        return len(events)
+
+    async def _cleanup(self) -> None:
+        if time.monotonic() - self._cleaned_at < CLEANUP_INTERVAL:
+            return
+        self._cleaned_at = time.monotonic()
+        settings = get_settings()
+        cutoff = func.now() - timedelta(seconds=settings.outbox_retention)
+        dead = OutboxEventModel.delivered_at.is_(None) & (OutboxEventModel.attempts >= settings.outbox_max_attempts)
+        async with async_session_maker() as db:
+            # Недоставленные после всех попыток хранятся столько же, считая от последней попытки
+            await db.execute(
+                delete(OutboxEventModel).where(
+                    (OutboxEventModel.delivered_at < cutoff) | (dead & (OutboxEventModel.available_at < cutoff))
+                )
+            )
+            metrics.set(
+                "outbox_dead_events",
+                await db.scalar(select(func.count()).select_from(OutboxEventModel).where(dead)) or 0,
+            )
+            await db.commit()
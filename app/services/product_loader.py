@@ -0,0 +1,122 @@
+import asyncio
+from collections.abc import Iterable
+from typing import cast
+
+from sqlalchemy import Integer, Select, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.products import Product as ProductModel
+
+
+def products_by_ids_query(ids: list[int]) -> Select[tuple[ProductModel]]:
+    """
+    Товары с id из списка одним запросом: WHERE id = ANY(:ids) с одним параметром-массивом,
+    поэтому подготовленное выражение одно и то же при любом числе id.
+    """
+    return select(ProductModel).where(ProductModel.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+
+
+class ProductLoader:
+    """
+    Загрузчик товаров в рамках одной сессии (одного запроса).
+
+    Запросы товаров, сделанные в одной итерации event loop (например, через asyncio.gather),
+    собираются в один SELECT; уже загруженные товары берутся из кеша загрузчика.
+    Неактивные товары тоже возвращаются: доступность проверяет вызывающий код.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self._db = db
+        self._cache: dict[int, ProductModel | None] = {}
+        self._pending: dict[int, asyncio.Future[ProductModel | None]] = {}
+        self._dispatch_task: asyncio.Task | None = None
+        # Запущенные пачки и их ожидания: пачку, которую никто не ждёт, можно отменить
+        self._batches: dict[asyncio.Task, dict[int, asyncio.Future[ProductModel | None]]] = {}
+        # Сессия не допускает параллельных запросов: следующая пачка ждёт, пока выполнится предыдущая
+        self._lock = asyncio.Lock()
+
+    def _enqueue(self, product_id: int) -> asyncio.Future[ProductModel | None]:
+        future = self._pending.get(product_id)
+        if future is None:
+            future = self._pending[product_id] = asyncio.get_running_loop().create_future()
+            if self._dispatch_task is None:
+                # Запрос уйдёт на следующей итерации цикла, когда соберутся все id этой итерации
+                task = self._dispatch_task = asyncio.create_task(self._dispatch(self._pending))
+                self._batches[task] = self._pending
+                task.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, task: asyncio.Task) -> None:
+        pending = self._batches.pop(task)
+        # Пачка, отменённая до запуска, больше не принимает id
+        if self._pending is pending:
+            self._pending, self._dispatch_task = {}, None
+
+    async def _wait(self, futures: list[asyncio.Future[ProductModel | None]]) -> None:
+        """
+        Ждёт загрузки без shield: если запрос отменён (например, клиент отключился), пачки, которые больше
+        никто не ждёт, отменяются, и отмена не завершается, пока они не остановятся: сессию запроса
+        закрывает get_async_db, и запрос загрузчика не должен выполняться на ней после этого.
+        """
+        try:
+            await asyncio.gather(*futures)
+        except asyncio.CancelledError:
+            abandoned = [
+                task
+                for task, pending in self._batches.items()
+                if all(future.cancelled() for future in pending.values())
+            ]
+            for task in abandoned:
+                task.cancel()
+            if abandoned:
+                await asyncio.wait(abandoned)
+            raise
+
+    async def load(self, product_id: int) -> ProductModel | None:
+        if product_id in self._cache:
+            return self._cache[product_id]
+        future = self._enqueue(product_id)
+        await self._wait([future])
+        return future.result()
+
+    async def load_many(self, product_ids: Iterable[int]) -> list[ProductModel | None]:
+        """
+        Товары в порядке product_ids; None для отсутствующих.
+        """
+        product_ids = list(product_ids)
+        # Ставим все id в очередь сразу, не дожидаясь запуска отдельных задач
+        futures = {pid: self._enqueue(pid) for pid in product_ids if pid not in self._cache}
+        if futures:
+            await self._wait(list(futures.values()))
+        return [self._cache[pid] for pid in product_ids]
+
+    async def _dispatch(self, pending: dict[int, asyncio.Future[ProductModel | None]]) -> None:
+        self._pending, self._dispatch_task = {}, None
+        try:
+            async with self._lock:
+                result = await self._db.scalars(products_by_ids_query(list(pending)))
+                products = {product.id: product for product in result}
+        except asyncio.CancelledError:
+            for future in pending.values():
+                future.cancel()
+            raise
+        except Exception as exc:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for product_id, future in pending.items():
+            self._cache[product_id] = products.get(product_id)
+            if not future.done():
+                future.set_result(self._cache[product_id])
+
+
+def get_product_loader(db: AsyncSession) -> ProductLoader:
+    """
+    Загрузчик товаров, общий для всех помощников, работающих с этой сессией.
+    """
+    loader = cast(ProductLoader | None, db.info.get("product_loader"))
+    if loader is None:
+        loader = db.info["product_loader"] = ProductLoader(db)
+    return loader
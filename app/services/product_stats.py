@@ -0,0 +1,129 @@
+import asyncio
+from collections import Counter
+
+from loguru import logger
+from sqlalchemy import BigInteger, Integer, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, Insert, insert
+
+from app.config import get_settings
+from app.database import async_session_maker
+from app.metrics import metrics
+from app.models.product_stats import ProductStats as ProductStatsModel
+from app.models.products import Product as ProductModel
+
+
+def upsert_stats_query(product_ids: list[int], views: list[int], search_clicks: list[int]) -> Insert:
+    """
+    Прибавляет приросты счётчиков одним INSERT ... ON CONFLICT. Строки передаются тремя массивами
+    через unnest, поэтому подготовленное выражение одно при любом размере пачки.
+
+    Прибавление, а не замена: пачки разных воркеров складываются в любом порядке.
+    Товары, которых уже нет, отбрасываются соединением с products.
+    """
+    deltas = (
+        func.unnest(
+            bindparam("product_ids", product_ids, type_=ARRAY(Integer)),
+            bindparam("views", views, type_=ARRAY(BigInteger)),
+            bindparam("search_clicks", search_clicks, type_=ARRAY(BigInteger)),
+        )
+        .table_valued("product_id", "views", "search_clicks")
+        .render_derived()
+    )
+    stmt = insert(ProductStatsModel).from_select(
+        ["product_id", "views", "search_clicks"],
+        select(deltas.c.product_id, deltas.c.views, deltas.c.search_clicks)
+        .join(ProductModel, ProductModel.id == deltas.c.product_id)
+        # Одинаковый порядок блокировок строк во всех воркерах: встречные пачки не взаимоблокируются
+        .order_by(deltas.c.product_id),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[ProductStatsModel.product_id],
+        set_={
+            "views": ProductStatsModel.views + stmt.excluded.views,
+            "search_clicks": ProductStatsModel.search_clicks + stmt.excluded.search_clicks,
+            "updated_at": func.now(),
+        },
+    )
+
+
+class ProductStatsBuffer:
+    """
+    Буфер счётчиков просмотров и переходов из поиска в памяти воркера (write-behind).
+
+    Маршрут только увеличивает число в словаре; приросты уходят в product_stats одним запросом
+    раз в product_stats_flush_interval или сразу, когда в буфере набралось product_stats_flush_threshold товаров.
+    Каждый воркер gunicorn сбрасывает свой буфер, приросты складываются в базе.
+    При ошибке записи приросты возвращаются в буфер и уйдут со следующей пачкой.
+    """
+
+    def __init__(self) -> None:
+        self._views: Counter[int] = Counter()
+        self._search_clicks: Counter[int] = Counter()
+        self._flush_task: asyncio.Task | None = None
+        self._threshold_task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def record_view(self, product_id: int) -> None:
+        self._views[product_id] += 1
+        self._schedule()
+
+    def record_search_click(self, product_id: int) -> None:
+        self._search_clicks[product_id] += 1
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        elif len(self._views) + len(self._search_clicks) >= get_settings().product_stats_flush_threshold and (
+            self._threshold_task is None or self._threshold_task.done()
+        ):
+            # Буфер не растёт без предела при всплеске: пачка уходит, не дожидаясь таймера
+            self._threshold_task = asyncio.create_task(self._flush_logged())
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._views and not self._search_clicks:
+                return
+            views, self._views = self._views, Counter()
+            search_clicks, self._search_clicks = self._search_clicks, Counter()
+            product_ids = sorted(views.keys() | search_clicks.keys())
+            try:
+                async with async_session_maker() as db:
+                    await db.execute(
+                        upsert_stats_query(
+                            product_ids,
+                            [views[product_id] for product_id in product_ids],
+                            [search_clicks[product_id] for product_id in product_ids],
+                        )
+                    )
+                    await db.commit()
+            except BaseException:
+                self._views.update(views)
+                self._search_clicks.update(search_clicks)
+                raise
+            metrics.inc("product_stats_flushed_rows_total", len(product_ids))
+
+    async def close(self) -> None:
+        for task in (self._flush_task, self._threshold_task):
+            if task is not None:
+                task.cancel()
+        self._flush_task = self._threshold_task = None
+        try:
+            await self.flush()
+        except Exception as exc:
+            logger.warning(f"Product stats flush failed on shutdown: {exc}")
+
+    async def _flush_loop(self) -> None:
+        while self._views or self._search_clicks:
+            await asyncio.sleep(get_settings().product_stats_flush_interval)
+            await self._flush_logged()
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception as exc:
+            metrics.inc("product_stats_flush_failed_total")
+            logger.warning(f"Product stats flush failed: {exc}")
+
+
+product_stats = ProductStatsBuffer()
@@ -0,0 +1,407 @@
+import hashlib
+import heapq
+import math
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import (
+    ColumnElement,
+    Float,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+    String,
+    Text,
+    any_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.categories import Category as CategoryModel
+from app.models.job_watermarks import JobWatermark as JobWatermarkModel
+from app.models.product_similarities import ProductSignature as ProductSignatureModel
+from app.models.product_similarities import ProductSimilarity as ProductSimilarityModel
+from app.models.products import Product as ProductModel
+
+
+JOB = "similar_products"
+# Сигнатура — знаки 128 случайных проекций. Кандидаты в соседи — товары, у которых совпала хотя бы одна
+# полоса из 8 бит: чем меньше угол между векторами, тем вероятнее совпадение (LSH для косинусного сходства)
+SIGNATURE_BITS = 128
+BAND_BITS = 8
+# В корзине полосы хранится не больше стольких товаров: в плотных группах похожих товаров время
+# поиска соседей не растёт вместе с каталогом
+BUCKET_LIMIT = 200
+# Слово из названия (вес A в search_vector) значит для сходства больше слова из описания
+NAME_WEIGHT = 2.0
+
+
+@dataclass(frozen=True, slots=True)
+class Vocabulary:
+    """
+    Документные частоты слов search_vector по активным товарам — веса IDF.
+    """
+
+    documents: int
+    frequencies: dict[str, int]
+
+    def idf(self, lexeme: str) -> float:
+        # Слово одного товара ни с кем его не сближает, а сигнатуру зашумляет
+        frequency = self.frequencies.get(lexeme, 0)
+        return math.log(self.documents / frequency) if frequency > 1 else 0.0
+
+
+@lru_cache(maxsize=65536)
+def _projection(lexeme: str) -> tuple[float, ...]:
+    """
+    Координаты слова по случайным направлениям: ±1 по битам хеша слова, одинаковые во всех процессах.
+    """
+    value = int.from_bytes(hashlib.blake2b(lexeme.encode(), digest_size=SIGNATURE_BITS // 8).digest())
+    return tuple(1.0 if value >> bit & 1 else -1.0 for bit in range(SIGNATURE_BITS))
+
+
+def signature(terms: Iterable[tuple[str, float]]) -> int | None:
+    """
+    SimHash взвешенных слов: бит i равен 1, если проекция вектора на i-е направление положительна.
+    None, если у текста нет слов с ненулевым весом.
+    """
+    totals: list[float] | None = None
+    for lexeme, weight in terms:
+        if not weight:
+            continue
+        projection = _projection(lexeme)
+        if totals is None:
+            totals = [weight * sign for sign in projection]
+        else:
+            totals = [total + weight * sign for total, sign in zip(totals, projection, strict=True)]
+    if totals is None:
+        return None
+    return sum(1 << bit for bit, total in enumerate(totals) if total > 0)
+
+
+def similarity(distance: int) -> float:
+    """
+    Оценка косинуса угла между векторами по числу различающихся битов сигнатур.
+    """
+    return math.cos(math.pi * distance / SIGNATURE_BITS)
+
+
+class SignatureIndex:
+    """
+    Сигнатуры активных товаров в памяти, разложенные по корзинам полос.
+
+    Соседи ищутся только среди товаров той же корневой категории: товары разных разделов каталога
+    похожими не считаются, и кандидатов в корзине меньше.
+    """
+
+    def __init__(self, signatures: dict[int, tuple[int, int]]) -> None:
+        # id товара -> (корневая категория, сигнатура)
+        self.signatures = signatures
+        # Корзина хранит пары (сигнатура, id товара): расстояние до кандидата считается без поиска в словаре
+        self._buckets: defaultdict[tuple[int, int, int], list[tuple[int, int]]] = defaultdict(list)
+        for product_id, (root_id, value) in signatures.items():
+            for key in self._keys(root_id, value):
+                bucket = self._buckets[key]
+                if len(bucket) < BUCKET_LIMIT:
+                    bucket.append((value, product_id))
+
+    @staticmethod
+    def _keys(root_id: int, value: int) -> Iterator[tuple[int, int, int]]:
+        mask = (1 << BAND_BITS) - 1
+        for band in range(SIGNATURE_BITS // BAND_BITS):
+            yield root_id, band, value >> (band * BAND_BITS) & mask
+
+    def neighbours(
+        self, product_id: int, root_id: int, value: int, limit: int, min_score: float
+    ) -> list[tuple[int, float]]:
+        """
+        До limit ближайших товаров с оценкой сходства не ниже min_score: (id товара, оценка).
+        """
+        max_distance = math.floor(SIGNATURE_BITS * math.acos(min_score) / math.pi)
+        candidates = set().union(*(self._buckets.get(key, ()) for key in self._keys(root_id, value)))
+        scored = [((value ^ other).bit_count(), candidate) for other, candidate in candidates]
+        nearest = heapq.nsmallest(limit, [item for item in scored if item[0] <= max_distance and item[1] != product_id])
+        return [(candidate, similarity(distance)) for distance, candidate in nearest]
+
+
+async def changed_products(db: AsyncSession, epoch: int, limit: int) -> list[tuple[int, str]]:
+    """
+    Товары без сигнатуры, с текстом, изменившимся после подписи, или подписанные в прошлой эпохе словаря:
+    (id, md5 search_vector).
+    """
+    digest = func.md5(cast(ProductModel.search_vector, Text))
+    stmt = (
+        select(ProductModel.id, digest)
+        .outerjoin(ProductSignatureModel, ProductSignatureModel.product_id == ProductModel.id)
+        .where(
+            or_(
+                ProductSignatureModel.product_id.is_(None),
+                ProductSignatureModel.digest != digest,
+                ProductSignatureModel.epoch != epoch,
+            )
+        )
+        .order_by(ProductModel.id)
+        .limit(limit)
+    )
+    return [tuple(row) for row in await db.execute(stmt)]
+
+
+async def load_vocabulary(db: AsyncSession) -> Vocabulary:
+    stats = func.ts_stat("SELECT search_vector FROM products WHERE is_active").table_valued("word", "ndoc")
+    frequencies: dict[str, int] = dict((await db.execute(select(stats.c.word, stats.c.ndoc))).tuples().all())
+    documents = await db.scalar(select(func.count()).select_from(ProductModel).where(ProductModel.is_active))
+    return Vocabulary(documents=documents or 0, frequencies=frequencies)
+
+
+async def sign_products(db: AsyncSession, products: list[tuple[int, str]], vocabulary: Vocabulary, epoch: int) -> None:
+    """
+    Строит сигнатуры товаров по словам search_vector; их списки похожих после этого ждут пересчёта. Вызывающий коммитит.
+
+    Вес слова — TF-IDF: (1 + ln числа вхождений) * IDF, для слов названия умноженный на NAME_WEIGHT.
+    """
+    terms = func.unnest(ProductModel.search_vector).table_valued("lexeme", "positions", "weights").render_derived()
+    rows = await db.execute(
+        select(
+            ProductModel.id,
+            terms.c.lexeme,
+            func.cardinality(terms.c.positions),
+            literal("A") == any_(terms.c.weights),
+        )
+        .join(terms, true())
+        .where(
+            ProductModel.id
+            == any_(bindparam("product_ids", [product_id for product_id, _ in products], type_=ARRAY(Integer)))
+        )
+    )
+    features: defaultdict[int, list[tuple[str, float]]] = defaultdict(list)
+    for product_id, lexeme, occurrences, in_name in rows:
+        weight = (1 + math.log(max(occurrences, 1))) * vocabulary.idf(lexeme) * (NAME_WEIGHT if in_name else 1.0)
+        features[product_id].append((lexeme, weight))
+
+    signatures = []
+    for product_id, _ in products:
+        value = signature(features[product_id])
+        signatures.append(None if value is None else value.to_bytes(SIGNATURE_BITS // 8))
+    # Строки передаются массивами через unnest: одно выражение на пачку любого размера
+    batch = (
+        func.unnest(
+            bindparam("product_ids", [product_id for product_id, _ in products], type_=ARRAY(Integer)),
+            bindparam("digests", [digest for _, digest in products], type_=ARRAY(String)),
+            bindparam("signatures", signatures, type_=ARRAY(LargeBinary)),
+        )
+        .table_valued("product_id", "digest", "signature")
+        .render_derived()
+    )
+    stmt = insert(ProductSignatureModel).from_select(
+        ["product_id", "digest", "signature", "epoch"],
+        select(batch.c.product_id, batch.c.digest, batch.c.signature, literal(epoch)),
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ProductSignatureModel.product_id],
+            set_={
+                "digest": stmt.excluded.digest,
+                "signature": stmt.excluded.signature,
+                "epoch": stmt.excluded.epoch,
+                "updated_at": func.now(),
+            },
+        )
+    )
+
+
+async def load_index(db: AsyncSession) -> SignatureIndex:
+    parents = dict((await db.execute(select(CategoryModel.id, CategoryModel.parent_id))).tuples().all())
+    roots: dict[int, int] = {}
+    for category_id in parents:
+        root_id = category_id
+        while parents.get(root_id) is not None:
+            root_id = parents[root_id]
+        roots[category_id] = root_id
+
+    rows = await db.execute(
+        select(ProductSignatureModel.product_id, ProductModel.category_id, ProductSignatureModel.signature)
+        .join(ProductModel, ProductModel.id == ProductSignatureModel.product_id)
+        .where(ProductModel.is_active, ProductSignatureModel.signature.is_not(None))
+        .order_by(ProductSignatureModel.product_id)
+    )
+    return SignatureIndex(
+        {product_id: (roots[category_id], int.from_bytes(value)) for product_id, category_id, value in rows}
+    )
+
+
+def pending_similarities() -> ColumnElement[bool]:
+    """
+    Условие на product_signatures: список похожих товара не пересчитан после его подписи.
+    """
+    return or_(
+        ProductSignatureModel.listed_at.is_(None), ProductSignatureModel.listed_at < ProductSignatureModel.updated_at
+    )
+
+
+async def refresh_pending_similarities(db: AsyncSession, index: SignatureIndex, limit: int) -> int:
+    """
+    Пересчитывает списки похожих для пачки товаров, подписанных после прошлого пересчёта.
+    Возвращает размер пачки; вызывающий коммитит.
+
+    Вместе с ними пересчитываются готовые списки, построенные раньше подписи товара пачки: товаров,
+    в чьих списках он был, и товаров, для которых он стал соседом.
+    """
+    settings = get_settings()
+    rows = await db.execute(
+        select(ProductSignatureModel.product_id, ProductSignatureModel.updated_at)
+        .where(pending_similarities())
+        .order_by(ProductSignatureModel.product_id)
+        .limit(limit)
+    )
+    signed_at = dict(rows.tuples().all())
+    if not signed_at:
+        return 0
+
+    lists: dict[int, list[tuple[int, float]]] = {}
+    for product_id in signed_at:
+        entry = index.signatures.get(product_id)
+        # Неактивного товара и товара без сигнатуры в индексе нет: их список пуст, пока они не вернутся в индекс
+        lists[product_id] = (
+            index.neighbours(product_id, *entry, settings.similar_top_n, settings.similar_min_score)
+            if entry is not None
+            else []
+        )
+
+    # Товар, чей список может устареть, -> самая поздняя подпись связанного с ним товара пачки
+    affected: dict[int, datetime] = {}
+    listed_by = await db.execute(
+        select(ProductSimilarityModel.product_id, ProductSimilarityModel.related_id).where(
+            ProductSimilarityModel.related_id == any_(bindparam("product_ids", list(signed_at), type_=ARRAY(Integer)))
+        )
+    )
+    pairs = [*listed_by, *((related_id, product_id) for product_id in signed_at for related_id, _ in lists[product_id])]
+    for product_id, changed_id in pairs:
+        if product_id not in signed_at:
+            affected[product_id] = max(affected.get(product_id, signed_at[changed_id]), signed_at[changed_id])
+    if affected:
+        listed_at = await db.execute(
+            select(ProductSignatureModel.product_id, ProductSignatureModel.listed_at).where(
+                ProductSignatureModel.product_id
+                == any_(bindparam("affected_ids", list(affected), type_=ARRAY(Integer))),
+                ~pending_similarities(),
+            )
+        )
+        for product_id, listed in listed_at:
+            if listed < affected[product_id] and product_id in index.signatures:
+                lists[product_id] = index.neighbours(
+                    product_id, *index.signatures[product_id], settings.similar_top_n, settings.similar_min_score
+                )
+
+    product_ids = sorted(lists)
+    await db.execute(
+        delete(ProductSimilarityModel).where(
+            ProductSimilarityModel.product_id == any_(bindparam("product_ids", product_ids, type_=ARRAY(Integer)))
+        )
+    )
+    entries = [
+        (product_id, rank, related_id, score)
+        for product_id in product_ids
+        for rank, (related_id, score) in enumerate(lists[product_id], 1)
+    ]
+    if entries:
+        owners, ranks, related_ids, scores = (list(column) for column in zip(*entries, strict=True))
+        values = (
+            func.unnest(
+                bindparam("owners", owners, type_=ARRAY(Integer)),
+                bindparam("ranks", ranks, type_=ARRAY(SmallInteger)),
+                bindparam("related_ids", related_ids, type_=ARRAY(Integer)),
+                bindparam("scores", scores, type_=ARRAY(Float)),
+            )
+            .table_valued("product_id", "rank", "related_id", "score")
+            .render_derived()
+        )
+        await db.execute(
+            insert(ProductSimilarityModel).from_select(
+                ["product_id", "rank", "related_id", "score"],
+                select(values.c.product_id, values.c["rank"], values.c.related_id, values.c.score),
+            )
+        )
+    await db.execute(
+        update(ProductSignatureModel)
+        .where(ProductSignatureModel.product_id == any_(bindparam("product_ids", product_ids, type_=ARRAY(Integer))))
+        .values(listed_at=func.now())
+    )
+    return len(signed_at)
+
+
+class SimilarProductsJob:
+    """
+    Один запуск пересчёта похожих товаров: сначала подпись изменённых товаров, затем пересчёт списков.
+
+    Каждый шаг обрабатывает одну пачку в транзакции вызывающего, который коммитит после шага. Эпоха словаря,
+    словарь IDF и индекс сигнатур загружаются один раз на запуск и только когда для них есть работа.
+
+    Сигнатуры, построенные по разным словарям, сравнимы, пока словарь изменился мало. Эпоха словаря
+    сменяется, когда число активных товаров отошло от числа на начало эпохи больше чем на
+    similar_vocabulary_drift; тогда подписываются заново все товары, в том числе оставшиеся без сигнатуры.
+    """
+
+    def __init__(self) -> None:
+        self._epoch: int | None = None
+        self._vocabulary: Vocabulary | None = None
+        self._index: SignatureIndex | None = None
+
+    async def sign_changed(self, db: AsyncSession) -> int:
+        """
+        Подписывает следующую пачку товаров с новым или изменённым текстом или из прошлой эпохи словаря.
+        Возвращает её размер.
+        """
+        watermark = await self._lock(db)
+        if self._epoch is None:
+            self._epoch = await self._advance_epoch(db, watermark)
+        products = await changed_products(db, self._epoch, get_settings().similar_chunk_size)
+        if not products:
+            return 0
+        if self._vocabulary is None:
+            self._vocabulary = await load_vocabulary(db)
+        await sign_products(db, products, self._vocabulary, self._epoch)
+        watermark.updated_at = func.now()
+        return len(products)
+
+    async def refresh_pending(self, db: AsyncSession) -> int:
+        """
+        Пересчитывает списки похожих для следующей пачки подписанных товаров. Возвращает её размер.
+        """
+        await self._lock(db)
+        if self._index is None:
+            if await db.scalar(select(ProductSignatureModel.product_id).where(pending_similarities()).limit(1)) is None:
+                return 0
+            self._index = await load_index(db)
+        return await refresh_pending_similarities(db, self._index, get_settings().similar_chunk_size)
+
+    @staticmethod
+    async def _advance_epoch(db: AsyncSession, watermark: JobWatermarkModel) -> int:
+        """
+        Номер текущей эпохи словаря; начинает новую, если число активных товаров заметно изменилось.
+        """
+        documents = await db.scalar(select(func.count()).select_from(ProductModel).where(ProductModel.is_active)) or 0
+        if abs(documents - watermark.processed) > get_settings().similar_vocabulary_drift * watermark.processed:
+            watermark.last_id += 1
+            watermark.processed = documents
+        return watermark.last_id
+
+    @staticmethod
+    async def _lock(db: AsyncSession) -> JobWatermarkModel:
+        # Строка задачи в job_watermarks — блокировка до конца транзакции: пересекающиеся запуски
+        # обрабатывают пачки по очереди. Водяной знак не нужен, изменённые товары находятся по digest;
+        # вместо него last_id — номер эпохи словаря, processed — число активных товаров на её начало
+        await db.execute(insert(JobWatermarkModel).values(job=JOB).on_conflict_do_nothing())
+        return (await db.scalars(select(JobWatermarkModel).where(JobWatermarkModel.job == JOB).with_for_update())).one()
@@ -0,0 +1,245 @@
+import asyncio
+import heapq
+import json
+import os
+import socket
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Protocol
+
+from loguru import logger
+
+from app.config import get_settings
+from app.metrics import metrics
+
+
+# Вес сигнала в счёте товара: заказ говорит об интересе сильнее просмотра
+VIEW_WEIGHT = 1.0
+ORDER_WEIGHT = 10.0
+# Когда показатель прямого затухания превышает столько периодов полураспада, счётчики пересчитываются
+# к новой точке отсчёта, чтобы веса не переполнили float
+RENORMALIZE_HALF_LIVES = 64
+
+
+@dataclass(slots=True)
+class _Entry:
+    count: float
+    category_id: int
+
+
+class SpaceSaving:
+    """
+    Приближённые top-K товаров по весу событий (алгоритм Space-Saving) с экспоненциальным затуханием.
+
+    Хранит не больше capacity товаров: новый товар вытесняет товар с наименьшим счётом и наследует его счёт,
+    поэтому товар, набравший больше total / capacity веса, гарантированно остаётся в таблице.
+    Затухание прямое (forward decay): вес события растёт как 2^(t / half_life), и счета не нужно уменьшать
+    по таймеру; текущее значение — счёт, делённый на вес момента «сейчас».
+    """
+
+    def __init__(self, capacity: int, half_life: float) -> None:
+        self.capacity = capacity
+        self.half_life = half_life
+        self._entries: dict[int, _Entry] = {}
+        # Кандидаты на вытеснение: (счёт, id). Устаревшие записи пропускаются при извлечении
+        self._heap: list[tuple[float, int]] = []
+        self._landmark = time.time()
+
+    def _weight(self, now: float) -> float:
+        return 2 ** ((now - self._landmark) / self.half_life)
+
+    def add(self, product_id: int, category_id: int, weight: float, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        if (now - self._landmark) / self.half_life > RENORMALIZE_HALF_LIVES:
+            self._renormalize(now)
+        increment = weight * self._weight(now)
+
+        entry = self._entries.get(product_id)
+        if entry is not None:
+            entry.count += increment
+            entry.category_id = category_id
+        elif len(self._entries) < self.capacity:
+            entry = self._entries[product_id] = _Entry(increment, category_id)
+        else:
+            floor, evicted = self._pop_min()
+            del self._entries[evicted]
+            entry = self._entries[product_id] = _Entry(floor + increment, category_id)
+        heapq.heappush(self._heap, (entry.count, product_id))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def merge(self, counts: Iterable[tuple[int, int, float]], now: float | None = None) -> None:
+        """
+        Прибавляет затухшие к моменту now счета (id товара, id категории, счёт) другого экземпляра.
+        """
+        now = time.time() if now is None else now
+        for product_id, category_id, count in counts:
+            self.add(product_id, category_id, count, now)
+
+    def snapshot(self, now: float | None = None) -> list[tuple[int, int, float]]:
+        """
+        Счета к моменту now, по убыванию: (id товара, id категории, счёт).
+        """
+        now = time.time() if now is None else now
+        scale = self._weight(now)
+        items = [(product_id, entry.category_id, entry.count / scale) for product_id, entry in self._entries.items()]
+        return sorted(items, key=lambda item: item[2], reverse=True)
+
+    def _pop_min(self) -> tuple[float, int]:
+        while True:
+            count, product_id = heapq.heappop(self._heap)
+            entry = self._entries.get(product_id)
+            if entry is not None and entry.count == count:
+                return count, product_id
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(entry.count, product_id) for product_id, entry in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def _renormalize(self, now: float) -> None:
+        scale = self._weight(now)
+        for entry in self._entries.values():
+            entry.count /= scale
+        self._landmark = now
+        self._rebuild_heap()
+
+
+class SnapshotStore(Protocol):
+    """
+    Общее для воркеров хранилище снимков: каждый воркер кладёт свой и читает снимки остальных.
+    """
+
+    async def exchange(self, worker: str, snapshot: str, ttl: float) -> list[str]: ...
+
+    async def close(self) -> None: ...
+
+
+class RedisSnapshotStore:
+    """
+    Снимки воркеров в Redis: по ключу на воркер с TTL, чтобы снимки остановленных воркеров исчезали сами.
+    """
+
+    PREFIX = "trending:worker:"
+
+    def __init__(self, url: str) -> None:
+        from redis.asyncio import Redis
+
+        self._redis = Redis.from_url(url)
+
+    async def exchange(self, worker: str, snapshot: str, ttl: float) -> list[str]:
+        await self._redis.set(f"{self.PREFIX}{worker}", snapshot, px=int(ttl * 1000))
+        keys = [key async for key in self._redis.scan_iter(match=f"{self.PREFIX}*", count=100)]
+        values = await self._redis.mget(keys) if keys else []
+        return [value.decode() for value in values if value is not None]
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class TrendingProducts:
+    """
+    «Сейчас популярно»: товары с наибольшим затухающим весом просмотров и заказов.
+
+    Каждый воркер считает свои события в локальном SpaceSaving. Раз в trending_sync_interval он публикует
+    снимок в общее хранилище (store) и собирает из снимков всех воркеров общий рейтинг, который и отдаёт.
+    Без хранилища рейтинг строится только по событиям этого воркера.
+    """
+
+    def __init__(self) -> None:
+        self.store: SnapshotStore | None = None
+        self._local: SpaceSaving | None = None
+        self._merged: list[tuple[int, int, float]] = []
+        self._merged_at = 0.0
+        self._sync_task: asyncio.Task | None = None
+        self._worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    @property
+    def local(self) -> SpaceSaving:
+        if self._local is None:
+            settings = get_settings()
+            self._local = SpaceSaving(settings.trending_capacity, settings.trending_half_life)
+        return self._local
+
+    def record_view(self, product_id: int, category_id: int) -> None:
+        self._record(product_id, category_id, VIEW_WEIGHT)
+
+    def record_order(self, items: Iterable[tuple[int, int]]) -> None:
+        """
+        Учитывает позиции оформленного заказа: пары (id товара, id категории).
+        """
+        for product_id, category_id in items:
+            self._record(product_id, category_id, ORDER_WEIGHT)
+
+    def _record(self, product_id: int, category_id: int, weight: float) -> None:
+        self.local.add(product_id, category_id, weight)
+        self._ensure_sync_loop()
+
+    def _ensure_sync_loop(self) -> None:
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def top(self, limit: int, category_ids: Iterable[int] | None = None) -> list[int]:
+        """
+        id товаров по убыванию счёта; category_ids ограничивает выдачу этими категориями.
+        """
+        self._ensure_sync_loop()
+        if time.monotonic() - self._merged_at > 2 * get_settings().trending_sync_interval:
+            # Первый запрос воркера или хранилище давно не отвечало: собираем рейтинг сейчас
+            await self._sync_logged()
+        allowed = set(category_ids) if category_ids is not None else None
+        return [product_id for product_id, category_id, _ in self._merged if allowed is None or category_id in allowed][
+            :limit
+        ]
+
+    async def sync(self) -> None:
+        """
+        Публикует снимок воркера и пересобирает общий рейтинг из снимков всех воркеров.
+        """
+        now = time.time()
+        snapshot = self.local.snapshot(now)
+        if self.store is None:
+            self._merged = snapshot
+            self._merged_at = time.monotonic()
+            return
+
+        settings = get_settings()
+        payload = json.dumps({"at": now, "items": snapshot[: settings.trending_capacity]})
+        # Снимок живёт несколько интервалов: один пропущенный обмен не выбрасывает воркер из рейтинга
+        snapshots = await self.store.exchange(self._worker, payload, ttl=settings.trending_sync_interval * 3)
+
+        merged = SpaceSaving(settings.trending_capacity, settings.trending_half_life)
+        for raw in snapshots:
+            data = json.loads(raw)
+            # Снимок другого воркера сделан раньше: доводим его счета до текущего момента
+            decay = 2 ** (-max(now - data["at"], 0.0) / settings.trending_half_life)
+            merged.merge(((pid, cid, count * decay) for pid, cid, count in data["items"]), now)
+        self._merged = merged.snapshot(now)
+        self._merged_at = time.monotonic()
+        metrics.set("trending_workers", len(snapshots))
+
+    async def close(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+        if self.store is not None:
+            await self.store.close()
+            self.store = None
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await self._sync_logged()
+            await asyncio.sleep(get_settings().trending_sync_interval)
+
+    async def _sync_logged(self) -> None:
+        try:
+            await self.sync()
+        except Exception as exc:
+            # Пока хранилище недоступно, отдаём рейтинг по событиям воркера и не повторяем обмен на каждый запрос
+            self._merged = self.local.snapshot()
+            self._merged_at = time.monotonic()
+            metrics.inc("trending_sync_failed_total")
+            logger.warning(f"Trending sync failed: {exc}")
+
+
+trending = TrendingProducts()
@@ -1,4 +1,15 @@
-from app.tasks.task import call_background_task
+from app.tasks.events import order_created, product_changed, review_created
+from app.tasks.maintenance import purge_expired_idempotency_keys
+from app.tasks.media import remove_orphan_product_images
+from app.tasks.recommendations import update_also_bought, update_similar_products
 
 
-__all__ = ["call_background_task"]
+__all__ = [
+    "order_created",
+    "product_changed",
+    "purge_expired_idempotency_keys",
+    "remove_orphan_product_images",
+    "review_created",
+    "update_also_bought",
+    "update_similar_products",
+]
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from collections.abc import Coroutine
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import get_settings
+from app.services.catalog_versions import RedisVersionBackend, catalog_versions
+
+
+T = TypeVar("T")
+
+
+class TaskRuntime:
+    """
+    Event loop и engine для асинхронного кода в задачах Celery — по одному на процесс воркера.
+
+    Задачи Celery синхронные, поэтому корутины выполняются в отдельном потоке с постоянным циклом:
+    пул соединений engine привязан к этому циклу и переживает отдельные задачи. Из любого потока,
+    в том числе из приложения при task_always_eager, корутина отправляется в тот же цикл.
+    """
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._engine: AsyncEngine | None = None
+        self._lock = threading.Lock()
+        self.session_maker = async_sessionmaker(expire_on_commit=False, class_=AsyncSession)
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """
+        Выполняет корутину в цикле воркера и возвращает её результат.
+        """
+        future: Future[T] = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result()
+
+    def session(self) -> AsyncSession:
+        """
+        Сессия на engine воркера; открывать только внутри корутины, переданной в run().
+        """
+        if self._engine is None:
+            settings = get_settings()
+            # Задачи не ограничены statement_timeout маршрутов и не делят пул с приложением
+            self._engine = create_async_engine(
+                settings.database_url,
+                echo=settings.db_echo,
+                pool_size=settings.celery_db_pool_size,
+                max_overflow=0,
+            )
+            self.session_maker.configure(bind=self._engine)
+        return self.session_maker()
+
+    def reset(self) -> None:
+        """
+        Забывает цикл и engine родительского процесса: после fork ими пользоваться нельзя.
+        """
+        self._loop = None
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def shutdown(self) -> None:
+        if self._loop is None:
+            return
+        if self._engine is not None:
+            self.run(self._engine.dispose())
+            self._engine = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="celery-task-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+
+task_runtime = TaskRuntime()
+
+
+@worker_process_init.connect
+def _reset_runtime(**kwargs: Any) -> None:
+    task_runtime.reset()
+    # Задачи меняют каталог, поэтому воркер повышает те же версии ETag, что и приложение
+    settings = get_settings()
+    if settings.cache_redis_url:
+        catalog_versions.backend = RedisVersionBackend(settings.cache_redis_url)
+
+
+@worker_process_shutdown.connect
+def _shutdown_runtime(**kwargs: Any) -> None:
+    task_runtime.shutdown()
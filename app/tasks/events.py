@@ -0,0 +1,62 @@
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import func, select, update
+
+from app.configs.celery_app import celery_app
+from app.models.products import Product as ProductModel
+from app.models.reviews import Review as ReviewModel
+from app.services.catalog_versions import catalog_versions
+from app.tasks.db import task_runtime
+
+
+# Обработчики событий из outbox (см. app.services.outbox). Каждая задача получает все события своего типа
+# из пачки ретранслятора: список пар [id события, payload]. Доставка «хотя бы один раз»: событие может прийти
+# повторно, поэтому обработчики идемпотентны.
+
+Events = list[tuple[int, dict[str, Any]]]
+
+
+@celery_app.task(name="app.tasks.events.order_created")
+def order_created(events: Events) -> None:
+    logger.info(f"Outbox: {len(events)} orders created, last order {events[-1][1]['order_id']}")
+
+
+@celery_app.task(name="app.tasks.events.review_created")
+def review_created(events: Events) -> None:
+    product_ids = sorted({payload["product_id"] for _, payload in events})
+    task_runtime.run(refresh_product_ratings(product_ids))
+
+
+@celery_app.task(name="app.tasks.events.product_changed")
+def product_changed(events: Events) -> None:
+    product_ids = {product_id for _, payload in events for product_id in payload["product_ids"]}
+    logger.info(f"Outbox: {len(product_ids)} products changed")
+
+
+async def refresh_product_ratings(product_ids: list[int]) -> None:
+    """
+    Пересчитывает рейтинг товаров одним UPDATE.
+
+    Маршрут отзыва пересчитывает рейтинг сразу, но два одновременных отзыва на один товар
+    могут не увидеть друг друга; пересчёт после коммита обоих приводит рейтинг к верному значению.
+    """
+    average = (
+        select(func.coalesce(func.avg(ReviewModel.grade), 0))
+        .where(ReviewModel.product_id == ProductModel.id, ReviewModel.is_active.is_(True))
+        .scalar_subquery()
+    )
+    async with task_runtime.session() as db:
+        result = await db.execute(
+            update(ProductModel)
+            .where(ProductModel.id.in_(product_ids), ProductModel.rating.is_distinct_from(average))
+            .values(rating=average)
+            .returning(ProductModel.id, ProductModel.category_id)
+        )
+        changed = result.all()
+        await db.commit()
+    if changed:
+        await catalog_versions.bump(
+            product_ids=[product_id for product_id, _ in changed],
+            category_ids=[category_id for _, category_id in changed],
+        )
@@ -0,0 +1,45 @@
+from typing import Any, cast
+
+from loguru import logger
+from sqlalchemy import CursorResult, delete, func, select, tuple_
+
+from app.configs.celery_app import celery_app
+from app.models.idempotency_keys import IdempotencyKey as IdempotencyKeyModel
+from app.tasks.db import task_runtime
+
+
+# Сколько строк удаляется одной транзакцией: короткие транзакции не держат блокировки и не раздувают WAL
+PURGE_BATCH_SIZE = 5000
+
+
+@celery_app.task(name="app.tasks.maintenance.purge_expired_idempotency_keys")
+def purge_expired_idempotency_keys() -> int:
+    deleted = task_runtime.run(_purge_expired_idempotency_keys())
+    if deleted:
+        logger.info(f"Purged {deleted} expired idempotency keys")
+    return deleted
+
+
+async def _purge_expired_idempotency_keys() -> int:
+    """
+    Удаляет ключи с истёкшим TTL пачками. Истёкший ключ и так может быть занят заново, удаление только освобождает место.
+    """
+    total = 0
+    expired = (
+        select(IdempotencyKeyModel.user_id, IdempotencyKeyModel.key)
+        .where(IdempotencyKeyModel.expires_at < func.now())
+        .limit(PURGE_BATCH_SIZE)
+    )
+    while True:
+        async with task_runtime.session() as db:
+            result = await db.execute(
+                delete(IdempotencyKeyModel).where(
+                    tuple_(IdempotencyKeyModel.user_id, IdempotencyKeyModel.key).in_(expired)
+                )
+            )
+            await db.commit()
+        # DELETE без RETURNING возвращает CursorResult, число строк есть только у него
+        deleted = cast(CursorResult[Any], result).rowcount
+        total += deleted
+        if deleted < PURGE_BATCH_SIZE:
+            return total
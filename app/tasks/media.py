@@ -0,0 +1,56 @@
+import time
+
+from loguru import logger
+from sqlalchemy import String, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.config import get_settings
+from app.configs.celery_app import celery_app
+from app.models.products import Product as ProductModel
+from app.tasks.db import task_runtime
+
+
+# Файлы моложе этого возраста не трогаем: товар с ними мог ещё не закоммититься, с
+ORPHAN_MIN_AGE = 60 * 60
+# Сколько URL проверяется одним запросом
+ORPHAN_CHECK_BATCH = 1000
+
+
+@celery_app.task(name="app.tasks.media.remove_orphan_product_images")
+def remove_orphan_product_images() -> int:
+    """
+    Удаляет файлы изображений, на которые не ссылается ни один товар (например, если транзакция
+    создания товара откатилась после сохранения файла). Идёт в очередь heavy: обходит весь каталог media.
+
+    Воркер должен видеть тот же каталог MEDIA_ROOT, что и приложение.
+    """
+    removed = task_runtime.run(_remove_orphan_product_images())
+    if removed:
+        logger.info(f"Removed {removed} orphan product images")
+    return removed
+
+
+async def _remove_orphan_product_images() -> int:
+    images_dir = get_settings().media_root / "products"
+    if not images_dir.is_dir():
+        return 0
+    cutoff = time.time() - ORPHAN_MIN_AGE
+    files = {f"/media/products/{path.name}": path for path in images_dir.iterdir() if path.stat().st_mtime < cutoff}
+    urls = list(files)
+
+    removed = 0
+    for start in range(0, len(urls), ORPHAN_CHECK_BATCH):
+        chunk = urls[start : start + ORPHAN_CHECK_BATCH]
+        async with task_runtime.session() as db:
+            used = set(
+                await db.scalars(
+                    select(ProductModel.image_url).where(
+                        ProductModel.image_url == any_(bindparam("urls", chunk, type_=ARRAY(String)))
+                    )
+                )
+            )
+        for url in chunk:
+            if url not in used:
+                files[url].unlink(missing_ok=True)
+                removed += 1
+    return removed
@@ -0,0 +1,69 @@
+from loguru import logger
+
+from app.config import get_settings
+from app.configs.celery_app import celery_app
+from app.services.also_bought import process_new_orders
+from app.services.similar_products import SimilarProductsJob
+from app.tasks.db import task_runtime
+
+
+# Столько пачек заказов обрабатывает один запуск; остаток возьмёт следующий запуск по расписанию
+MAX_CHUNKS_PER_RUN = 20
+
+
+@celery_app.task(name="app.tasks.recommendations.update_also_bought")
+def update_also_bought() -> int:
+    """
+    Дописывает в «с этим товаром покупают» заказы, появившиеся после прошлого запуска.
+    """
+    processed = task_runtime.run(_update_also_bought())
+    if processed:
+        logger.info(f"Also-bought: processed {processed} new orders")
+    return processed
+
+
+async def _update_also_bought() -> int:
+    total = 0
+    for _ in range(MAX_CHUNKS_PER_RUN):
+        async with task_runtime.session() as db:
+            processed = await process_new_orders(db)
+            await db.commit()
+        total += processed
+        if not processed:
+            break
+    return total
+
+
+@celery_app.task(name="app.tasks.recommendations.update_similar_products")
+def update_similar_products() -> int:
+    """
+    Подписывает товары с новым или изменённым текстом и пересчитывает затронутые списки похожих товаров.
+    """
+    refreshed = task_runtime.run(_update_similar_products())
+    if refreshed:
+        logger.info(f"Similar products: refreshed {refreshed} products")
+    return refreshed
+
+
+async def _update_similar_products() -> int:
+    job = SimilarProductsJob()
+    chunk_size = get_settings().similar_chunk_size
+    for _ in range(MAX_CHUNKS_PER_RUN):
+        async with task_runtime.session() as db:
+            signed = await job.sign_changed(db)
+            await db.commit()
+        if signed < chunk_size:
+            break
+    else:
+        # Подписаны ещё не все товары (первое построение): соседей ищем, когда в индексе будет весь каталог
+        return 0
+
+    total = 0
+    for _ in range(MAX_CHUNKS_PER_RUN):
+        async with task_runtime.session() as db:
+            refreshed = await job.refresh_pending(db)
+            await db.commit()
+        total += refreshed
+        if refreshed < chunk_size:
+            break
+    return total
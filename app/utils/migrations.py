@@ -0,0 +1,152 @@
+"""
+Помощники миграций Alembic для больших таблиц: изменения схемы без долгих блокировок записи.
+
+Обычная миграция идёт одной транзакцией, и ACCESS EXCLUSIVE блокировка ALTER TABLE держится до её конца:
+пересборка таблицы или индекса на миллионах строк останавливает запись на минуты. Здесь долгие шаги
+выполняются вне транзакции миграции (autocommit_block) и не держат блокировок, мешающих записи:
+
+    op.add_column("products", sa.Column("search_vector", TSVECTOR(), nullable=True))  # без DEFAULT и перезаписи
+    backfill("products", "search_vector = ...", where="search_vector IS NULL")         # пачками по id
+    set_not_null("products", "search_vector")                                        # проверка без блокировки записи
+    create_index_concurrently("ix_products_search_vector", "products", ["search_vector"], postgresql_using="gin")
+
+Шаги идемпотентны: миграцию, упавшую посередине, можно запустить заново. В offline-режиме (--sql)
+backfill не работает: ему нужны границы id из базы.
+"""
+
+import logging
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# Дочерний логгер alembic: уровень INFO для него задан в alembic.ini, прогресс виден при alembic upgrade
+logger = logging.getLogger("alembic.online")
+
+# ALTER TABLE в очереди за долгим запросом блокирует все запросы к таблице после себя:
+# лучше быстро упасть и повторить миграцию позже
+LOCK_TIMEOUT = "5s"
+
+
+def set_lock_timeout(timeout: str = LOCK_TIMEOUT) -> None:
+    """
+    Ограничивает ожидание блокировок до конца текущей транзакции миграции.
+    На шаги помощников ниже не действует: autocommit_block завершает транзакцию миграции,
+    у них свой аргумент lock_timeout.
+    """
+    op.execute(sa.text(f"SET LOCAL lock_timeout = '{timeout}'"))
+
+
+@contextmanager
+def _autocommit_block(lock_timeout: str | None) -> Iterator[None]:
+    """
+    autocommit_block с ограничением ожидания блокировок. Каждая команда здесь — своя транзакция, и SET LOCAL
+    действовал бы только на неё, поэтому lock_timeout ставится на сессию и сбрасывается на выходе.
+    """
+    with op.get_context().autocommit_block():
+        if lock_timeout is None:
+            yield
+            return
+        op.execute(sa.text(f"SET lock_timeout = '{lock_timeout}'"))
+        try:
+            yield
+        finally:
+            op.execute(sa.text("RESET lock_timeout"))
+
+
+def _index_is_invalid(index_name: str) -> bool:
+    invalid = op.get_bind().scalar(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": index_name}
+    )
+    return bool(invalid)
+
+
+def create_index_concurrently(
+    index_name: str, table_name: str, columns: Sequence[Any], *, lock_timeout: str | None = None, **kwargs: Any
+) -> None:
+    """
+    Создаёт индекс CONCURRENTLY: запись в таблицу во время сборки не блокируется.
+    Остаток прерванной сборки (невалидный индекс) удаляется и собирается заново.
+
+    По умолчанию ожидание блокировок не ограничено: SHARE UPDATE EXCLUSIVE не мешает записи, а сборка ждёт
+    завершения старых транзакций, и таймаут выбросил бы уже собранный индекс.
+    """
+    with _autocommit_block(lock_timeout):
+        # Невалидный индекс обновляется при записи, но не используется в запросах; IF NOT EXISTS его бы пропустил
+        if _index_is_invalid(index_name):
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
+        op.create_index(index_name, table_name, columns, postgresql_concurrently=True, if_not_exists=True, **kwargs)
+
+
+def drop_index_concurrently(index_name: str, table_name: str, *, lock_timeout: str | None = None) -> None:
+    with _autocommit_block(lock_timeout):
+        op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
+
+
+def backfill(
+    table_name: str,
+    values: str,
+    *,
+    where: str | None = None,
+    key: str = "id",
+    batch_size: int = 10_000,
+    pause: float = 0.05,
+) -> int:
+    """
+    Заполняет столбцы UPDATE ... SET values пачками по диапазонам key, каждая пачка — отдельная транзакция.
+    Строки блокируются только на время своей пачки, а пауза между пачками оставляет место обычной нагрузке
+    и репликам. where отбирает ещё не заполненные строки, чтобы повторный запуск продолжил с места остановки.
+    Возвращает число обновлённых строк.
+    """
+    bind = op.get_bind()
+    condition = f" AND ({where})" if where else ""
+    statement = sa.text(f"UPDATE {table_name} SET {values} WHERE {key} >= :low AND {key} < :high{condition}")
+    with op.get_context().autocommit_block():
+        first, last = bind.execute(sa.text(f"SELECT min({key}), max({key}) FROM {table_name}")).one()
+        if first is None:
+            return 0
+        updated = 0
+        started = time.monotonic()
+        for low in range(first, last + 1, batch_size):
+            updated += bind.execute(statement, {"low": low, "high": low + batch_size}).rowcount
+            done = min(low + batch_size - 1, last) - first + 1
+            logger.info(
+                "backfill %s: %s rows updated, %.0f%% of %s range, %.0f s",
+                table_name,
+                updated,
+                100 * done / (last - first + 1),
+                key,
+                time.monotonic() - started,
+            )
+            time.sleep(pause)
+    return updated
+
+
+def validate_constraint(table_name: str, constraint_name: str, *, lock_timeout: str | None = None) -> None:
+    """
+    Проверяет ограничение, добавленное с postgresql_not_valid=True.
+    VALIDATE CONSTRAINT читает всю таблицу, но под блокировкой, не мешающей записи. Проверка идёт
+    в своей транзакции: в одной транзакции с ADD CONSTRAINT таблица оставалась бы заблокированной до конца проверки.
+    """
+    with _autocommit_block(lock_timeout):
+        op.execute(sa.text(f"ALTER TABLE {table_name} VALIDATE CONSTRAINT {constraint_name}"))
+
+
+def set_not_null(table_name: str, column_name: str, *, lock_timeout: str | None = LOCK_TIMEOUT) -> None:
+    """
+    SET NOT NULL без полного прохода под ACCESS EXCLUSIVE: сначала проверяется CHECK (column IS NOT NULL)
+    NOT VALID, и SET NOT NULL опирается на него вместо сканирования таблицы (PostgreSQL 12+).
+    Команды под ACCESS EXCLUSIVE ждут блокировку не дольше lock_timeout.
+    """
+    constraint_name = f"ck_{table_name}_{column_name}_not_null"
+    with _autocommit_block(lock_timeout):
+        op.execute(sa.text(f"ALTER TABLE {table_name} DROP CONSTRAINT IF EXISTS {constraint_name}"))
+        op.create_check_constraint(constraint_name, table_name, f"{column_name} IS NOT NULL", postgresql_not_valid=True)
+    validate_constraint(table_name, constraint_name)
+    with _autocommit_block(lock_timeout):
+        op.alter_column(table_name, column_name, nullable=False)
+        op.drop_constraint(constraint_name, table_name, type_="check")
@@ -0,0 +1,52 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+_statements: ContextVar[list[str] | None] = ContextVar("sql_statements", default=None)
+_queries: ContextVar[list[tuple[str, Any]] | None] = ContextVar("sql_queries", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record_statement(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    statements = _statements.get()
+    if statements is not None:
+        statements.append(statement)
+    queries = _queries.get()
+    # У executemany параметров много наборов, а план один: сохраняется первый набор
+    if queries is not None:
+        queries.append((statement, parameters[0] if executemany else parameters))
+
+
+@contextmanager
+def count_queries() -> Iterator[list[str]]:
+    """
+    Собирает SQL-запросы, выполненные внутри блока, в том числе в задачах, созданных из него.
+
+        with count_queries() as statements:
+            await client.get("/products/1")
+        assert len(statements) <= 1
+    """
+    statements: list[str] = []
+    token = _statements.set(statements)
+    try:
+        yield statements
+    finally:
+        _statements.reset(token)
+
+
+@contextmanager
+def capture_queries() -> Iterator[list[tuple[str, Any]]]:
+    """
+    Как count_queries, но вместе с параметрами: запрос можно повторить, например под EXPLAIN.
+    """
+    queries: list[tuple[str, Any]] = []
+    token = _queries.set(queries)
+    try:
+        yield queries
+    finally:
+        _queries.reset(token)
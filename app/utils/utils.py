@@ -1,19 +1,27 @@
+from decimal import Decimal
+
 from sqlalchemy import select
 from sqlalchemy.sql import func
 
 from app.depends.db_depends import AsyncSession
-from app.models.products import Product as ProductModel
 from app.models.reviews import Review as ReviewModel
+from app.services.catalog_versions import catalog_versions
+from app.services.product_loader import get_product_loader
 
 
 async def update_product_rating(db: AsyncSession, product_id: int) -> None:
     result = await db.execute(
         select(func.avg(ReviewModel.grade)).where(ReviewModel.product_id == product_id, ReviewModel.is_active.is_(True))
     )
-    avg_rating = result.scalar() or 0.0
-    product = await db.get(ProductModel, product_id)
+    # avg по целым оценкам возвращает numeric, как и объявлен rating в модели
+    avg_rating = result.scalar() or Decimal(0)
+    product = await get_product_loader(db).load(product_id)
+    if product is None:
+        # Товар удалён из базы вместе с отзывами: пересчитывать и сбрасывать в кеше нечего
+        return
     product.rating = avg_rating
     await db.commit()
+    await catalog_versions.bump(product_ids=[product_id], category_ids=[product.category_id])
 
 
 def check_grade(grade: int) -> bool:
@@ -0,0 +1,163 @@
+"""
+Нагрузочный бенчмарк оформления заказов на один «горячий» товар.
+
+Сравнивает обычный checkout (каждый покупатель в своей транзакции) и режим
+флеш-распродажи (очередь товара с групповым коммитом). Нужна база с применёнными
+миграциями, строка подключения берётся из переменной окружения POSTGRESQL.
+
+    python -m benchmarks.flash_sale_checkout --buyers 1000 --stock 800 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+import httpx
+from sqlalchemy import delete, func, select
+
+from app.auth import create_access_token
+from app.database import async_session_maker
+from app.lifespan import lifespan
+from app.main import app
+from app.models.cart_items import CartItem as CartItemModel
+from app.models.categories import Category as CategoryModel
+from app.models.orders import OrderItem as OrderItemModel
+from app.models.products import Product as ProductModel
+from app.models.users import User as UserModel
+
+
+async def _create_fixture(buyers: int) -> tuple[int, list[tuple[int, str]]]:
+    """
+    Создаёт продавца, категорию и покупателей. Возвращает id продавца и пары (id, токен) покупателей.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    async with async_session_maker() as db:
+        seller = UserModel(email=f"bench-seller-{run_id}@example.com", hashed_password="-", role="seller")
+        users = [
+            UserModel(email=f"bench-buyer-{run_id}-{i}@example.com", hashed_password="-", role="buyer")
+            for i in range(buyers)
+        ]
+        db.add(seller)
+        db.add_all(users)
+        await db.commit()
+        tokens = [
+            (user.id, create_access_token({"sub": user.email, "role": user.role, "id": user.id})) for user in users
+        ]
+        return seller.id, tokens
+
+
+async def _prepare_product(seller_id: int, buyer_ids: list[int], stock: int, flash_sale: bool) -> int:
+    """
+    Создаёт горячий товар и кладёт его в корзину каждому покупателю.
+    """
+    async with async_session_maker() as db:
+        category = (await db.scalars(select(CategoryModel).where(CategoryModel.is_active))).first()
+        if category is None:
+            category = CategoryModel(name="Benchmark")
+            db.add(category)
+            await db.flush()
+        product = ProductModel(
+            name="Hot SKU",
+            price=Decimal("9.99"),
+            stock=stock,
+            category_id=category.id,
+            seller_id=seller_id,
+            is_flash_sale=flash_sale,
+        )
+        db.add(product)
+        await db.flush()
+        await db.execute(delete(CartItemModel).where(CartItemModel.user_id.in_(buyer_ids)))
+        db.add_all(CartItemModel(user_id=user_id, product_id=product.id, quantity=1) for user_id in buyer_ids)
+        await db.commit()
+        return product.id
+
+
+async def _run(tokens: list[tuple[int, str]], concurrency: int) -> tuple[float, list[int], list[float]]:
+    """
+    Запускает checkout всех покупателей с ограничением параллельности.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses: list[int] = []
+    latencies: list[float] = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+
+        async def checkout(token: str) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/orders/checkout", headers={"Authorization": f"Bearer {token}"})
+                latencies.append(time.perf_counter() - started)
+                statuses.append(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(checkout(token) for _, token in tokens))
+        elapsed = time.perf_counter() - started
+
+    return elapsed, statuses, latencies
+
+
+async def _check_stock(product_id: int, stock: int) -> dict:
+    """
+    Сверяет остаток товара с количеством проданных единиц.
+    """
+    async with async_session_maker() as db:
+        product = await db.get(ProductModel, product_id)
+        sold = (
+            await db.scalars(
+                select(func.coalesce(func.sum(OrderItemModel.quantity), 0)).where(
+                    OrderItemModel.product_id == product_id
+                )
+            )
+        ).one()
+        return {"final_stock": product.stock if product else None, "sold": sold, "oversold": sold > stock}
+
+
+async def _benchmark(args: argparse.Namespace) -> dict:
+    seller_id, tokens = await _create_fixture(args.buyers)
+    buyer_ids = [user_id for user_id, _ in tokens]
+
+    report = {}
+    for mode, flash_sale in (("regular", False), ("flash_sale", True)):
+        product_id = await _prepare_product(seller_id, buyer_ids, args.stock, flash_sale)
+        elapsed, statuses, latencies = await _run(tokens, args.concurrency)
+        accepted = statuses.count(201)
+        latencies.sort()
+        report[mode] = {
+            "accepted": accepted,
+            "rejected": statuses.count(400),
+            "errors": len(statuses) - accepted - statuses.count(400),
+            "elapsed_s": round(elapsed, 3),
+            "orders_per_s": round(accepted / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+            **await _check_stock(product_id, args.stock),
+        }
+    return report
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=500, help="Количество покупателей")
+    parser.add_argument("--stock", type=int, default=400, help="Остаток горячего товара")
+    parser.add_argument("--concurrency", type=int, default=100, help="Одновременных запросов")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+
+    # ASGITransport не отправляет события lifespan, поэтому запускаем его сами
+    async with lifespan(app):
+        report = await _benchmark(args)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"buyers={args.buyers} stock={args.stock} concurrency={args.concurrency}")
+    for mode, row in report.items():
+        print(f"{mode:>10}: " + ", ".join(f"{key}={value}" for key, value in row.items()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
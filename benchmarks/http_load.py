@@ -0,0 +1,266 @@
+"""
+Нагрузочный бенчмарк всего приложения через ASGI со смешанными сценариями.
+
+Каждый виртуальный пользователь — отдельный покупатель со своим IP. Он выбирает
+сценарий по весам: листание и поиск каталога, карточка товара и отзывы, работа
+с корзиной, оформление заказа, вход. Для каждого шага считаются RPS, перцентили
+задержки и число SQL-запросов на запрос.
+
+Нужна база, заполненная app.seed (строка подключения из POSTGRESQL).
+Без RATE_LIMIT_ENABLED=false частые поиски и входы упираются в лимиты и попадают в 429.
+
+    python -m app.seed --truncate
+    RATE_LIMIT_ENABLED=false python -m benchmarks.http_load --duration 60 --concurrency 50 --output run.json
+    RATE_LIMIT_ENABLED=false python -m benchmarks.http_load --baseline run.json --threshold 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+from sqlalchemy import select
+
+from app.auth import create_access_token
+from app.database import async_session_maker
+from app.lifespan import lifespan
+from app.main import app
+from app.models.products import Product as ProductModel
+from app.models.users import User as UserModel
+from app.seed import EN_NOUNS, RU_NOUNS, SEED_PASSWORD, Zipf
+from app.utils.query_counter import count_queries
+
+
+@dataclass
+class StepStats:
+    latencies: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+        return {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(cuts[49] * 1000, 2),
+            "p95_ms": round(cuts[94] * 1000, 2),
+            "p99_ms": round(cuts[98] * 1000, 2),
+            "queries_per_request": round(statistics.fmean(self.queries), 2),
+            "max_queries": max(self.queries),
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+        }
+
+
+@dataclass
+class Dataset:
+    product_zipf: Zipf
+    category_ids: list[int]
+    users: list[tuple[int, str]]
+
+
+class VirtualUser:
+    """
+    Покупатель с собственным клиентом, токеном и генератором случайных чисел.
+    """
+
+    def __init__(self, index: int, user: tuple[int, str], dataset: Dataset, seed: int):
+        self.user_id, self.email = user
+        self.dataset = dataset
+        self.rng = random.Random(f"{seed}:{index}")
+        token = create_access_token({"sub": self.email, "role": "buyer", "id": self.user_id})
+        self.headers = {"Authorization": f"Bearer {token}"}
+        transport = httpx.ASGITransport(app=app, client=(f"10.1.{index // 256}.{index % 256}", 40000))
+        self.client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+        self.stats: defaultdict[str, StepStats] | None = None
+
+    async def request(self, step: str, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        with count_queries() as statements:
+            started = time.perf_counter()
+            response = await self.client.request(method, url, **kwargs)
+            latency = time.perf_counter() - started
+        if self.stats is not None:
+            stats = self.stats[step]
+            stats.latencies.append(latency)
+            stats.queries.append(len(statements))
+            stats.statuses[response.status_code] += 1
+        return response
+
+    def product_id(self) -> int:
+        return self.dataset.product_zipf.sample()
+
+    async def browse(self) -> None:
+        params = {"page": self.rng.randint(1, 20), "page_size": 20}
+        if self.rng.random() < 0.7:
+            params["category_id"] = self.rng.choice(self.dataset.category_ids)
+        await self.request("GET /products/ browse", "GET", "/products/", params=params)
+
+    async def search(self) -> None:
+        params = {"search": self.rng.choice(RU_NOUNS + EN_NOUNS), "page_size": 20}
+        await self.request("GET /products/ search", "GET", "/products/", params=params)
+
+    async def view_product(self) -> None:
+        await self.request("GET /products/{product_id}", "GET", f"/products/{self.product_id()}")
+
+    async def view_reviews(self) -> None:
+        await self.request("GET /products/{product_id}/reviews", "GET", f"/products/{self.product_id()}/reviews")
+
+    async def edit_cart(self) -> None:
+        product_id = self.product_id()
+        payload = {"product_id": product_id, "quantity": 1}
+        await self.request("POST /cart/items", "POST", "/cart/items", json=payload, headers=self.headers)
+        await self.request(
+            "PUT /cart/items/{product_id}",
+            "PUT",
+            f"/cart/items/{product_id}",
+            json={"product_id": product_id, "quantity": self.rng.randint(1, 3)},
+            headers=self.headers,
+        )
+        await self.request("GET /cart/", "GET", "/cart/", headers=self.headers)
+
+    async def checkout(self) -> None:
+        await self.client.delete("/cart/", headers=self.headers)
+        payload = {"product_id": self.product_id(), "quantity": 1}
+        await self.request("POST /cart/items", "POST", "/cart/items", json=payload, headers=self.headers)
+        await self.request("POST /orders/checkout", "POST", "/orders/checkout", headers=self.headers)
+
+    async def login(self) -> None:
+        form = {"username": self.email, "password": SEED_PASSWORD}
+        await self.request("POST /users/token", "POST", "/users/token", data=form)
+
+
+# Веса сценариев примерно соответствуют структуре трафика магазина: в основном чтение каталога
+SCENARIOS: dict[str, tuple[Callable[[VirtualUser], Awaitable[None]], int]] = {
+    "browse": (VirtualUser.browse, 30),
+    "search": (VirtualUser.search, 20),
+    "product": (VirtualUser.view_product, 25),
+    "reviews": (VirtualUser.view_reviews, 10),
+    "cart": (VirtualUser.edit_cart, 8),
+    "checkout": (VirtualUser.checkout, 4),
+    "login": (VirtualUser.login, 3),
+}
+
+
+async def _load_dataset(concurrency: int, products: int) -> Dataset:
+    async with async_session_maker() as db:
+        product_ids = list(
+            await db.scalars(
+                select(ProductModel.id)
+                .where(ProductModel.is_active, ProductModel.stock > 0)
+                .order_by(ProductModel.id)
+                .limit(products)
+            )
+        )
+        category_ids = list(await db.scalars(select(ProductModel.category_id).distinct()))
+        users = list(
+            (
+                await db.execute(
+                    select(UserModel.id, UserModel.email)
+                    .where(UserModel.role == "buyer", UserModel.is_active)
+                    .order_by(UserModel.id)
+                    .limit(concurrency)
+                )
+            ).tuples()
+        )
+    if not product_ids or len(users) < concurrency:
+        raise SystemExit("Not enough seeded data, run python -m app.seed first")
+    return Dataset(Zipf(product_ids, random.Random("http_load")), category_ids, users)
+
+
+async def _run_user(
+    user: VirtualUser, scenarios: list[str], warmup_until: float, stop_at: float, stats: defaultdict[str, StepStats]
+) -> None:
+    weights = [SCENARIOS[name][1] for name in scenarios]
+    while (now := time.perf_counter()) < stop_at:
+        user.stats = stats if now >= warmup_until else None
+        name = user.rng.choices(scenarios, weights)[0]
+        await SCENARIOS[name][0](user)
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Сравнивает прогон с базовым. Регрессия: RPS ниже или p99 выше больше чем на threshold,
+    либо любой рост числа SQL-запросов на запрос.
+    """
+    problems = []
+    for step, base in baseline["steps"].items():
+        current = report["steps"].get(step)
+        if current is None:
+            continue
+        if current["rps"] < base["rps"] * (1 - threshold):
+            problems.append(f"{step}: rps {base['rps']} -> {current['rps']}")
+        if current["p99_ms"] > base["p99_ms"] * (1 + threshold):
+            problems.append(f"{step}: p99 {base['p99_ms']} ms -> {current['p99_ms']} ms")
+        if current["queries_per_request"] > base["queries_per_request"]:
+            problems.append(f"{step}: queries {base['queries_per_request']} -> {current['queries_per_request']}")
+    return problems
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="Длительность замера, с")
+    parser.add_argument("--warmup", type=float, default=5, help="Прогрев без учёта результатов, с")
+    parser.add_argument("--concurrency", type=int, default=20, help="Виртуальных пользователей")
+    parser.add_argument("--products", type=int, default=10_000, help="Сколько товаров участвует в сценариях")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Сценарии через запятую")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Сохранить результат в JSON")
+    parser.add_argument("--baseline", type=Path, help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Допустимое ухудшение, доля")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(",")
+    if unknown := set(scenarios) - SCENARIOS.keys():
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # ASGITransport не отправляет события lifespan, поэтому запускаем его сами
+    async with lifespan(app):
+        dataset = await _load_dataset(args.concurrency, args.products)
+        users = [VirtualUser(i, user, dataset, args.seed) for i, user in enumerate(dataset.users)]
+        stats: defaultdict[str, StepStats] = defaultdict(StepStats)
+
+        started = time.perf_counter()
+        warmup_until = started + args.warmup
+        await asyncio.gather(
+            *(_run_user(user, scenarios, warmup_until, warmup_until + args.duration, stats) for user in users)
+        )
+        elapsed = time.perf_counter() - warmup_until
+        for user in users:
+            await user.client.aclose()
+
+    total = sum(len(step.latencies) for step in stats.values())
+    report = {
+        "config": {key: str(value) for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "total_rps": round(total / elapsed, 1),
+        "steps": {step: stats[step].summary(elapsed) for step in sorted(stats)},
+    }
+
+    print(f"concurrency={args.concurrency} duration={args.duration}s total_rps={report['total_rps']}")
+    print(f"{'step':<36} {'req':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}  statuses")
+    for step, row in report["steps"].items():
+        print(
+            f"{step:<36} {row['requests']:>7} {row['rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8}"
+            f" {row['p99_ms']:>8} {row['queries_per_request']:>8}  {row['statuses']}"
+        )
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.baseline:
+        problems = compare(report, json.loads(args.baseline.read_text()), args.threshold)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
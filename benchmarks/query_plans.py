@@ -0,0 +1,211 @@
+"""
+Проверка планов SQL-запросов маршрутов на заполненной базе.
+
+Каждый случай — обычный запрос к приложению через ASGI. Все SQL-запросы, которые он выполнил,
+повторяются под EXPLAIN с теми же параметрами. Регрессия: полный проход (Seq Scan) по большой
+таблице или оценка стоимости выше бюджета случая. Маршруты корзины и заказа меняют данные
+одного покупателя так же, как сценарии benchmarks.http_load.
+
+Нужна база, заполненная app.seed (строка подключения из POSTGRESQL), после ANALYZE.
+
+    python -m app.seed --truncate
+    RATE_LIMIT_ENABLED=false python -m benchmarks.query_plans
+    RATE_LIMIT_ENABLED=false python -m benchmarks.query_plans --verbose --case "products by category"
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+from sqlalchemy import func, select
+
+from app.auth import create_access_token
+from app.database import async_session_maker, get_engine
+from app.lifespan import lifespan
+from app.main import app
+from app.models.products import Product as ProductModel
+from app.models.reviews import Review as ReviewModel
+from app.models.users import User as UserModel
+from app.seed import SEED_PASSWORD
+from app.utils.query_counter import capture_queries
+
+
+# Таблицы, которые растут вместе с каталогом и заказами. Маленькие (categories, job_watermarks) читать целиком дёшево
+LARGE_TABLES = {"products", "reviews", "users", "cart_items", "orders", "order_items"}
+# Стоимость одного запроса по оценке планировщика. Выборка по индексу стоит сотни, проход по products — десятки тысяч
+DEFAULT_BUDGET = 5_000.0
+
+
+@dataclass
+class Case:
+    name: str
+    method: str
+    url: str
+    params: dict[str, Any] = field(default_factory=dict)
+    json: dict[str, Any] | None = None
+    data: dict[str, Any] | None = None
+    auth: bool = False
+    budget: float = DEFAULT_BUDGET
+    # Таблицы, полный проход по которым в этом случае ожидаем: например, count по всему каталогу
+    seq_scan_allowed: frozenset[str] = frozenset()
+
+
+@dataclass
+class Dataset:
+    product_id: int
+    category_id: int
+    seller_id: int
+    buyer_id: int
+    buyer_email: str
+
+
+@dataclass
+class Plan:
+    statement: str
+    cost: float
+    seq_scans: list[str]
+
+
+async def _load_dataset() -> Dataset:
+    async with async_session_maker() as db:
+        # Товар с наибольшим числом отзывов: на нём отзывы и рейтинг дороже всего
+        product_id = await db.scalar(
+            select(ReviewModel.product_id)
+            .join(ProductModel, (ProductModel.id == ReviewModel.product_id) & ProductModel.is_active)
+            .where(ProductModel.stock > 10)
+            .group_by(ReviewModel.product_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        )
+        if product_id is None:
+            raise SystemExit("Not enough seeded data, run python -m app.seed first")
+        product = await db.get_one(ProductModel, product_id)
+        buyer = (
+            await db.execute(
+                select(UserModel.id, UserModel.email)
+                .where(UserModel.role == "buyer", UserModel.is_active)
+                .order_by(UserModel.id)
+                .limit(1)
+            )
+        ).one()
+    return Dataset(product_id, product.category_id, product.seller_id, buyer.id, buyer.email)
+
+
+def build_cases(data: Dataset) -> list[Case]:
+    product = f"/products/{data.product_id}"
+    item = {"product_id": data.product_id, "quantity": 1}
+    return [
+        Case("categories", "GET", "/categories/"),
+        # total без фильтров считает весь каталог: по индексу, а при устаревшей карте видимости — проходом по таблице
+        Case("products first page", "GET", "/products/", seq_scan_allowed=frozenset({"products"}), budget=30_000),
+        Case("products by category", "GET", "/products/", {"category_id": data.category_id}),
+        Case(
+            "products by category and price",
+            "GET",
+            "/products/",
+            {"category_id": data.category_id, "min_price": 500, "max_price": 5_000},
+        ),
+        Case("products by price", "GET", "/products/", {"min_price": 50_000, "max_price": 60_000}),
+        Case("products out of stock", "GET", "/products/", {"in_stock": False}),
+        Case("products by seller", "GET", "/products/", {"seller_id": data.seller_id}),
+        Case("products search", "GET", "/products/", {"search": "wireless headphones"}),
+        Case("products search highlight", "GET", "/products/", {"search": "wireless headphones", "highlight": True}),
+        Case("products search russian", "GET", "/products/", {"search": "беспроводные наушники"}),
+        Case("category products", "GET", f"/products/category/{data.category_id}"),
+        Case("product detail", "GET", product),
+        Case("product reviews", "GET", f"{product}/reviews"),
+        Case("also bought", "GET", f"{product}/also-bought"),
+        Case("similar products", "GET", f"{product}/similar"),
+        Case("products batch", "GET", "/products/batch", {"ids": f"{data.product_id},1,2,3"}),
+        Case("login", "POST", "/users/token", data={"username": data.buyer_email, "password": SEED_PASSWORD}),
+        Case("clear cart", "DELETE", "/cart/", auth=True),
+        Case("add to cart", "POST", "/cart/items", json=item, auth=True),
+        Case("update cart item", "PUT", f"/cart/items/{data.product_id}", json=item, auth=True),
+        Case("cart", "GET", "/cart/", auth=True),
+        Case("checkout", "POST", "/orders/checkout", auth=True),
+        Case("orders", "GET", "/orders/", auth=True),
+    ]
+
+
+def _nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _nodes(child)
+
+
+async def explain(queries: list[tuple[str, Any]]) -> list[Plan]:
+    plans = []
+    async with get_engine().connect() as conn:
+        for statement, parameters in queries:
+            # BEGIN, NOTIFY и прочие служебные команды плана не имеют
+            if statement.lstrip().split(None, 1)[0].upper() not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+                continue
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar_one()
+            root = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+            seq_scans = [node["Relation Name"] for node in _nodes(root) if node["Node Type"] == "Seq Scan"]
+            plans.append(Plan(statement, root["Total Cost"], seq_scans))
+        await conn.rollback()
+    return plans
+
+
+def check(case: Case, plans: list[Plan]) -> list[str]:
+    problems = []
+    for number, plan in enumerate(plans, 1):
+        scanned = sorted(set(plan.seq_scans) & LARGE_TABLES - case.seq_scan_allowed)
+        if scanned:
+            problems.append(f"{case.name} [{number}]: seq scan on {', '.join(scanned)}")
+        if plan.cost > case.budget:
+            problems.append(f"{case.name} [{number}]: cost {plan.cost:.0f} > budget {case.budget:.0f}")
+    return problems
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--case", action="append", help="Проверить только случаи с этим именем")
+    parser.add_argument("--verbose", action="store_true", help="Печатать текст запросов")
+    args = parser.parse_args()
+
+    problems = []
+    # ASGITransport не отправляет события lifespan, поэтому запускаем его сами
+    async with lifespan(app):
+        data = await _load_dataset()
+        token = create_access_token({"sub": data.buyer_email, "role": "buyer", "id": data.buyer_id})
+        headers = {"Authorization": f"Bearer {token}"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            print(f"{'case':<34} {'#':>2} {'cost':>10}  seq scans")
+            for case in build_cases(data):
+                if args.case and case.name not in args.case:
+                    continue
+                with capture_queries() as queries:
+                    response = await client.request(
+                        case.method,
+                        case.url,
+                        params=case.params,
+                        json=case.json,
+                        data=case.data,
+                        headers=headers if case.auth else None,
+                    )
+                if response.is_error:
+                    problems.append(f"{case.name}: {case.method} {case.url} returned {response.status_code}")
+                    continue
+                plans = await explain(queries)
+                for number, plan in enumerate(plans, 1):
+                    print(f"{case.name:<34} {number:>2} {plan.cost:>10.1f}  {', '.join(plan.seq_scans) or '-'}")
+                    if args.verbose:
+                        print(f"    {plan.statement}")
+                problems.extend(check(case, plans))
+
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""
+Микробенчмарк накладных расходов ограничителя запросов на один запрос.
+
+Меряет определение ключа (IP с X-Forwarded-For или id из JWT) и проверку
+token bucket с накоплением попаданий для общего хранилища.
+
+    python -m benchmarks.rate_limit --requests 200000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi import Request
+
+from app.auth import create_access_token
+from app.rate_limit import RATE_LIMIT_POLICIES, InMemoryCounterBackend, RateLimiter, rate_limit_key
+
+
+def _request(headers: dict[str, str], client: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/products/",
+            "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+            "client": (client, 50000),
+        }
+    )
+
+
+async def _measure(limiter: RateLimiter, requests: list[Request], rounds: int) -> float:
+    policy = RATE_LIMIT_POLICIES[("GET", "/products/")]
+    started = time.perf_counter()
+    for i in range(rounds):
+        request = requests[i % len(requests)]
+        limiter.check(rate_limit_key(request, policy), policy)
+    elapsed = time.perf_counter() - started
+    await limiter.sync()
+    return elapsed / rounds * 1_000_000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=1000, help="Количество различных клиентов")
+    args = parser.parse_args()
+
+    anonymous = [_request({"X-Forwarded-For": f"10.0.{i // 256}.{i % 256}"}, "172.18.0.5") for i in range(args.clients)]
+    authorized = [
+        _request({"Authorization": f"Bearer {create_access_token({'sub': f'u{i}@example.com', 'id': i})}"}, "10.0.0.1")
+        for i in range(args.clients)
+    ]
+
+    for label, requests in (("ip", anonymous), ("jwt", authorized)):
+        for backend_label, backend in (("local", None), ("shared", InMemoryCounterBackend())):
+            per_request = await _measure(RateLimiter(backend), requests, args.requests)
+            print(f"key={label:<4} backend={backend_label:<6} {per_request:6.2f} µs/request")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,249 @@
+"""
+Микробенчмарк валидации и сериализации схем ответов из app/schemas.
+
+Для каждой схемы и размера (1, 100, 10000 элементов) меряет время validate+dump,
+как в response_model FastAPI, и выделенную память (tracemalloc). Источники данных —
+ORM-объекты (from_attributes) и обычные строки-словари, как row._mapping.
+
+Результаты дописываются в историю (JSON Lines). С --check прогон сравнивается
+с медианой последних прогонов и завершается с кодом 1, если схема стала медленнее порога.
+
+    python -m benchmarks.schemas
+    python -m benchmarks.schemas --check --threshold 15 --sizes 1,100
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import UTC, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+from pydantic import TypeAdapter
+
+from app.models.cart_items import CartItem as CartItemModel
+from app.models.orders import Order as OrderModel
+from app.models.orders import OrderItem as OrderItemModel
+from app.models.products import Product as ProductModel
+from app.models.reviews import Review as ReviewModel
+from app.schemas.carts import Cart as CartSchema
+from app.schemas.orders import OrderList
+from app.schemas.products import ProductList
+from app.schemas.reviews import Review as ReviewSchema
+
+
+NOW = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+def _product_row(i: int) -> dict[str, Any]:
+    return {
+        "id": i,
+        "name": f"Wireless headphones {i}",
+        "description": "Беспроводные наушники с шумоподавлением. " * 3,
+        "price": Decimal("1999.90") + i,
+        "image_url": f"/media/products/{i}.jpg",
+        "stock": i % 50,
+        "category_id": i % 20 + 1,
+        "rating": 4.5,
+        "is_active": True,
+        "is_flash_sale": False,
+        "seller_id": 1,
+    }
+
+
+def _review_row(i: int) -> dict[str, Any]:
+    return {
+        "id": i,
+        "user_id": i % 100 + 1,
+        "product_id": i % 1000 + 1,
+        "comment": "Отличный товар, рекомендую",
+        "comment_date": NOW.replace(tzinfo=None),
+        "grade": i % 5 + 1,
+        "is_active": True,
+    }
+
+
+def _order_row(i: int, products: list) -> dict[str, Any]:
+    items = [
+        {
+            "id": i * 3 + n,
+            "product_id": n + 1,
+            "quantity": 2,
+            "unit_price": Decimal("1999.90"),
+            "total_price": Decimal("3999.80"),
+            "product": products[n],
+        }
+        for n in range(3)
+    ]
+    return {
+        "id": i,
+        "user_id": 1,
+        "status": "delivered",
+        "total_amount": Decimal("11999.40"),
+        "created_at": NOW,
+        "updated_at": NOW,
+        "items": items,
+    }
+
+
+def _orm_product(i: int) -> ProductModel:
+    return ProductModel(**_product_row(i))
+
+
+def _orm_order(i: int, products: list[ProductModel]) -> OrderModel:
+    row = _order_row(i, products)
+    items = [OrderItemModel(**item) for item in row.pop("items")]
+    return OrderModel(**row, items=items)
+
+
+def build_payload(schema: str, size: int, source: str) -> tuple[TypeAdapter, Any]:
+    """
+    Возвращает адаптер схемы и данные в том виде, в каком их отдаёт маршрут.
+    """
+    orm = source == "orm"
+    product = _orm_product if orm else _product_row
+    if schema == "ProductList":
+        data = {"items": [product(i) for i in range(1, size + 1)], "total": size, "page": 1, "page_size": size}
+        return TypeAdapter(ProductList), data
+    if schema == "OrderList":
+        products: list[Any] = [product(n + 1) for n in range(3)]
+        order = _orm_order if orm else _order_row
+        data = {"items": [order(i, products) for i in range(1, size + 1)], "total": size, "page": 1, "page_size": size}
+        return TypeAdapter(OrderList), data
+    if schema == "Cart":
+        items = [
+            CartItemModel(id=i, quantity=1, product=product(i))
+            if orm
+            else {"id": i, "quantity": 1, "product": product(i)}
+            for i in range(1, size + 1)
+        ]
+        data = {"user_id": 1, "items": items, "total_quantity": size, "total_price": Decimal("1999.90") * size}
+        return TypeAdapter(CartSchema), data
+    if schema == "Review":
+        review = (lambda i: ReviewModel(**_review_row(i))) if orm else _review_row
+        return TypeAdapter(list[ReviewSchema]), [review(i) for i in range(1, size + 1)]
+    raise ValueError(schema)
+
+
+def _roundtrip(adapter: TypeAdapter, data: Any) -> Callable[[], Any]:
+    # Так же, как FastAPI обрабатывает response_model: валидация с from_attributes и dump в JSON-совместимый вид
+    def run() -> Any:
+        return adapter.dump_python(adapter.validate_python(data, from_attributes=True), mode="json")
+
+    return run
+
+
+def measure(adapter: TypeAdapter, data: Any, size: int, min_time: float) -> dict[str, float]:
+    run = _roundtrip(adapter, data)
+    run()
+
+    # Минимум из нескольких повторов устойчивее к шуму соседних процессов, чем среднее
+    loops = max(1, int(10_000 / size))
+    timings: list[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < 5 or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        for _ in range(loops):
+            run()
+        timings.append((time.perf_counter() - started) / loops)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = run()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    del result
+
+    best = min(timings)
+    return {
+        "total_us": round(best * 1e6, 2),
+        "per_item_us": round(best * 1e6 / size, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "retained_blocks": blocks,
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def check(results: dict[str, dict], history: list[dict], threshold: float, window: int) -> list[str]:
+    """
+    Сравнивает время на элемент с медианой последних window прогонов из истории.
+    """
+    problems = []
+    for key, current in results.items():
+        previous = [run["results"][key]["per_item_us"] for run in history[-window:] if key in run["results"]]
+        if not previous:
+            continue
+        baseline = statistics.median(previous)
+        slowdown = (current["per_item_us"] / baseline - 1) * 100
+        if slowdown > threshold:
+            problems.append(f"{key}: {baseline} -> {current['per_item_us']} µs/item (+{slowdown:.1f}%)")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schemas", default="ProductList,OrderList,Cart,Review")
+    parser.add_argument("--sizes", default="1,100,10000")
+    parser.add_argument("--sources", default="orm,dict")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Минимальное время замера одного случая, с")
+    parser.add_argument("--history", type=Path, default=Path(".benchmarks/schemas.jsonl"))
+    parser.add_argument("--no-save", action="store_true", help="Не дописывать прогон в историю")
+    parser.add_argument("--check", action="store_true", help="Завершиться с ошибкой при замедлении")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Допустимое замедление, %%")
+    parser.add_argument("--window", type=int, default=5, help="Сколько прошлых прогонов брать для медианы")
+    args = parser.parse_args()
+
+    results: dict[str, dict] = {}
+    print(f"{'case':<28} {'total µs':>12} {'µs/item':>10} {'peak KiB':>10} {'blocks':>8}")
+    for schema in args.schemas.split(","):
+        for size in map(int, args.sizes.split(",")):
+            for source in args.sources.split(","):
+                adapter, data = build_payload(schema, size, source)
+                key = f"{schema}/{size}/{source}"
+                results[key] = row = measure(adapter, data, size, args.min_time)
+                print(
+                    f"{key:<28} {row['total_us']:>12} {row['per_item_us']:>10}"
+                    f" {row['peak_kib']:>10} {row['retained_blocks']:>8}"
+                )
+
+    history = []
+    if args.history.exists():
+        history = [json.loads(line) for line in args.history.read_text().splitlines() if line.strip()]
+    problems = check(results, history, args.threshold, args.window) if args.check else []
+
+    if not args.no_save:
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        run = {
+            "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        with args.history.open("a") as file:
+            file.write(json.dumps(run) + "\n")
+
+    for problem in problems:
+        print(f"SLOWDOWN {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Сравнение полного ответа о товарах и ответа с fields= через ASGI.
+
+Для каждого маршрута и набора полей меряет размер тела ответа и задержку
+(медиана и p95 по --requests последовательным запросам разных страниц).
+Кеши на пути запроса (ETag, объединение дублей) не участвуют: запросы идут без If-None-Match и по одному.
+
+Нужна база, заполненная app.seed (строка подключения из POSTGRESQL).
+
+    RATE_LIMIT_ENABLED=false python -m benchmarks.sparse_fields --requests 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.lifespan import lifespan
+from app.main import app
+
+
+# Набор полей карточки в мобильном списке
+LIST_FIELDS = "id,name,price,image_url,rating"
+
+
+async def measure(client: httpx.AsyncClient, path: str, params: list[dict]) -> dict[str, float]:
+    sizes, latencies = [], []
+    for query in params:
+        started = time.perf_counter()
+        response = await client.get(path.format(**query), params={k: v for k, v in query.items() if k != "id"})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        sizes.append(len(response.content))
+    latencies.sort()
+    return {
+        "bytes": statistics.fmean(sizes),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="Запросов на каждый случай")
+    parser.add_argument("--fields", default=LIST_FIELDS)
+    args = parser.parse_args()
+
+    # ASGITransport не отправляет события lifespan, поэтому запускаем его сами
+    async with lifespan(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            listing = await client.get("/products/", params={"page_size": 100})
+            product_ids = [item["id"] for item in listing.json()["items"]]
+            cases = [
+                ("/products/", [{"page": n + 2, "page_size": 20} for n in range(args.requests)]),
+                ("/products/", [{"page": n + 2, "page_size": 100} for n in range(args.requests)]),
+                ("/products/{id}", [{"id": product_ids[n % len(product_ids)]} for n in range(args.requests)]),
+            ]
+            print(f"{'case':<28} {'bytes':>10} {'p50 ms':>8} {'p95 ms':>8}   fields vs full: bytes / p50")
+            for path, params in cases:
+                size = params[0].get("page_size", 1)
+                # Прогревочный проход: обе серии затем читают те же страницы из буферов PostgreSQL
+                await measure(client, path, params)
+                full = await measure(client, path, params)
+                sparse = await measure(client, path, [{**query, "fields": args.fields} for query in params])
+                for label, row in (("full", full), ("fields", sparse)):
+                    print(
+                        f"{path} x{size} {label:<10} {row['bytes']:>10.0f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}"
+                    )
+                print(
+                    f"{'':<28} {'':>10} {'':>8} {'':>8}   "
+                    f"{(sparse['bytes'] / full['bytes'] - 1) * 100:+.0f}% / {(sparse['p50_ms'] / full['p50_ms'] - 1) * 100:+.0f}%"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
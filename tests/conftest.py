@@ -0,0 +1,243 @@
+"""
+Общие фикстуры тестов и проверка бюджета SQL-запросов на маршрут.
+
+Тесты работают с отдельной локальной базой PostgreSQL из TEST_POSTGRESQL: схема в ней
+пересоздаётся при каждом запуске. Без переменной тесты, которым нужна база, пропускаются.
+База нужна в UTF-8 с локалью, знающей кириллицу: в локали C полнотекстовый поиск не приводит
+русские слова к нижнему регистру.
+
+    createdb --template=template0 --encoding=UTF8 --locale=C.UTF-8 shop_test
+
+    TEST_POSTGRESQL=postgresql+asyncpg://postgres@localhost:5432/shop_test pytest
+"""
+
+import asyncio
+import os
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any
+
+import httpx
+import pytest
+
+
+TEST_DATABASE_URL = os.getenv("TEST_POSTGRESQL")
+
+# Настройки приложения читаются при импорте, поэтому задаются до первого импорта app
+if TEST_DATABASE_URL:
+    os.environ["POSTGRESQL"] = TEST_DATABASE_URL
+else:
+    # Тесты с базой пропускаются, остальным строка подключения нужна только для чтения настроек
+    os.environ.setdefault("POSTGRESQL", "postgresql+asyncpg://localhost/unused")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["LOG_FILE"] = ""
+# Задачи Celery выполняются в процессе тестов, без брокера
+os.environ["CELERY_TASK_ALWAYS_EAGER"] = "true"
+
+
+# Сколько SQL-запросов может выполнить успешный запрос к маршруту, включая загрузку текущего пользователя
+QUERY_BUDGETS: dict[tuple[str, str], int] = {
+    ("GET", "/categories/"): 1,
+    ("GET", "/products/"): 2,
+    ("GET", "/products/{product_id}"): 1,
+    ("GET", "/products/batch"): 1,
+    ("GET", "/products/trending"): 1,
+    ("GET", "/products/{product_id}/reviews"): 2,
+    ("GET", "/products/{product_id}/also-bought"): 1,
+    ("GET", "/products/{product_id}/similar"): 1,
+    ("POST", "/users/token"): 1,
+    ("GET", "/cart/"): 2,
+    ("POST", "/cart/items"): 2,
+    ("PUT", "/cart/items/{product_id}"): 2,
+    ("DELETE", "/cart/items/{product_id}"): 3,
+    ("GET", "/orders/"): 5,
+    ("POST", "/orders/checkout"): 11,
+}
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    if TEST_DATABASE_URL:
+        return
+    skip = pytest.mark.skip(reason="TEST_POSTGRESQL is not set")
+    for item in items:
+        if "client" in getattr(item, "fixturenames", ()):
+            item.add_marker(skip)
+
+
+def _route_path(app: Any, method: str, path: str) -> str | None:
+    """
+    Шаблон пути маршрута, который обработает запрос, например /products/{product_id}.
+    """
+    from starlette.routing import Match
+
+    scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", None)
+    return None
+
+
+class BudgetClient(httpx.AsyncClient):
+    """
+    HTTP-клиент приложения, который проверяет каждый запрос на превышение QUERY_BUDGETS.
+    """
+
+    def __init__(self, app: Any) -> None:
+        super().__init__(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        self.app = app
+        self.statements: list[str] = []
+
+    async def request(self, method: str, url: Any, **kwargs: Any) -> httpx.Response:
+        from app.utils.query_counter import count_queries
+
+        with count_queries() as statements:
+            response = await super().request(method, url, **kwargs)
+        self.statements = statements
+
+        route = _route_path(self.app, method.upper(), httpx.URL(url).path)
+        budget = QUERY_BUDGETS.get((method.upper(), route)) if route is not None else None
+        # SET statement_timeout выполняется, когда соединение переходит от маршрута с другим таймаутом:
+        # сверх бюджета допускается один такой запрос, не больше
+        timeout_sets = sum(statement.startswith("SET statement_timeout") for statement in statements)
+        # Пути ошибок могут тратить запрос на уточнение причины, бюджет задан для успешных ответов
+        if budget is not None and response.is_success and len(statements) > budget + min(timeout_sets, 1):
+            listing = "\n\n".join(f"[{number}] {statement}" for number, statement in enumerate(statements, 1))
+            pytest.fail(
+                f"{method.upper()} {route} executed {len(statements)} queries, budget is {budget}:\n\n{listing}",
+                pytrace=False,
+            )
+        return response
+
+
+async def request_then_disconnect(
+    app: Any, method: str, path: str, disconnect: asyncio.Event, headers: dict[str, str] | None = None
+) -> int:
+    """
+    Отправляет запрос напрямую в ASGI-приложение и отключает клиента, как только выставлен disconnect.
+    ASGITransport httpx сообщает об отключении только после ответа. Возвращает статус ответа.
+    """
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [
+            (b"host", b"test"),
+            *((name.lower().encode(), value.encode()) for name, value in (headers or {}).items()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+    }
+    request_sent = False
+    statuses: list[int] = []
+
+    async def receive() -> dict[str, Any]:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await app(scope, receive, send)
+    return statuses[0]
+
+
+@dataclass
+class Dataset:
+    buyer_id: int
+    buyer_email: str
+    buyer_headers: dict[str, str]
+    seller_id: int
+    category_id: int
+    product_id: int
+    other_product_id: int
+
+
+PASSWORD = "password123"
+
+
+@pytest.fixture(scope="session")
+async def database() -> AsyncIterator[None]:
+    """
+    Пересоздаёт схему тестовой базы по моделям.
+    """
+    import app.models  # noqa: F401 — регистрирует все модели в Base.metadata
+    from app.database import Base, dispose_engine, get_engine
+    from app.tasks.db import task_runtime
+
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    await dispose_engine()
+    task_runtime.shutdown()
+
+
+@pytest.fixture(scope="session")
+async def dataset(database: None) -> Dataset:
+    from app.auth import create_access_token, hash_password
+    from app.database import async_session_maker
+    from app.models.categories import Category as CategoryModel
+    from app.models.products import Product as ProductModel
+    from app.models.reviews import Review as ReviewModel
+    from app.models.users import User as UserModel
+
+    async with async_session_maker() as db:
+        hashed = hash_password(PASSWORD)
+        seller = UserModel(email="seller@example.com", hashed_password=hashed, role="seller")
+        buyer = UserModel(email="buyer@example.com", hashed_password=hashed, role="buyer")
+        category = CategoryModel(name="Электроника")
+        db.add_all([seller, buyer, category])
+        await db.flush()
+        products = [
+            ProductModel(name=name, price=Decimal("100.00"), stock=10, category_id=category.id, seller_id=seller.id)
+            for name in ("Wireless headphones", "Leather gloves")
+        ]
+        db.add_all(products)
+        await db.flush()
+        db.add(ReviewModel(user_id=buyer.id, product_id=products[0].id, comment="Good", grade=5))
+        await db.commit()
+
+        token = create_access_token({"sub": buyer.email, "role": buyer.role, "id": buyer.id})
+        return Dataset(
+            buyer_id=buyer.id,
+            buyer_email=buyer.email,
+            buyer_headers={"Authorization": f"Bearer {token}"},
+            seller_id=seller.id,
+            category_id=category.id,
+            product_id=products[0].id,
+            other_product_id=products[1].id,
+        )
+
+
+@pytest.fixture(scope="session")
+async def app(dataset: Dataset) -> AsyncIterator[Any]:
+    """
+    Приложение с выполненным lifespan: ASGITransport сам событий lifespan не отправляет.
+    """
+    from app.lifespan import lifespan
+    from app.main import app
+
+    async with lifespan(app):
+        yield app
+
+
+@pytest.fixture
+async def client(app: Any) -> AsyncIterator[BudgetClient]:
+    async with BudgetClient(app) as client:
+        yield client
@@ -0,0 +1,51 @@
+"""
+«С этим товаром покупают»: матрица совместных покупок дописывается по новым заказам, маршрут читает готовый список.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from sqlalchemy import update
+
+from tests.conftest import PASSWORD, BudgetClient, Dataset
+
+
+async def test_also_bought(client: BudgetClient, dataset: Dataset) -> None:
+    from app.auth import hash_password
+    from app.database import async_session_maker
+    from app.models.orders import Order as OrderModel
+    from app.models.orders import OrderItem as OrderItemModel
+    from app.models.users import User as UserModel
+    from app.tasks.recommendations import update_also_bought
+
+    # Отдельный покупатель: заказы dataset.buyer считает test_checkout
+    async with async_session_maker() as db:
+        buyer = UserModel(email="also-bought@example.com", hashed_password=hash_password(PASSWORD), role="buyer")
+        db.add(buyer)
+        await db.flush()
+        price = Decimal("100.00")
+        for _ in range(3):
+            items = [
+                OrderItemModel(product_id=product_id, quantity=1, unit_price=price, total_price=price)
+                for product_id in (dataset.product_id, dataset.other_product_id)
+            ]
+            db.add(OrderModel(user_id=buyer.id, total_amount=2 * price, items=items))
+        await db.commit()
+
+    # Свежие заказы ждут also_bought_settle_delay: незавершённый checkout мог получить меньший id
+    assert update_also_bought.apply().get() == 0
+    async with async_session_maker() as db:
+        await db.execute(update(OrderModel).values(created_at=OrderModel.created_at - timedelta(hours=1)))
+        await db.commit()
+
+    assert update_also_bought.apply().get() >= 3
+    # Повторный запуск не пересчитывает уже учтённые заказы
+    assert update_also_bought.apply().get() == 0
+
+    response = await client.get(f"/products/{dataset.product_id}/also-bought")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [dataset.other_product_id]
+
+    response = await client.get(f"/products/{dataset.other_product_id}/also-bought", params={"fields": "name"})
+    assert response.status_code == 200
+    assert response.json() == [{"id": dataset.product_id, "name": "Wireless headphones"}]
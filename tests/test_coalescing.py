@@ -0,0 +1,60 @@
+"""
+Объединение одинаковых одновременных чтений: дубли получают ответ ведущего с теми же заголовками.
+"""
+
+import asyncio
+
+import pytest
+
+from tests.conftest import BudgetClient, Dataset, request_then_disconnect
+
+
+async def test_followers_get_leader_headers(
+    client: BudgetClient, dataset: Dataset, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from app.services.product_stats import product_stats
+
+    path = f"/products/{dataset.other_product_id}"
+    views: list[int] = []
+    monkeypatch.setattr(product_stats, "record_view", views.append)
+    responses = await asyncio.gather(*(client.get(path) for _ in range(5)))
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert any(response.headers.get("x-coalesced") for response in responses)
+    for name in ("cache-control", "etag", "surrogate-key"):
+        assert len({response.headers[name] for response in responses}) == 1, name
+    assert responses[0].headers["cache-control"].startswith("public")
+    # Просмотр учтён для каждого клиента, в том числе получившего чужой ответ
+    assert views == [dataset.other_product_id] * 5
+
+
+async def test_followers_run_after_leader_disconnects(
+    client: BudgetClient, dataset: Dataset, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from app.depends.product_depends import product_fields
+    from app.load_shedding import CLIENT_CLOSED_REQUEST
+    from app.services.product_stats import product_stats
+
+    monkeypatch.setattr(product_stats, "record_view", lambda product_id: None)
+    path = f"/products/{dataset.other_product_id}"
+    stalled, leave = asyncio.Event(), asyncio.Event()
+
+    async def stalled_fields() -> None:
+        # Зависает только ведущий запрос, пока его клиент не уйдёт
+        if not stalled.is_set():
+            stalled.set()
+            await asyncio.Event().wait()
+
+    client.app.dependency_overrides[product_fields] = stalled_fields
+    try:
+        leader = asyncio.create_task(request_then_disconnect(client.app, "GET", path, leave))
+        await stalled.wait()
+        followers = [asyncio.create_task(client.get(path)) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        leave.set()
+        assert await leader == CLIENT_CLOSED_REQUEST
+        # Отмена ведущего не достаётся клиентам, которые ещё на связи: они выполняют запрос сами
+        responses = await asyncio.gather(*followers)
+    finally:
+        del client.app.dependency_overrides[product_fields]
+    assert [response.status_code for response in responses] == [200] * 3
@@ -0,0 +1,53 @@
+"""
+statement_timeout маршрутов: переключается на соединении только при смене значения, вне транзакции сессии.
+"""
+
+from sqlalchemy import text
+
+from tests.conftest import BudgetClient, Dataset
+
+
+async def _show_timeout(statement_timeout: int | None = None, rollback: bool = False) -> str:
+    from app.database import async_session_maker
+
+    async with async_session_maker() as db:
+        if statement_timeout is not None:
+            db.info["statement_timeout"] = statement_timeout
+        value = await db.scalar(text("SHOW statement_timeout"))
+        await (db.rollback() if rollback else db.commit())
+    return str(value)
+
+
+async def test_statement_timeout(client: BudgetClient) -> None:
+    from app.config import get_settings
+    from app.database import get_engine
+    from app.metrics import metrics
+
+    # Новый пул: сессии теста идут по очереди и получают одно и то же соединение
+    await get_engine().dispose()
+    default = f"{get_settings().db_statement_timeout // 1000}s"
+    counter = ("db_statement_timeout_set_total", ())
+    sets = metrics._counters[counter]
+
+    assert await _show_timeout() == default
+    assert await _show_timeout(500) == await _show_timeout(500) == "500ms"
+    assert metrics._counters[counter] - sets == 1
+    # Сессия без значения (фоновая задача) возвращает соединению значение по умолчанию
+    assert await _show_timeout() == default
+    # Откат отменяет SET: значение соединения неизвестно, и следующая сессия задаёт своё заново
+    assert await _show_timeout(2000, rollback=True) == "2s"
+    assert await _show_timeout() == default
+    assert metrics._counters[counter] - sets == 4
+
+
+async def test_read_only_route_keeps_timeout(client: BudgetClient, dataset: Dataset) -> None:
+    from app.database import get_engine
+
+    await get_engine().dispose()
+    # Сессия маршрута только читает и закрывается откатом: SET, выполненный вне её транзакции, остаётся
+    sets = []
+    for page in (1, 2):
+        response = await client.get("/products/", params={"page": page})
+        assert response.status_code == 200
+        sets.append(sum(statement.startswith("SET statement_timeout") for statement in client.statements))
+    assert sets == [1, 0]
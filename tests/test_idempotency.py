@@ -0,0 +1,48 @@
+"""
+Idempotency-Key: запрос, отменённый отключением клиента, не сохраняется, и повтор с тем же ключом выполняется заново.
+"""
+
+import asyncio
+
+import httpx
+
+from tests.conftest import PASSWORD, BudgetClient, Dataset, request_then_disconnect
+
+
+async def test_retry_after_disconnect(client: BudgetClient, dataset: Dataset) -> None:
+    from app.auth import create_access_token, get_current_user, hash_password
+    from app.database import async_session_maker
+    from app.load_shedding import CLIENT_CLOSED_REQUEST
+    from app.models.users import User as UserModel
+
+    # Отдельный покупатель: заказы dataset.buyer считает test_checkout
+    async with async_session_maker() as db:
+        buyer = UserModel(email="idempotency@example.com", hashed_password=hash_password(PASSWORD), role="buyer")
+        db.add(buyer)
+        await db.commit()
+    token = create_access_token({"sub": buyer.email, "role": buyer.role, "id": buyer.id})
+    headers = {"Authorization": f"Bearer {token}"}
+    payload = {"product_id": dataset.product_id, "quantity": 1}
+    assert (await client.post("/cart/items", json=payload, headers=headers)).status_code == 201
+
+    stalled = asyncio.Event()
+
+    async def stalled_user() -> None:
+        # Оформление зависает, пока клиент не уйдёт
+        stalled.set()
+        await asyncio.Event().wait()
+
+    headers["Idempotency-Key"] = "disconnect-retry"
+    client.app.dependency_overrides[get_current_user] = stalled_user
+    try:
+        status_code = await request_then_disconnect(client.app, "POST", "/orders/checkout", stalled, headers)
+    finally:
+        del client.app.dependency_overrides[get_current_user]
+    assert status_code == CLIENT_CLOSED_REQUEST
+
+    # Без проверки бюджета: ключ добавляет к оформлению свои запросы (захват и сохранение ответа)
+    transport = httpx.ASGITransport(app=client.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as plain:
+        response = await plain.post("/orders/checkout", headers=headers)
+    assert response.status_code == 201, response.text
+    assert "idempotent-replayed" not in response.headers
@@ -0,0 +1,66 @@
+"""
+Прогрев пула при старте: открывает все соединения сразу, а упавший прогрев не оставляет занятых.
+"""
+
+import asyncio
+from typing import cast
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from tests.conftest import BudgetClient
+
+
+async def test_failed_warmup_releases_connections(client: BudgetClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    import app.lifespan as lifespan
+    from app.database import get_engine
+
+    calls = iter(range(100))
+    # Второе соединение падает на прогреве, остальные к этому времени ждут на барьере или ещё работают
+    statement = [lambda: text("SELECT 1 / 0") if next(calls) == 1 else text("SELECT 1")]
+    monkeypatch.setattr(lifespan, "HOT_STATEMENTS", statement)
+
+    with pytest.raises(Exception, match="division by zero"):
+        await lifespan.warm_up_pool(3)
+    assert cast(QueuePool, get_engine().pool).checkedout() == 0
+
+    monkeypatch.setattr(lifespan, "HOT_STATEMENTS", [lambda: text("SELECT 1")])
+    await lifespan.warm_up_pool(3)
+    assert cast(QueuePool, get_engine().pool).checkedout() == 0
+
+
+async def test_warmup_holds_connections(client: BudgetClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    import app.lifespan as lifespan
+    from app.database import get_engine
+
+    pool = cast(QueuePool, get_engine().pool)
+    held: list[int] = []
+
+    class RecordingBarrier(asyncio.Barrier):
+        async def wait(self) -> int:
+            index = await super().wait()
+            held.append(pool.checkedout())
+            return index
+
+    monkeypatch.setattr(asyncio, "Barrier", RecordingBarrier)
+    await lifespan.warm_up_pool(3)
+    # Когда барьер пройден, каждая задача ещё держит своё соединение: открыты все три
+    assert max(held) == 3
+    assert pool.checkedout() == 0
+
+
+async def test_ready_while_stopping(client: BudgetClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.services.health import readiness_probe
+
+    assert (await client.get("/health/ready")).status_code == 200
+
+    async def fail() -> None:
+        raise AssertionError("dependencies are not checked while the worker is stopping")
+
+    # Во время остановки проба отвечает 503 сразу, без проверок базы и Redis
+    monkeypatch.setattr(client.app.state, "ready", False)
+    monkeypatch.setattr(readiness_probe, "_run", fail)
+    response = await client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["warmup"] == {"ok": False, "latency_ms": None, "detail": "not started"}
@@ -0,0 +1,84 @@
+"""
+Помощники миграций больших таблиц: заполнение пачками, NOT NULL через NOT VALID, индекс CONCURRENTLY.
+"""
+
+from typing import Any
+
+import pytest
+from sqlalchemy import text
+
+from tests.conftest import BudgetClient
+
+
+def _migrate(connection: Any) -> None:
+    import sqlalchemy as sa
+    from alembic import op
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    from app.utils.migrations import backfill, create_index_concurrently, set_not_null
+
+    table, index = "online_migration_test", "ix_online_migration_test_name"
+    fill = "name_length = length(name)"
+    index_valid = sa.text(f"SELECT indisvalid FROM pg_index WHERE indexrelid = '{index}'::regclass")
+
+    context = MigrationContext.configure(connection)
+    with Operations.context(context), context.begin_transaction():
+        op.execute(f"DROP TABLE IF EXISTS {table}")
+        op.execute(f"CREATE TABLE {table} (id serial PRIMARY KEY, name text NOT NULL)")
+        op.execute(f"INSERT INTO {table} (name) SELECT 'item ' || n FROM generate_series(1, 25) n")
+        op.add_column(table, sa.Column("name_length", sa.Integer(), nullable=True))
+
+        assert backfill(table, fill, where="name_length IS NULL", batch_size=10, pause=0) == 25
+        # Повторный запуск продолжает с места остановки: заполнять уже нечего
+        assert backfill(table, fill, where="name_length IS NULL", pause=0) == 0
+
+        set_not_null(table, "name_length")
+        columns = {column["name"]: column for column in sa.inspect(connection).get_columns(table)}
+        assert columns["name_length"]["nullable"] is False
+        assert sa.inspect(connection).get_check_constraints(table) == []
+
+        # Остаток прерванной сборки CONCURRENTLY: индекс есть, но невалиден
+        create_index_concurrently(index, table, ["name"])
+        op.execute(f"UPDATE pg_index SET indisvalid = false WHERE indexrelid = '{index}'::regclass")
+        create_index_concurrently(index, table, ["name"])
+        assert connection.scalar(index_valid) is True
+        op.execute(f"DROP TABLE {table}")
+
+
+async def test_online_migration_helpers(client: BudgetClient) -> None:
+    from app.database import get_engine
+
+    async with get_engine().connect() as conn:
+        await conn.run_sync(_migrate)
+
+
+def _set_not_null_while_locked(connection: Any) -> str:
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from sqlalchemy.exc import DBAPIError
+
+    from app.utils.migrations import set_not_null
+
+    context = MigrationContext.configure(connection)
+    with Operations.context(context), context.begin_transaction():
+        with pytest.raises(DBAPIError, match="lock timeout"):
+            set_not_null("lock_timeout_test", "name", lock_timeout="100ms")
+    # lock_timeout ставился на сессию: после шага соединение возвращается к значению по умолчанию
+    return str(connection.scalar(text("SHOW lock_timeout")))
+
+
+async def test_set_not_null_lock_timeout(client: BudgetClient) -> None:
+    from app.database import get_engine
+
+    async with get_engine().connect() as blocker:
+        await blocker.execute(text("DROP TABLE IF EXISTS lock_timeout_test"))
+        await blocker.execute(text("CREATE TABLE lock_timeout_test (id serial PRIMARY KEY, name text)"))
+        await blocker.commit()
+        # Долгая транзакция с блокировкой таблицы: ALTER TABLE не должен вставать за ней в очередь надолго
+        await blocker.execute(text("LOCK TABLE lock_timeout_test IN ACCESS SHARE MODE"))
+        async with get_engine().connect() as conn:
+            assert await conn.run_sync(_set_not_null_while_locked) == "0"
+        await blocker.rollback()
+        await blocker.execute(text("DROP TABLE lock_timeout_test"))
+        await blocker.commit()
@@ -0,0 +1,137 @@
+"""
+Transactional outbox: событие пишется в транзакции заказа, ретранслятор отправляет его и повторяет неудачные.
+Брокер в тестах не нужен: задачи выполняются сразу (task_always_eager), отказ брокера имитирует подменённый publish_events.
+"""
+
+import dataclasses
+from datetime import timedelta
+from typing import Any
+
+import pytest
+from sqlalchemy import func, select, update
+
+from tests.conftest import PASSWORD, BudgetClient, Dataset
+
+
+async def _order_event(order_id: int) -> Any:
+    from app.database import async_session_maker
+    from app.models.outbox_events import OutboxEvent as OutboxEventModel
+
+    async with async_session_maker() as db:
+        result = await db.scalars(
+            select(OutboxEventModel).where(
+                OutboxEventModel.event_type == "order.created",
+                OutboxEventModel.payload["order_id"].as_integer() == order_id,
+            )
+        )
+        [event] = result.all()
+        return event
+
+
+async def test_checkout_event_relayed(client: BudgetClient, dataset: Dataset, monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.auth import create_access_token, hash_password
+    from app.database import async_session_maker
+    from app.models.outbox_events import OutboxEvent as OutboxEventModel
+    from app.models.users import User as UserModel
+    from app.services import outbox
+
+    # Отдельный покупатель: заказы dataset.buyer считает test_checkout
+    async with async_session_maker() as db:
+        buyer = UserModel(email="outbox-buyer@example.com", hashed_password=hash_password(PASSWORD), role="buyer")
+        db.add(buyer)
+        await db.commit()
+    headers = {
+        "Authorization": f"Bearer {create_access_token({'sub': buyer.email, 'role': buyer.role, 'id': buyer.id})}"
+    }
+    payload = {"product_id": dataset.other_product_id, "quantity": 1}
+    assert (await client.post("/cart/items", json=payload, headers=headers)).status_code == 201
+    response = await client.post("/orders/checkout", headers=headers)
+    assert response.status_code == 201
+    order_id = response.json()["id"]
+
+    event = await _order_event(order_id)
+    assert event.delivered_at is None
+    assert event.payload["items"] == [{"product_id": dataset.other_product_id, "quantity": 1}]
+
+    # Брокер недоступен: событие остаётся неотправленным и откладывается до available_at
+    def broker_down(events: list[tuple]) -> tuple[list[int], dict[int, str]]:
+        return [], {event_id: "ConnectionError()" for event_id, _, _ in events}
+
+    monkeypatch.setattr(outbox, "publish_events", broker_down)
+    relay = outbox.OutboxRelay()
+    assert await relay.relay_batch() >= 1
+    event = await _order_event(order_id)
+    assert (event.attempts, event.delivered_at, event.last_error) == (1, None, "ConnectionError()")
+    assert await relay.relay_batch() == 0
+
+    sent: list[int] = []
+
+    def broker_up(events: list[tuple]) -> tuple[list[int], dict[int, str]]:
+        sent.extend(event_id for event_id, _, _ in events)
+        return [event_id for event_id, _, _ in events], {}
+
+    monkeypatch.setattr(outbox, "publish_events", broker_up)
+    async with async_session_maker() as db:
+        await db.execute(update(OutboxEventModel).values(available_at=func.now()))
+        await db.commit()
+    assert await relay.relay_batch() >= 1
+    event = await _order_event(order_id)
+    assert event.id in sent
+    assert event.delivered_at is not None
+    assert await relay.relay_batch() == 0
+
+
+async def test_review_event_refreshes_rating(client: BudgetClient, dataset: Dataset) -> None:
+    from app.database import async_session_maker
+    from app.models.products import Product as ProductModel
+    from app.services.outbox import OutboxRelay, add_event
+
+    # Рейтинг разошёлся с отзывами, как после гонки двух одновременных отзывов
+    async with async_session_maker() as db:
+        await db.execute(update(ProductModel).where(ProductModel.id == dataset.product_id).values(rating=1.0))
+        await db.commit()
+    async with async_session_maker() as db:
+        add_event(db, "review.created", {"review_id": 0, "product_id": dataset.product_id, "grade": 5})
+        await db.commit()
+
+    # task_always_eager: задача выполняется при отправке, на engine воркера
+    assert await OutboxRelay().relay_batch() >= 1
+    async with async_session_maker() as db:
+        assert await db.scalar(select(ProductModel.rating).where(ProductModel.id == dataset.product_id)) == 5.0
+
+
+async def test_dead_letter(client: BudgetClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.database import async_session_maker
+    from app.metrics import metrics
+    from app.models.outbox_events import OutboxEvent as OutboxEventModel
+    from app.services import outbox
+
+    settings = dataclasses.replace(outbox.get_settings(), outbox_max_attempts=2, outbox_retention=3600)
+    monkeypatch.setattr(outbox, "get_settings", lambda: settings)
+    monkeypatch.setattr(
+        outbox, "publish_events", lambda events: ([], {event[0]: "ConnectionError()" for event in events})
+    )
+    async with async_session_maker() as db:
+        outbox.add_event(db, "product.changed", {"product_ids": [0]})
+        await db.commit()
+
+    relay = outbox.OutboxRelay()
+    dead = metrics.value("outbox_dead_letter_total")
+    for _ in range(2):
+        assert await relay.relay_batch() >= 1
+        async with async_session_maker() as db:
+            await db.execute(update(OutboxEventModel).values(available_at=func.now()))
+            await db.commit()
+    # Попытки исчерпаны: событие больше не отправляется, но видно в метриках
+    assert await relay.relay_batch() == 0
+    assert metrics.value("outbox_dead_letter_total") - dead >= 1
+    await relay._cleanup()
+    assert metrics.value("outbox_dead_events") >= 1
+
+    # Через outbox_retention после последней попытки событие удаляется
+    async with async_session_maker() as db:
+        await db.execute(update(OutboxEventModel).values(available_at=func.now() - timedelta(hours=2)))
+        await db.commit()
+    relay._cleaned_at = 0.0
+    await relay._cleanup()
+    assert metrics.value("outbox_dead_events") == 0
@@ -0,0 +1,38 @@
+"""
+Загрузчик товаров: отмена запроса останавливает пачку, выполняющуюся на сессии запроса.
+"""
+
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import Select, func
+
+from tests.conftest import BudgetClient, Dataset, request_then_disconnect
+
+
+async def test_cancel_stops_dispatch(client: BudgetClient, dataset: Dataset, monkeypatch: pytest.MonkeyPatch) -> None:
+    import app.services.product_loader as product_loader
+
+    started = asyncio.Event()
+    products_by_ids_query = product_loader.products_by_ids_query
+
+    def slow_query(ids: list[int]) -> Select:
+        started.set()
+        return products_by_ids_query(ids).where(func.pg_sleep(5).is_not(None))
+
+    monkeypatch.setattr(product_loader, "products_by_ids_query", slow_query)
+    begin = time.monotonic()
+    status_code = await request_then_disconnect(client.app, "GET", f"/products/batch?ids={dataset.product_id}", started)
+    assert status_code == 499
+    # Запрос к базе прерван вместе с запросом клиента, а не досчитан в фоне на закрытой сессии
+    assert time.monotonic() - begin < 5
+    assert not [
+        task
+        for task in asyncio.all_tasks()
+        if getattr(task.get_coro(), "__qualname__", None) == "ProductLoader._dispatch"
+    ]
+
+    monkeypatch.setattr(product_loader, "products_by_ids_query", products_by_ids_query)
+    response = await client.get("/products/batch", params={"ids": str(dataset.product_id)})
+    assert response.status_code == 200
@@ -0,0 +1,35 @@
+"""
+Write-behind счётчики просмотров: маршрут не ходит в базу, буфер сбрасывается одним запросом.
+"""
+
+from sqlalchemy import select
+
+from tests.conftest import BudgetClient, Dataset
+
+
+async def test_views_flushed_in_one_statement(client: BudgetClient, dataset: Dataset) -> None:
+    from app.database import async_session_maker
+    from app.models.product_stats import ProductStats as ProductStatsModel
+    from app.services.product_stats import product_stats
+    from app.utils.query_counter import count_queries
+
+    await product_stats.flush()
+    for _ in range(3):
+        assert (await client.get(f"/products/{dataset.product_id}")).status_code == 200
+    assert (await client.post(f"/products/{dataset.product_id}/search-click")).status_code == 204
+    assert client.statements == []
+    # Несуществующий товар отбрасывается при записи и не ломает пачку
+    assert (await client.post("/products/999999/search-click")).status_code == 204
+
+    with count_queries() as statements:
+        await product_stats.flush()
+    # Соединение после маршрута с другим таймаутом сначала возвращается к значению по умолчанию
+    writes = [statement for statement in statements if not statement.startswith("SET statement_timeout")]
+    assert len(writes) == 1
+
+    async with async_session_maker() as db:
+        stats = await db.get(ProductStatsModel, dataset.product_id)
+        assert stats is not None
+        assert stats.views >= 3
+        assert stats.search_clicks >= 1
+        assert await db.scalar(select(ProductStatsModel).where(ProductStatsModel.product_id == 999999)) is None
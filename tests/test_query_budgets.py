@@ -0,0 +1,97 @@
+"""
+Бюджет SQL-запросов основных маршрутов. Сам бюджет проверяет клиент из conftest.py,
+здесь — только обращения к маршрутам с реальными данными.
+"""
+
+from tests.conftest import PASSWORD, BudgetClient, Dataset
+
+
+async def test_catalog(client: BudgetClient, dataset: Dataset) -> None:
+    assert (await client.get("/categories/")).status_code == 200
+    assert (await client.get("/products/", params={"category_id": dataset.category_id})).status_code == 200
+    assert (await client.get("/products/", params={"search": "headphones"})).json()["total"] == 1
+
+
+async def test_product_detail(client: BudgetClient, dataset: Dataset) -> None:
+    response = await client.get(f"/products/{dataset.product_id}")
+    assert response.status_code == 200
+    assert response.json()["id"] == dataset.product_id
+
+    assert (await client.get("/products/999999")).status_code == 404
+
+
+async def test_product_batch(client: BudgetClient, dataset: Dataset) -> None:
+    ids = [dataset.other_product_id, 999999, dataset.product_id]
+    response = await client.get("/products/batch", params={"ids": ",".join(map(str, ids))})
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()["items"]] == [dataset.other_product_id, dataset.product_id]
+    assert response.json()["missing"] == [999999]
+
+    assert (await client.get("/products/batch", params={"ids": "1,x"})).status_code == 400
+
+
+async def test_product_reviews(client: BudgetClient, dataset: Dataset) -> None:
+    response = await client.get(f"/products/{dataset.product_id}/reviews")
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+
+async def test_login(client: BudgetClient, dataset: Dataset) -> None:
+    response = await client.post("/users/token", data={"username": dataset.buyer_email, "password": PASSWORD})
+    assert response.status_code == 200
+
+
+async def test_cart(client: BudgetClient, dataset: Dataset) -> None:
+    headers = dataset.buyer_headers
+    payload = {"product_id": dataset.other_product_id, "quantity": 1}
+
+    assert (await client.post("/cart/items", json=payload, headers=headers)).status_code == 201
+    response = await client.post("/cart/items", json=payload, headers=headers)
+    assert response.json()["quantity"] == 2
+
+    payload["quantity"] = 5
+    response = await client.put(f"/cart/items/{dataset.other_product_id}", json=payload, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["product"]["id"] == dataset.other_product_id
+
+    assert (await client.get("/cart/", headers=headers)).json()["total_quantity"] == 5
+    assert (await client.delete(f"/cart/items/{dataset.other_product_id}", headers=headers)).status_code == 204
+    assert (await client.put("/cart/items/999999", json=payload, headers=headers)).status_code == 404
+
+
+async def test_checkout(client: BudgetClient, dataset: Dataset) -> None:
+    headers = dataset.buyer_headers
+    payload = {"product_id": dataset.product_id, "quantity": 1}
+    assert (await client.post("/cart/items", json=payload, headers=headers)).status_code == 201
+
+    assert (await client.post("/orders/checkout", headers=headers)).status_code == 201
+    response = await client.get("/orders/", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["total"] == 1
+
+
+async def test_conditional_get(client: BudgetClient, dataset: Dataset) -> None:
+    from app.services.catalog_versions import catalog_versions
+
+    path = f"/products/{dataset.product_id}"
+    etag = (await client.get(path)).headers["etag"]
+
+    response = await client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert client.statements == []
+
+    await catalog_versions.bump(product_ids=[dataset.product_id])
+    assert (await client.get(path, headers={"If-None-Match": etag})).status_code == 200
+
+
+async def test_sparse_fields(client: BudgetClient, dataset: Dataset) -> None:
+    response = await client.get("/products/", params={"category_id": dataset.category_id, "fields": "name,price"})
+    assert response.status_code == 200
+    assert all(set(item) == {"id", "name", "price"} for item in response.json()["items"])
+    assert "search_vector" not in client.statements[-1]
+    assert "description" not in client.statements[-1]
+
+    response = await client.get(f"/products/{dataset.product_id}", params={"fields": "rating"})
+    assert response.json() == {"id": dataset.product_id, "rating": response.json()["rating"]}
+
+    assert (await client.get("/products/", params={"fields": "name,secret"})).status_code == 400
@@ -0,0 +1,103 @@
+"""
+Ограничение частоты запросов: token bucket воркера, общий счётчик и ответ 429.
+"""
+
+import dataclasses
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.rate_limit import InMemoryCounterBackend, RateLimiter, RatePolicy
+
+
+POLICY = RatePolicy(name="test", limit=3, period=3)
+
+
+def test_limit_and_refill() -> None:
+    limiter = RateLimiter()
+    assert [limiter.check("test:1.2.3.4", POLICY, now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Корзина пуста: следующий жетон появится через period / limit секунд
+    assert limiter.check("test:1.2.3.4", POLICY, now=100.0) == pytest.approx(1.0)
+    assert limiter.check("test:5.6.7.8", POLICY, now=100.0) == 0.0
+
+    # За полсекунды набралась половина жетона
+    assert limiter.check("test:1.2.3.4", POLICY, now=100.5) == pytest.approx(0.5)
+    assert limiter.check("test:1.2.3.4", POLICY, now=101.0) == 0.0
+
+
+def test_eviction_keeps_recent_keys(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(RateLimiter, "MAX_BUCKETS", 2)
+    limiter = RateLimiter()
+    for _ in range(3):
+        limiter.check("test:a", POLICY, now=100.0)
+    limiter.check("test:b", POLICY, now=100.0)
+    limiter.check("test:a", POLICY, now=100.0)
+    # Вытесняется b — к нему обращались давнее, чем к a; исчерпанная корзина a сохраняется
+    limiter.check("test:c", POLICY, now=100.0)
+    assert list(limiter._buckets) == ["test:a", "test:c"]
+    assert limiter.check("test:a", POLICY, now=100.0) > 0
+
+
+async def test_shared_counter_blocks_across_workers() -> None:
+    # Длинное окно: все попадания теста приходятся на одно окно общего счётчика
+    policy = RatePolicy(name="shared", limit=3, period=3600)
+    backend = InMemoryCounterBackend()
+    first, second = RateLimiter(backend), RateLimiter(backend)
+    # Каждый воркер в пределах своей корзины, но вместе они превысили лимит окна
+    for limiter in (first, second):
+        assert limiter.check("shared:1.2.3.4", policy) == limiter.check("shared:1.2.3.4", policy) == 0.0
+        await limiter.sync()
+    assert 0 < second.check("shared:1.2.3.4", policy) <= policy.period
+    # Первый воркер узнаёт общий счёт со следующей отправкой своих попаданий
+    assert first.check("shared:1.2.3.4", policy) == 0.0
+    await first.sync()
+    assert 0 < first.check("shared:1.2.3.4", policy) <= policy.period
+    for limiter in (first, second):
+        await limiter.close()
+
+
+async def test_middleware_returns_429_with_retry_after(monkeypatch: pytest.MonkeyPatch) -> None:
+    import app.rate_limit as rate_limit
+
+    settings = dataclasses.replace(rate_limit.get_settings(), rate_limit_enabled=True, trusted_proxy_hops=0)
+    monkeypatch.setattr(rate_limit, "get_settings", lambda: settings)
+    monkeypatch.setattr(rate_limit, "rate_limiter", RateLimiter())
+    limit = rate_limit.RATE_LIMIT_POLICIES[("POST", "/users/token")].limit
+
+    app = FastAPI()
+    app.middleware("http")(rate_limit.rate_limit_middleware)
+
+    @app.post("/users/token")
+    async def token() -> dict:
+        return {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        statuses = [(await client.post("/users/token")).status_code for _ in range(limit)]
+        assert statuses == [200] * limit
+        response = await client.post("/users/token")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+async def test_search_policy_skips_browsing(monkeypatch: pytest.MonkeyPatch) -> None:
+    import app.rate_limit as rate_limit
+
+    settings = dataclasses.replace(rate_limit.get_settings(), rate_limit_enabled=True, trusted_proxy_hops=0)
+    monkeypatch.setattr(rate_limit, "get_settings", lambda: settings)
+    monkeypatch.setattr(rate_limit, "rate_limiter", RateLimiter())
+    limit = rate_limit.RATE_LIMIT_POLICIES[("GET", "/products/")].limit
+
+    app = FastAPI()
+    app.middleware("http")(rate_limit.rate_limit_middleware)
+
+    @app.get("/products/")
+    async def products() -> dict:
+        return {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        # Просмотр каталога без поиска лимитом не ограничен
+        browsing = [(await client.get("/products/", params={"page": 2})).status_code for _ in range(limit + 5)]
+        assert browsing == [200] * (limit + 5)
+        searches = [(await client.get("/products/", params={"search": "lamp"})).status_code for _ in range(limit + 1)]
+    assert searches == [200] * limit + [429]
@@ -0,0 +1,71 @@
+"""
+Полнотекстовый поиск по каталогу: русские и английские слова ищутся по основе, в любой форме.
+"""
+
+from decimal import Decimal
+
+from tests.conftest import BudgetClient, Dataset
+
+
+async def test_search_russian_and_english(client: BudgetClient, dataset: Dataset) -> None:
+    from app.database import async_session_maker
+    from app.models.products import Product as ProductModel
+
+    async with async_session_maker() as db:
+        product = ProductModel(
+            name="Беспроводные наушники Полярис",
+            description="Складные наушники с шумоподавлением",
+            price=Decimal("70.00"),
+            stock=3,
+            category_id=dataset.category_id,
+            seller_id=dataset.seller_id,
+        )
+        db.add(product)
+        await db.commit()
+
+    for search in ("беспроводной наушник", "наушниками полярис", "складных"):
+        response = await client.get("/products/", params={"search": search})
+        assert [item["id"] for item in response.json()["items"]] == [product.id], search
+
+    # Английские слова по-прежнему стеммятся: headphone находит Wireless headphones
+    response = await client.get("/products/", params={"search": "wireless headphone"})
+    assert [item["id"] for item in response.json()["items"]] == [dataset.product_id]
+
+    # Вектор пересчитывается триггером при изменении названия
+    async with async_session_maker() as db:
+        (await db.get_one(ProductModel, product.id)).name = "Портативная колонка Полярис"
+        await db.commit()
+    assert (await client.get("/products/", params={"search": "колонки"})).json()["total"] == 1
+    assert (await client.get("/products/", params={"search": "беспроводные"})).json()["total"] == 0
+
+
+async def test_search_highlight(client: BudgetClient, dataset: Dataset) -> None:
+    from app.database import async_session_maker
+    from app.models.products import Product as ProductModel
+
+    async with async_session_maker() as db:
+        product = ProductModel(
+            name="Детские наушники <Мишка>",
+            description="Мягкие наушники для детей. Громкость ограничена, наушники не давят на уши",
+            price=Decimal("30.00"),
+            stock=4,
+            category_id=dataset.category_id,
+            seller_id=dataset.seller_id,
+        )
+        db.add(product)
+        await db.commit()
+
+    response = await client.get("/products/", params={"search": "детских наушников"})
+    body = response.json()
+    # Ранг возвращается всегда, фрагменты — только по запросу
+    assert [hit["id"] for hit in body["hits"]] == [item["id"] for item in body["items"]] == [product.id]
+    assert body["hits"][0]["rank"] > 0
+    assert body["hits"][0]["name"] is None
+
+    response = await client.get("/products/", params={"search": "детских наушников", "highlight": True, "fields": "id"})
+    hit = response.json()["hits"][0]
+    # Текст товара экранирован, HTML — только метки совпадений
+    assert hit["name"] == "<mark>Детские</mark> <mark>наушники</mark> &lt;Мишка&gt;"
+    assert hit["description"].startswith("Мягкие <mark>наушники</mark> для детей.")
+
+    assert (await client.get("/products/", params={"highlight": True})).json()["hits"] is None
@@ -0,0 +1,125 @@
+"""
+Похожие товары: сигнатуры текста строит фоновая задача, маршрут читает готовый список.
+"""
+
+import dataclasses
+from decimal import Decimal
+
+import pytest
+
+from tests.conftest import BudgetClient, Dataset
+
+
+def test_signature_similarity() -> None:
+    from app.services.similar_products import SIGNATURE_BITS, signature
+
+    headphones = signature([("wireless", 2.0), ("headphones", 2.0), ("black", 1.0)])
+    same_kind = signature([("wireless", 2.0), ("headphones", 2.0), ("white", 1.0)])
+    unrelated = signature([("leather", 2.0), ("gloves", 2.0), ("brown", 1.0)])
+    assert signature([("wireless", 0.0)]) is None
+    assert headphones is not None
+    assert same_kind is not None
+    assert unrelated is not None
+    # Чем больше общих слов с большим весом, тем меньше различающихся битов
+    assert (headphones ^ same_kind).bit_count() < (headphones ^ unrelated).bit_count() <= SIGNATURE_BITS
+
+
+async def test_similar_products(client: BudgetClient, dataset: Dataset, monkeypatch: pytest.MonkeyPatch) -> None:
+    import app.routers.products as products_router
+    from app.database import async_session_maker
+    from app.models.categories import Category as CategoryModel
+    from app.models.products import Product as ProductModel
+    from app.services.category_tree import category_tree
+    from app.tasks.recommendations import update_similar_products
+
+    async with async_session_maker() as db:
+        subcategory = CategoryModel(name="Наушники", parent_id=dataset.category_id)
+        db.add(subcategory)
+        await db.flush()
+        products = [
+            ProductModel(
+                name=name,
+                description=description,
+                price=Decimal("50.00"),
+                stock=5,
+                category_id=category_id,
+                seller_id=dataset.seller_id,
+            )
+            for name, description, category_id in (
+                ("Wireless headphones Atlas", "Wireless headphones with noise cancelling", subcategory.id),
+                ("Wireless headphones Orion", "Wireless headphones with long battery life", dataset.category_id),
+                ("Wooden spoon", "Kitchen spoon made of oak", dataset.category_id),
+            )
+        ]
+        db.add_all(products)
+        await db.commit()
+    atlas, orion, spoon = (product.id for product in products)
+    await category_tree.refresh()
+
+    assert update_similar_products.apply().get() > 0
+    # Тексты не менялись: повторный запуск ничего не пересчитывает
+    assert update_similar_products.apply().get() == 0
+
+    response = await client.get(f"/products/{orion}/similar")
+    assert response.status_code == 200
+    ids = [item["id"] for item in response.json()]
+    assert atlas in ids
+    assert spoon not in ids
+
+    response = await client.get(f"/products/{atlas}/similar", params={"same_category": True, "fields": "name"})
+    assert response.status_code == 200
+    # Категория Atlas — подкатегория без других товаров
+    assert response.json() == []
+
+    response = await client.get(f"/products/{orion}/similar", params={"same_category": True, "fields": "name"})
+    assert response.status_code == 200
+    assert {"id": atlas, "name": "Wireless headphones Atlas"} in response.json()
+
+    # Хранится только similar_top_n соседей: больший limit до него и урезается
+    settings = dataclasses.replace(products_router.get_settings(), similar_top_n=1)
+    monkeypatch.setattr(products_router, "get_settings", lambda: settings)
+    response = await client.get(f"/products/{orion}/similar", params={"limit": 100})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+
+async def test_vocabulary_epoch(client: BudgetClient, dataset: Dataset, monkeypatch: pytest.MonkeyPatch) -> None:
+    import app.services.similar_products as similar_products
+    from app.database import async_session_maker
+    from app.models.product_similarities import ProductSignature as ProductSignatureModel
+    from app.models.products import Product as ProductModel
+    from app.tasks.recommendations import update_similar_products
+
+    settings = dataclasses.replace(similar_products.get_settings(), similar_vocabulary_drift=0.0)
+    monkeypatch.setattr(similar_products, "get_settings", lambda: settings)
+
+    async def add_product(name: str) -> int:
+        async with async_session_maker() as db:
+            product = ProductModel(
+                name=name,
+                description="Striped zebra lamp",
+                price=Decimal("30.00"),
+                stock=5,
+                category_id=dataset.category_id,
+                seller_id=dataset.seller_id,
+            )
+            db.add(product)
+            await db.commit()
+        return product.id
+
+    async def signature_of(product_id: int) -> ProductSignatureModel:
+        async with async_session_maker() as db:
+            return await db.get_one(ProductSignatureModel, product_id)
+
+    # Слова первого такого товара больше нигде не встречаются: сравнивать его не с чем
+    first = await add_product("Zebra lamp")
+    update_similar_products.apply().get()
+    before = await signature_of(first)
+    assert before.signature is None
+
+    # Второй товар сдвигает словарь: начинается новая эпоха, и первый товар подписывается заново
+    await add_product("Zebra lamp Mini")
+    update_similar_products.apply().get()
+    after = await signature_of(first)
+    assert after.epoch > before.epoch
+    assert after.signature is not None
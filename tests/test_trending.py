@@ -0,0 +1,34 @@
+"""
+«Сейчас популярно»: Space-Saving с затуханием и маршрут /products/trending.
+"""
+
+from tests.conftest import BudgetClient, Dataset
+
+
+def test_space_saving_decay_and_eviction() -> None:
+    from app.services.trending import SpaceSaving
+
+    sketch = SpaceSaving(capacity=2, half_life=60)
+    now = sketch._landmark
+    sketch.add(1, 10, 8, now)
+    sketch.add(2, 10, 4, now)
+    # Через период полураспада вес старых событий вдвое меньше
+    assert [(pid, count) for pid, _, count in sketch.snapshot(now + 60)] == [(1, 4.0), (2, 2.0)]
+
+    # Новый товар вытесняет товар с наименьшим счётом и наследует его счёт как погрешность
+    sketch.add(3, 20, 1, now + 60)
+    assert [(pid, cid, count) for pid, cid, count in sketch.snapshot(now + 60)] == [(1, 10, 4.0), (3, 20, 3.0)]
+
+
+async def test_trending(client: BudgetClient, dataset: Dataset) -> None:
+    for _ in range(50):
+        assert (await client.get(f"/products/{dataset.other_product_id}")).status_code == 200
+
+    response = await client.get("/products/trending", params={"limit": 1})
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [dataset.other_product_id]
+
+    response = await client.get("/products/trending", params={"category_id": dataset.category_id, "fields": "name"})
+    assert response.status_code == 200
+    assert dataset.other_product_id in [item["id"] for item in response.json()]
+    assert (await client.get("/products/trending", params={"category_id": 999999})).status_code == 404